@@ -14,8 +14,83 @@ MQTT_BROKER_HOST = os.environ.get("MQTT_BROKER_HOST") or "mqtt"
 MQTT_BROKER_PORT = try_parse(int, os.environ.get("MQTT_BROKER_PORT")) or 1883
 MQTT_TOPIC = os.environ.get("MQTT_TOPIC") or "agent"
 
+# Number of shard topics (0 disables sharding). A vehicle publishes on
+# shard/<crc32(user_id) % MQTT_SHARDS>/<topic> so its whole stream reaches the
+# one edge instance that owns the shard; use the same value on the edges
+MQTT_SHARDS = try_parse(int, os.environ.get("MQTT_SHARDS")) or 0
+
 # MQTT topic for parking data
 #MQTT_PARKING_TOPIC = os.environ.get("MQTT_PARKING_TOPIC") or "parking_data"
 
+# Recorded drive to replay
+ACCELEROMETER_FILE = os.environ.get("ACCELEROMETER_FILE") or "data/accelerometer.csv"
+GPS_FILE = os.environ.get("GPS_FILE") or "data/gps.csv"
+PARKING_FILE = os.environ.get("PARKING_FILE") or "data/parking.csv"
+# "file" loads the files into memory, "mmap" maps them and parses rows on demand (multi-GB drives)
+DATASOURCE = os.environ.get("DATASOURCE") or "file"
+
 # Delay for sending data to mqtt in seconds
 DELAY = try_parse(float, os.environ.get("DELAY")) or 1
+
+# Replay the drive with its recorded timing: a speed multiplier ("1" real time,
+# "10" ten times faster) or "max" for as fast as possible. Unset publishes every DELAY seconds.
+REPLAY_SPEED = (
+    float("inf")
+    if os.environ.get("REPLAY_SPEED") == "max"
+    else try_parse(float, os.environ.get("REPLAY_SPEED"))
+)
+# Stamp replayed readings with their recorded time instead of the time they are sent at
+REPLAY_RECORDED_TIMESTAMPS = os.environ.get("REPLAY_RECORDED_TIMESTAMPS") == "1"
+
+# Fleet simulator: number of virtual vehicles driven by one process (0 runs a single agent)
+FLEET_SIZE = try_parse(int, os.environ.get("FLEET_SIZE")) or 0
+# Aggregate rate of the whole fleet in messages per second
+FLEET_RATE = try_parse(float, os.environ.get("FLEET_RATE")) or 10000
+# user_id of the first virtual vehicle, the others get consecutive ids
+FLEET_FIRST_USER_ID = try_parse(int, os.environ.get("FLEET_FIRST_USER_ID")) or USER_ID
+# How often the fleet scheduler wakes up to publish due messages, in seconds
+FLEET_TICK = try_parse(float, os.environ.get("FLEET_TICK")) or 0.005
+# Seed for CSV offsets and phases of the vehicles, unset gives a new fleet on every run
+FLEET_SEED = try_parse(int, os.environ.get("FLEET_SEED"))
+
+# Readings packed into one MQTT frame (1 publishes every reading on its own)
+PUBLISH_BATCH_SIZE = try_parse(int, os.environ.get("PUBLISH_BATCH_SIZE")) or 1
+# Longest time a reading may wait for its frame to fill up, in seconds (0 waits for a full frame)
+PUBLISH_BATCH_WINDOW = try_parse(float, os.environ.get("PUBLISH_BATCH_WINDOW")) or 0
+# "json" or "binary" (compact struct frames, see binary_codec.py)
+WIRE_FORMAT = os.environ.get("WIRE_FORMAT") or "json"
+
+# File buffering frames that could not be published until the broker is back (unset disables it)
+SPOOL_FILE = os.environ.get("SPOOL_FILE") or ""
+# Size of the spool file in megabytes, the oldest frames are dropped when it is full
+SPOOL_SIZE_MB = try_parse(float, os.environ.get("SPOOL_SIZE_MB")) or 64
+# Frames per second re-published from the spool after a reconnect
+SPOOL_DRAIN_RATE = try_parse(float, os.environ.get("SPOOL_DRAIN_RATE")) or 200
+
+# Publish sensor groups as separate streams (agent/<user>/accel, agent/<user>/env), see sensor_streams.py
+SENSOR_STREAMS = os.environ.get("SENSOR_STREAMS") == "1"
+# Prefix of the stream topics
+SENSOR_TOPIC_PREFIX = os.environ.get("SENSOR_TOPIC_PREFIX") or "agent"
+# Accelerometer, gps and vibration messages per second
+ACCEL_RATE = try_parse(float, os.environ.get("ACCEL_RATE")) or 50
+# Parking, temperature, humidity, light and air quality messages per second
+ENV_RATE = try_parse(float, os.environ.get("ENV_RATE")) or 0.1
+
+# Dead-band tolerances per sensor, e.g. "temperature=0.5,humidity=1,light=20,air_quality=5":
+# a sensor is only sent when it moves further than that (unset sends every reading in full).
+# Filtered readings are published on SENSOR_TOPIC_PREFIX/<user>/reading, see deadband.py
+DEADBAND = os.environ.get("DEADBAND") or ""
+# Seconds between full readings when the dead-band filter is on
+DEADBAND_KEYFRAME = try_parse(float, os.environ.get("DEADBAND_KEYFRAME")) or 60
+
+# Publish from a background thread at QoS 1 with a bounded in-flight window, see publisher.py
+ASYNC_PUBLISH = os.environ.get("ASYNC_PUBLISH") == "1"
+# Messages waiting for their PUBACK at most
+INFLIGHT_WINDOW = try_parse(int, os.environ.get("INFLIGHT_WINDOW")) or 100
+# Messages per second at most (0 is unlimited) and how many may go out in one burst
+PUBLISH_RATE = try_parse(float, os.environ.get("PUBLISH_RATE")) or 0
+PUBLISH_BURST = try_parse(int, os.environ.get("PUBLISH_BURST")) or 100
+# Messages queued for the publisher thread before publishing fails
+PUBLISH_QUEUE = try_parse(int, os.environ.get("PUBLISH_QUEUE")) or 10000
+# Seconds between publisher stats reports (0 disables them)
+PUBLISH_STATS_INTERVAL = try_parse(float, os.environ.get("PUBLISH_STATS_INTERVAL")) or 10
@@ -0,0 +1,66 @@
+import math
+import time
+
+
+def parse_tolerances(value: str) -> dict:
+    """Tolerances given as "temperature=0.5,humidity=1" """
+    tolerances = {}
+    for item in filter(None, (item.strip() for item in value.split(","))):
+        channel, tolerance = item.split("=")
+        tolerances[channel.strip()] = float(tolerance)
+    return tolerances
+
+
+def moved(last, value, tolerance: float) -> bool:
+    """True if any number of `value` differs from `last` by more than `tolerance`, or anything else changed"""
+    if isinstance(value, dict):
+        if not isinstance(last, dict):
+            return True
+        return any(moved(last.get(key), item, tolerance) for key, item in value.items())
+    if isinstance(value, (int, float)) and isinstance(last, (int, float)):
+        return abs(value - last) > tolerance
+    return value != last
+
+
+class DeadbandFilter:
+    """Leaves slowly changing sensors out of readings until they really change.
+
+    A sensor with a tolerance in `tolerances` (e.g. {"temperature": 0.5}) is
+    only sent when one of its numbers moved more than the tolerance away from
+    the value last sent for it. Every `keyframe_interval` seconds a user's
+    reading is sent in full, so a receiver that missed messages or restarted
+    catches up. The edge rebuilds complete readings from the last values it
+    received (`StreamMerger`).
+    """
+
+    def __init__(self, tolerances: dict, keyframe_interval: float = 60) -> None:
+        self.tolerances = tolerances
+        self.keyframe_interval = keyframe_interval
+        # user_id -> {sensor: last value sent}
+        self._sent = {}
+        # user_id -> monotonic time of the last full reading
+        self._keyframe_at = {}
+        self.suppressed = 0
+
+    def filter(self, reading: dict) -> dict:
+        """The reading without the sensors that stayed within their tolerance"""
+        user_id = reading["user_id"]
+        sent = self._sent.setdefault(user_id, {})
+        now = time.monotonic()
+        if now - self._keyframe_at.get(user_id, -math.inf) >= self.keyframe_interval:
+            self._keyframe_at[user_id] = now
+            for sensor in self.tolerances:
+                if sensor in reading:
+                    sent[sensor] = reading[sensor]
+            return reading
+
+        message = {}
+        for sensor, value in reading.items():
+            tolerance = self.tolerances.get(sensor)
+            if tolerance is not None:
+                if sensor in sent and not moved(sent[sensor], value, tolerance):
+                    self.suppressed += 1
+                    continue
+                sent[sensor] = value
+            message[sensor] = value
+        return message
@@ -0,0 +1,115 @@
+import os
+import struct
+
+MAGIC = b"AGSPOOL1"
+# magic, capacity, head and tail positions
+HEADER = struct.Struct("<8sQQQ")
+LENGTH = struct.Struct("<I")
+
+
+class DiskRingBuffer:
+    """Bounded append-only ring of records in one file.
+
+    The file is a fixed-size header followed by `capacity` bytes of records,
+    each prefixed with its length. `head` and `tail` are ever-growing logical
+    positions, their remainder by `capacity` is where they are in the file.
+    When a new record does not fit, the oldest ones are dropped. Nothing but
+    the header is kept in memory, so an outage of any length costs at most
+    `capacity` bytes of disk and no extra memory. The buffer survives restarts
+    of the agent.
+    """
+
+    def __init__(self, path: str, capacity: int, sync: bool = False) -> None:
+        self.path = path
+        self.capacity = capacity
+        # fsync after every change, survives power loss but costs a disk flush per record
+        self.sync = sync
+        self.dropped = 0
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        header = os.pread(self._fd, HEADER.size, 0)
+        if len(header) == HEADER.size:
+            magic, stored_capacity, head, tail = HEADER.unpack(header)
+            if magic == MAGIC and stored_capacity == capacity:
+                self.head, self.tail = head, tail
+                self.records = self._count()
+                return
+        # New file, or one written with another capacity
+        os.ftruncate(self._fd, HEADER.size + capacity)
+        self.head = self.tail = 0
+        self.records = 0
+        self._write_header()
+
+    def __len__(self) -> int:
+        return self.records
+
+    @property
+    def used(self) -> int:
+        """Bytes taken by the buffered records"""
+        return self.tail - self.head
+
+    def append(self, payload: bytes) -> bool:
+        """Add a record at the tail, dropping the oldest records if there is no room"""
+        size = LENGTH.size + len(payload)
+        if size > self.capacity:
+            self.dropped += 1
+            return False
+        while self.used + size > self.capacity:
+            self.head += LENGTH.size + self._length_at(self.head)
+            self.records -= 1
+            self.dropped += 1
+        self._write(self.tail, LENGTH.pack(len(payload)) + payload)
+        self.tail += size
+        self.records += 1
+        self._write_header()
+        return True
+
+    def peek(self, max_records: int) -> list:
+        """Up to `max_records` oldest records, left in the buffer until `commit()`"""
+        records = []
+        position = self.head
+        while position < self.tail and len(records) < max_records:
+            length = self._length_at(position)
+            records.append(self._read(position + LENGTH.size, length))
+            position += LENGTH.size + length
+        return records
+
+    def commit(self, count: int) -> None:
+        """Remove the `count` oldest records, once they have been delivered"""
+        for _ in range(min(count, self.records)):
+            self.head += LENGTH.size + self._length_at(self.head)
+            self.records -= 1
+        self._write_header()
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+    def _count(self) -> int:
+        records = 0
+        position = self.head
+        while position < self.tail:
+            position += LENGTH.size + self._length_at(position)
+            records += 1
+        return records
+
+    def _length_at(self, position: int) -> int:
+        return LENGTH.unpack(self._read(position, LENGTH.size))[0]
+
+    def _read(self, position: int, size: int) -> bytes:
+        offset = position % self.capacity
+        first = min(size, self.capacity - offset)
+        data = os.pread(self._fd, first, HEADER.size + offset)
+        if first < size:
+            data += os.pread(self._fd, size - first, HEADER.size)
+        return data
+
+    def _write(self, position: int, data: bytes) -> None:
+        offset = position % self.capacity
+        first = min(len(data), self.capacity - offset)
+        os.pwrite(self._fd, data[:first], HEADER.size + offset)
+        if first < len(data):
+            os.pwrite(self._fd, data[first:], HEADER.size)
+
+    def _write_header(self) -> None:
+        os.pwrite(self._fd, HEADER.pack(MAGIC, self.capacity, self.head, self.tail), 0)
+        if self.sync:
+            os.fsync(self._fd)
@@ -0,0 +1,62 @@
+from dataclasses import dataclass
+from datetime import datetime
+
+import numpy as np
+
+from domain.accelerometer import Accelerometer
+from domain.gps import Gps
+from domain.parking import Parking
+from domain.aggregated_data import AggregatedData
+from domain.temperature import Temperature
+from domain.humidity import Humidity
+from domain.vibration import Vibration
+from domain.light import Light
+from domain.air_quality import AirQuality
+
+
+@dataclass
+class ReadingBatch:
+    """N readings stored column by column.
+
+    Row i of every array belongs to reading i. Domain objects are only built
+    when a reading is indexed, callers that just need the serialized messages
+    never pay for them.
+    """
+
+    user_id: np.ndarray  # (n,) int
+    accelerometer: np.ndarray  # (n, 3) int: x, y, z
+    gps: np.ndarray  # (n, 2) float: longitude, latitude
+    parking: np.ndarray  # (n, 3) float: empty_count, longitude, latitude
+    temperature: np.ndarray  # (n,) float, °C
+    humidity: np.ndarray  # (n,) float, %
+    vibration: np.ndarray  # (n, 3) float: x, y, z
+    light: np.ndarray  # (n,) float, lux
+    air_quality: np.ndarray  # (n, 2) float: pm2_5, pm10
+    aqi: np.ndarray  # (n,) int
+    timestamp: np.ndarray  # (n,) float, POSIX seconds
+
+    def __len__(self) -> int:
+        return len(self.user_id)
+
+    def __getitem__(self, i: int) -> AggregatedData:
+        x, y, z = self.accelerometer[i].tolist()
+        longitude, latitude = self.gps[i].tolist()
+        empty_count, parking_longitude, parking_latitude = self.parking[i].tolist()
+        vx, vy, vz = self.vibration[i].tolist()
+        pm2_5, pm10 = self.air_quality[i].tolist()
+        return AggregatedData(
+            accelerometer=Accelerometer(x, y, z),
+            gps=Gps(longitude, latitude),
+            parking=Parking(int(empty_count), Gps(parking_longitude, parking_latitude)),
+            temperature=Temperature(float(self.temperature[i]), "C"),
+            humidity=Humidity(float(self.humidity[i]), "%"),
+            vibration=Vibration(vx, vy, vz),
+            light=Light(float(self.light[i])),
+            air_quality=AirQuality(pm2_5, pm10, int(self.aqi[i])),
+            timestamp=datetime.fromtimestamp(self.timestamp[i]),
+            user_id=int(self.user_id[i]),
+        )
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
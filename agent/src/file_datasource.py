@@ -1,3 +1,4 @@
+import time
 from csv import reader
 from datetime import datetime
 from domain.accelerometer import Accelerometer
@@ -9,8 +10,33 @@ from domain.humidity import Humidity
 from domain.vibration import Vibration
 from domain.light import Light
 from domain.air_quality import AirQuality
+from domain.reading_batch import ReadingBatch
+import numpy as np
 import config
-import random
+
+# Synthetic readings generated at once for `read()`
+BLOCK_SIZE = 1024
+# Optional column of the accelerometer file with the time of every recorded row
+TIMESTAMP_COLUMN = "timestamp"
+
+
+def accelerometer_columns(header) -> tuple:
+    """Positions of x, y, z in the accelerometer file, which may also hold a timestamp"""
+    if all(name in header for name in ("x", "y", "z")):
+        return tuple(header.index(name) for name in ("x", "y", "z"))
+    return 0, 1, 2
+
+
+def parse_timestamp(value: str) -> float:
+    """Recorded timestamp as POSIX seconds: a number or an ISO 8601 date"""
+    try:
+        return float(value)
+    except ValueError:
+        # fromisoformat of Python < 3.11 does not accept the "Z" suffix
+        if value.endswith("Z"):
+            value = value[:-1] + "+00:00"
+        return datetime.fromisoformat(value).timestamp()
+
 
 class FileDatasource:
     def __init__(
@@ -18,6 +44,7 @@ class FileDatasource:
         accelerometer_filename: str,
         gps_filename: str,
         parking_filename: str,
+        seed: int = None,
     ) -> None:
         self.accel_filename = accelerometer_filename
         self.gps_filename = gps_filename
@@ -30,29 +57,40 @@ class FileDatasource:
 
         with open(self.accel_filename) as file:
             lines = [line.rstrip() for line in file]
+            self.accel_header = lines[0].split(',')
             lines = lines[1:]
             self.accel_lines = lines
+        self.accel_columns = accelerometer_columns(self.accel_header)
 
         with open(self.parking_filename) as file:
             lines = [line.rstrip() for line in file]
             lines = lines[1:]
             self.parking_lines = lines
 
+        # Numeric copies of the files for the batch path, in the column order of
+        # `ReadingBatch` (files store gps as latitude,longitude and parking as
+        # longitude,latitude,empty_count)
+        self.accel_values = self._parse(self.accel_lines, np.int64, self.accel_columns)
+        self.gps_values = self._parse(self.gps_lines, np.float64, (1, 0))
+        self.parking_values = self._parse(self.parking_lines, np.float64, (2, 0, 1))
+
+        # POSIX time of every accelerometer row, None for drives recorded without it
+        self.timestamps = None
+        if TIMESTAMP_COLUMN in self.accel_header:
+            column = self.accel_header.index(TIMESTAMP_COLUMN)
+            self.timestamps = np.array(
+                [parse_timestamp(line.split(',')[column]) for line in self.accel_lines]
+            )
+
+        self.rng = np.random.default_rng(seed)
+        self._block = []
+        self._block_pos = 0
+        # Rows are read from the files between startReading and stopReading
+        self.reading = False
+        self.seek(0)
+
     def read(self) -> AggregatedData:
         """Метод повертає дані отримані з датчиків"""
-        data = AggregatedData(
-            accelerometer=Accelerometer(1, 2, 3),
-            gps=Gps(4, 5),
-            parking=Parking(25, Gps(4, 5)),
-            temperature=Temperature(-376, "C"),
-            humidity=Humidity(0, "%"),
-            vibration=Vibration(1, 2, 3),
-            light=Light(900000),
-            air_quality=AirQuality(-5, -5),
-            timestamp=datetime.now(),
-            user_id=config.USER_ID,
-        )
-
         if self.reading == True:
             if self.gps_line > len(self.gps_lines) - 1:
                 self.gps_line = 0
@@ -63,63 +101,168 @@ class FileDatasource:
             if self.parking_line > len(self.parking_lines) - 1:
                 self.parking_line = 0
 
-            split_gps = self.gps_lines[self.gps_line].split(',')
-            split_accel = self.accel_lines[self.accel_line].split(',')
-            split_parking = self.parking_lines[self.parking_line].split(',')
-
-            lat, long = split_gps
-            data.gps = Gps(long, lat)
-
-            x, y, z = split_accel
-            data.accelerometer = Accelerometer(x, y, z)
-
-            long, lat, empty_count = split_parking
-            data.parking = Parking(empty_count, Gps(long, lat))
+            data = self._read_lines(
+                self.accel_line, self.gps_line, self.parking_line, config.USER_ID
+            )
 
             self.gps_line += 1
             self.accel_line += 1
             self.parking_line += 1
+            return data
+
+        temperature, humidity, vibration, light, air_quality = self._next_synthetic()
+        return AggregatedData(
+            accelerometer=Accelerometer(1, 2, 3),
+            gps=Gps(4, 5),
+            parking=Parking(25, Gps(4, 5)),
+            temperature=temperature,
+            humidity=humidity,
+            vibration=vibration,
+            light=light,
+            air_quality=air_quality,
+            timestamp=datetime.now(),
+            user_id=config.USER_ID,
+        )
+
+    def read_batch(self, n: int) -> ReadingBatch:
+        """Next `n` readings at once, the same rows as `n` calls of `read()`"""
+        offsets = np.arange(n)
+        batch = self._read_rows(
+            (self.accel_line + offsets) % len(self.accel_values),
+            (self.gps_line + offsets) % len(self.gps_values),
+            (self.parking_line + offsets) % len(self.parking_values),
+            np.full(n, config.USER_ID),
+        )
+        self.accel_line = (self.accel_line + n) % len(self.accel_values)
+        self.gps_line = (self.gps_line + n) % len(self.gps_values)
+        self.parking_line = (self.parking_line + n) % len(self.parking_values)
+        return batch
+
+    def read_rows(self, offsets: np.ndarray, user_ids: np.ndarray) -> ReadingBatch:
+        """Vectorized `read_at`: one reading per (offset, user_id) pair"""
+        return self._read_rows(
+            offsets % len(self.accel_values),
+            offsets % len(self.gps_values),
+            offsets % len(self.parking_values),
+            user_ids,
+        )
+
+    def read_at(self, offset: int, user_id: int) -> AggregatedData:
+        """Reading of a virtual vehicle which is `offset` rows into the recorded drive.
+
+        Every file wraps around on its own, exactly like `read()` does, so a single
+        counter is enough to describe the position of a vehicle in all three files.
+        """
+        return self._read_lines(
+            offset % len(self.accel_lines),
+            offset % len(self.gps_lines),
+            offset % len(self.parking_lines),
+            user_id,
+        )
+
+    @property
+    def size(self) -> int:
+        """Number of rows after which the longest file starts over"""
+        return max(len(self.accel_values), len(self.gps_values), len(self.parking_values))
 
-        data.temperature = self._generate_temperature()
-        data.humidity = self._generate_humidity()
-        data.vibration = self._generate_vibration()
-        data.light = self._generate_light()
-        data.air_quality = self._generate_air_quality()
+    def seek(self, offset: int) -> None:
+        """Move the reading position `offset` rows into the recorded drive, startReading keeps it"""
+        self.accel_line = offset % len(self.accel_values)
+        self.gps_line = offset % len(self.gps_values)
+        self.parking_line = offset % len(self.parking_values)
 
-        return data
+    def _read_lines(
+        self, accel_line: int, gps_line: int, parking_line: int, user_id: int
+    ) -> AggregatedData:
+        split_gps = self.gps_lines[gps_line].split(',')
+        split_accel = self.accel_lines[accel_line].split(',')
+        split_parking = self.parking_lines[parking_line].split(',')
+
+        lat, long = split_gps
+        x, y, z = (split_accel[column] for column in self.accel_columns)
+        parking_long, parking_lat, empty_count = split_parking
+
+        temperature, humidity, vibration, light, air_quality = self._next_synthetic()
+        return AggregatedData(
+            accelerometer=Accelerometer(x, y, z),
+            gps=Gps(long, lat),
+            parking=Parking(empty_count, Gps(parking_long, parking_lat)),
+            temperature=temperature,
+            humidity=humidity,
+            vibration=vibration,
+            light=light,
+            air_quality=air_quality,
+            timestamp=datetime.now(),
+            user_id=user_id,
+        )
+
+    def _read_rows(
+        self,
+        accel_rows: np.ndarray,
+        gps_rows: np.ndarray,
+        parking_rows: np.ndarray,
+        user_ids: np.ndarray,
+    ) -> ReadingBatch:
+        n = len(user_ids)
+        return ReadingBatch(
+            user_id=np.asarray(user_ids),
+            accelerometer=self.accel_values[accel_rows],
+            gps=self.gps_values[gps_rows],
+            parking=self.parking_values[parking_rows],
+            timestamp=np.full(n, time.time()),
+            **self._generate_block(n),
+        )
+
+    @staticmethod
+    def _parse(lines, dtype, columns: tuple) -> np.ndarray:
+        rows = (line.split(',') for line in lines)
+        return np.array(
+            [[row[column] for column in columns] for row in rows], dtype=dtype
+        ).reshape(-1, len(columns))
 
     def startReading(self, *args, **kwargs):
         """Метод повинен викликатись перед початком читання даних"""
+        # Reading starts at the position given to seek, the first row by default
         self.reading = True
-        self.accel_line = 0
-        self.gps_line = 0
-        self.parking_line = 0
 
     def stopReading(self, *args, **kwargs):
         """Метод повинен викликатись для закінчення читання даних"""
         self.reading = False
 
     # Генератори випадкових даних
-    def _generate_temperature(self) -> Temperature:
-        value = round(random.uniform(-10.0, 40.0), 2)
-        return Temperature(value=value, unit="C")
-
-    def _generate_humidity(self) -> Humidity:
-        value = round(random.uniform(0.0, 100.0), 2)
-        return Humidity(value=value, unit="%")
-
-    def _generate_vibration(self) -> Vibration:
-        x = round(random.uniform(-5.0, 5.0), 3)
-        y = round(random.uniform(-5.0, 5.0), 3)
-        z = round(random.uniform(-5.0, 5.0), 3)
-        return Vibration(x=x, y=y, z=z)
-
-    def _generate_light(self) -> Light:
-        illum = round(random.uniform(0.0, 2000.0), 1)
-        return Light(illumination=illum)
-
-    def _generate_air_quality(self) -> AirQuality:
-        pm2_5 = round(random.uniform(0.0, 500.0), 1)
-        pm10 = round(random.uniform(0.0, 600.0), 1)
-        aqi = random.randint(0, 300)
-        return AirQuality(pm2_5=pm2_5, pm10=pm10, aqi=aqi)
\ No newline at end of file
+    def _generate_block(self, n: int) -> dict:
+        """Synthetic sensor columns for `n` readings, keyed by `ReadingBatch` field"""
+        rng = self.rng
+        return dict(
+            temperature=np.round(rng.uniform(-10.0, 40.0, n), 2),
+            humidity=np.round(rng.uniform(0.0, 100.0, n), 2),
+            vibration=np.round(rng.uniform(-5.0, 5.0, (n, 3)), 3),
+            light=np.round(rng.uniform(0.0, 2000.0, n), 1),
+            air_quality=np.round(rng.uniform((0.0, 0.0), (500.0, 600.0), (n, 2)), 1),
+            aqi=rng.integers(0, 300, n, endpoint=True),
+        )
+
+    def _next_synthetic(self):
+        """Domain objects of one synthetic reading, taken from a pre-generated block"""
+        if self._block_pos == len(self._block):
+            block = self._generate_block(BLOCK_SIZE)
+            self._block = list(
+                zip(
+                    block["temperature"].tolist(),
+                    block["humidity"].tolist(),
+                    block["vibration"].tolist(),
+                    block["light"].tolist(),
+                    block["air_quality"].tolist(),
+                    block["aqi"].tolist(),
+                )
+            )
+            self._block_pos = 0
+        temperature, humidity, (x, y, z), light, (pm2_5, pm10), aqi = self._block[self._block_pos]
+        self._block_pos += 1
+        return (
+            Temperature(value=temperature, unit="C"),
+            Humidity(value=humidity, unit="%"),
+            Vibration(x=x, y=y, z=z),
+            Light(illumination=light),
+            AirQuality(pm2_5=pm2_5, pm10=pm10, aqi=aqi),
+        )
@@ -0,0 +1,95 @@
+import asyncio
+import time
+
+import numpy as np
+
+from schema.aggregated_data_schema import dump_reading_batch
+
+
+class Fleet:
+    """Many virtual vehicles replaying one datasource from a single asyncio loop.
+
+    A vehicle is not an object, a thread or an MQTT client: it is one slot in a
+    few NumPy arrays (user_id, CSV offset, phase). The whole fleet shares the
+    datasource and the MQTT connection, so thousands of vehicles cost a few
+    kilobytes of state.
+    """
+
+    def __init__(
+        self,
+        datasource,
+        size: int,
+        rate: float,
+        first_user_id: int = 1,
+        tick: float = 0.005,
+        seed: int = None,
+    ) -> None:
+        self.datasource = datasource
+        self.size = size
+        self.rate = rate
+        self.tick = tick
+        rng = np.random.default_rng(seed)
+        self.user_ids = np.arange(first_user_id, first_user_id + size)
+        # Every vehicle starts somewhere else in the recorded drive
+        self.offsets = rng.integers(0, datasource.size, size)
+        # Phase of a vehicle inside one publish period, in [0, 1). Vehicles fire
+        # in the order of their phases, so the fleet publishes evenly instead of
+        # all vehicles ticking at the same moment.
+        self.phases = rng.random(size)
+        self.order = np.argsort(self.phases)
+        self._cursor = 0
+
+    @property
+    def period(self) -> float:
+        """Seconds between two messages of the same vehicle"""
+        return self.size / self.rate
+
+    def next_batch(self, count: int):
+        """Readings of the next `count` vehicles in firing order, as `ReadingBatch`es.
+
+        A batch never holds the same vehicle twice, so fleets smaller than
+        `count` yield several batches.
+        """
+        while count > 0:
+            chunk = min(count, self.size - self._cursor)
+            slots = self.order[self._cursor:self._cursor + chunk]
+            yield self.datasource.read_rows(self.offsets[slots], self.user_ids[slots])
+            self.offsets[slots] += 1
+            self._cursor = (self._cursor + chunk) % self.size
+            count -= chunk
+
+    async def run(self, batcher, max_burst: int = None, report_every: float = 5):
+        """Publish readings through a `FrameBatcher` at the aggregate `rate` until cancelled.
+
+        The number of due messages is derived from the time elapsed since the
+        start, not from the number of sleeps, so scheduler jitter does not
+        accumulate into a lower rate. When the publisher falls behind, at most
+        `max_burst` messages are sent per tick and the backlog is skipped.
+        """
+        if max_burst is None:
+            max_burst = max(1, int(self.rate * self.tick * 10))
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        scheduled = 0
+        reported_at, reported_sent = time.monotonic(), batcher.sent_readings
+        while True:
+            due = int((loop.time() - start) * self.rate) - scheduled
+            if due > max_burst:
+                scheduled += due - max_burst
+                due = max_burst
+            for batch in self.next_batch(due):
+                for reading in dump_reading_batch(batch):
+                    batcher.add(reading)
+            batcher.poll()
+            scheduled += due
+
+            now = time.monotonic()
+            if now - reported_at >= report_every:
+                rate = (batcher.sent_readings - reported_sent) / (now - reported_at)
+                print(
+                    f"Fleet of {self.size} vehicles: {rate:.0f} msg/s "
+                    f"(target {self.rate:.0f}) in {batcher.sent_frames} frames, "
+                    f"failed {batcher.failed_readings}"
+                )
+                reported_at, reported_sent = now, batcher.sent_readings
+            await asyncio.sleep(self.tick)
@@ -0,0 +1,120 @@
+import json
+import time
+
+import binary_codec
+
+
+class FrameBatcher:
+    """Packs readings into frames and publishes one frame per MQTT message.
+
+    A frame is a JSON array of readings, or a binary frame (see `binary_codec`)
+    with `wire_format="binary"`. It is published once it holds `max_readings`
+    readings or its first reading has waited `window` seconds. With
+    `max_readings=1` and JSON every reading is published as a plain JSON object,
+    exactly as before batching existed.
+
+    Frames that cannot be published go to `spool` (a `DiskRingBuffer`) if one
+    is given, and are re-published from there at up to `drain_rate` frames per
+    second once the client is connected again.
+
+    With a `deadband` filter (see `deadband.py`) readings leave out the sensors
+    that did not change enough, such partial readings need JSON.
+    """
+
+    def __init__(
+        self,
+        client,
+        topic,
+        max_readings: int = 1,
+        window: float = 0,
+        wire_format: str = "json",
+        spool=None,
+        drain_rate: float = 200,
+        deadband=None,
+    ) -> None:
+        self.client = client
+        self.topic = topic
+        # A frame is one message, binary frames hold at most MAX_RECORDS readings
+        if wire_format == "binary":
+            max_readings = min(max_readings, binary_codec.MAX_RECORDS)
+        self.max_readings = max_readings
+        self.window = window
+        self.wire_format = wire_format
+        self.spool = spool
+        self.drain_rate = drain_rate
+        self.deadband = deadband
+        self.sent_readings = 0
+        self.sent_frames = 0
+        self.failed_readings = 0
+        self.spooled_frames = 0
+        self.drained_frames = 0
+        self._drained_at = time.monotonic()
+        self._pending = []
+        self._first_at = None
+
+    def add(self, reading: dict) -> None:
+        """Queue one reading, dumped to a JSON-ready dict, publishing the frame when it is due"""
+        if self.deadband is not None:
+            reading = self.deadband.filter(reading)
+        if not self._pending:
+            self._first_at = time.monotonic()
+        self._pending.append(reading)
+        if len(self._pending) >= self.max_readings:
+            self.flush()
+        # Publishing loops that only call add must still drain the spool
+        self.poll()
+
+    def poll(self) -> None:
+        """Publish a partial frame whose window has elapsed and drain the spool"""
+        if (
+            self._pending
+            and self.window > 0
+            and time.monotonic() - self._first_at >= self.window
+        ):
+            self.flush()
+        self.drain()
+
+    def flush(self) -> bool:
+        """Publish whatever is queued as one frame"""
+        if not self._pending:
+            return True
+        pending, self._pending = self._pending, []
+        if self.wire_format == "binary":
+            frame = binary_codec.encode_frame(binary_codec.KIND_AGGREGATED, pending)
+        elif len(pending) == 1 and self.max_readings == 1:
+            frame = json.dumps(pending[0])
+        else:
+            frame = json.dumps(pending)
+        result = self.client.publish(self.topic, frame)
+        if result[0] == 0:
+            self.sent_frames += 1
+            self.sent_readings += len(pending)
+            return True
+        self.failed_readings += len(pending)
+        if self.spool is not None:
+            self.spool.append(frame if isinstance(frame, bytes) else frame.encode("utf-8"))
+            self.spooled_frames += 1
+        else:
+            print(f"Failed to send message to topic {self.topic}")
+        return False
+
+    def drain(self) -> None:
+        """Re-publish spooled frames, oldest first, at up to `drain_rate` frames per second"""
+        now = time.monotonic()
+        if self.spool is None or not len(self.spool):
+            self._drained_at = now
+            return
+        if not self.client.is_connected():
+            return
+        # Budget earned since the last drain, at most one second worth of frames
+        budget = min(int((now - self._drained_at) * self.drain_rate), int(self.drain_rate))
+        if budget < 1:
+            return
+        self._drained_at = now
+        published = 0
+        for frame in self.spool.peek(budget):
+            if self.client.publish(self.topic, frame)[0] != 0:
+                break
+            published += 1
+        self.spool.commit(published)
+        self.drained_frames += published
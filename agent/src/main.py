@@ -1,9 +1,19 @@
 from paho.mqtt import client as mqtt_client
+import asyncio
 import json
 import time
 from schema.aggregated_data_schema import AggregatedDataSchema
 from schema.parking_schema import ParkingSchema 
 from file_datasource import FileDatasource
+from mmap_datasource import MmapDatasource
+from replay import Replay
+from fleet import Fleet
+from sensor_streams import SensorStreams
+from frame_batcher import FrameBatcher
+from disk_ring_buffer import DiskRingBuffer
+from deadband import DeadbandFilter, parse_tolerances
+from publisher import AsyncPublisher
+from sharding import ShardedBatcher, shard_topic
 import config
 
 def connect_mqtt(broker, port):
@@ -23,29 +33,129 @@ def connect_mqtt(broker, port):
     client.loop_start()
     return client
 
-def publish(client, topic, datasource, delay):
+def publish(batcher, datasource, delay):
     datasource.startReading()
+    schema = AggregatedDataSchema()
     while True:
         time.sleep(delay)
         data = datasource.read()
-        msg = AggregatedDataSchema().dumps(data)
-        result = client.publish(topic, msg)
-        status = result[0]
-        if status == 0:
-            pass
-            # print(f"Send `{msg}` to topic `{topic}`")
-        else:
-            print(f"Failed to send message to topic {topic}")
+        batcher.add(schema.dump(data))
 
 def run():
     # Prepare mqtt client
     client = connect_mqtt(config.MQTT_BROKER_HOST, config.MQTT_BROKER_PORT)
+    if config.ASYNC_PUBLISH:
+        # Batchers hand their frames to the publisher thread instead of the client
+        client = AsyncPublisher(
+            client,
+            window=config.INFLIGHT_WINDOW,
+            rate=config.PUBLISH_RATE,
+            burst=config.PUBLISH_BURST,
+            max_queue=config.PUBLISH_QUEUE,
+            report_every=config.PUBLISH_STATS_INTERVAL,
+        )
+        client.start()
+
+    # Keep frames that could not be published on disk until the broker is back
+    spool = None
+    if config.SPOOL_FILE:
+        spool = DiskRingBuffer(config.SPOOL_FILE, int(config.SPOOL_SIZE_MB * 1024 * 1024))
+
+    # Leave sensors that barely changed out of the readings
+    tolerances = parse_tolerances(config.DEADBAND)
+
+    def deadband():
+        if not tolerances:
+            return None
+        return DeadbandFilter(tolerances, config.DEADBAND_KEYFRAME)
+
+    # Pack readings into frames (one reading per frame unless batching is configured).
+    # Partial readings go to a stream topic, where the edge merges them with the last values
+    topic = f"{config.SENSOR_TOPIC_PREFIX}/{config.USER_ID}/reading" if tolerances else config.MQTT_TOPIC
+    batcher = FrameBatcher(
+        client,
+        shard_topic(topic, config.USER_ID, config.MQTT_SHARDS),
+        max_readings=config.PUBLISH_BATCH_SIZE,
+        window=config.PUBLISH_BATCH_WINDOW,
+        wire_format="json" if tolerances else config.WIRE_FORMAT,
+        spool=spool,
+        drain_rate=config.SPOOL_DRAIN_RATE,
+        deadband=deadband(),
+    )
 
     # Prepare datasource
-    datasource = FileDatasource("data/accelerometer.csv", "data/gps.csv", "data/parking.csv")
+    datasource_class = MmapDatasource if config.DATASOURCE == "mmap" else FileDatasource
+    datasource = datasource_class(
+        config.ACCELEROMETER_FILE, config.GPS_FILE, config.PARKING_FILE
+    )
+
+    if config.FLEET_SIZE > 0:
+        # Drive a fleet of virtual vehicles for load testing
+        fleet = Fleet(
+            datasource,
+            size=config.FLEET_SIZE,
+            rate=config.FLEET_RATE,
+            first_user_id=config.FLEET_FIRST_USER_ID,
+            tick=config.FLEET_TICK,
+            seed=config.FLEET_SEED,
+        )
+        if config.MQTT_SHARDS:
+            # A batcher per shard topic. The spool would re-publish frames on
+            # the topic of whichever batcher drains it, so sharded fleets go without
+            batcher = ShardedBatcher(
+                lambda shard: FrameBatcher(
+                    client,
+                    shard,
+                    max_readings=config.PUBLISH_BATCH_SIZE,
+                    window=config.PUBLISH_BATCH_WINDOW,
+                    wire_format="json" if tolerances else config.WIRE_FORMAT,
+                    deadband=deadband(),
+                ),
+                topic,
+                config.MQTT_SHARDS,
+            )
+        asyncio.run(fleet.run(batcher))
+        return
+
+    if config.SENSOR_STREAMS:
+        # Every sensor group at its own rate, on its own topic. Stream messages
+        # are partial readings, which the binary format cannot carry. Only motion
+        # is spooled, a lost env message is superseded by the next one anyway
+        batchers = {
+            stream: FrameBatcher(
+                client,
+                shard_topic(
+                    f"{config.SENSOR_TOPIC_PREFIX}/{config.USER_ID}/{stream}",
+                    config.USER_ID,
+                    config.MQTT_SHARDS,
+                ),
+                max_readings=config.PUBLISH_BATCH_SIZE,
+                window=config.PUBLISH_BATCH_WINDOW,
+                spool=spool if stream == "accel" else None,
+                drain_rate=config.SPOOL_DRAIN_RATE,
+                deadband=deadband(),
+            )
+            for stream in ("accel", "env")
+        }
+        streams = SensorStreams(
+            datasource, batchers, {"accel": config.ACCEL_RATE, "env": config.ENV_RATE}
+        )
+        streams.run()
+        return
+
+    if config.REPLAY_SPEED:
+        # Reproduce the timing of the recorded drive
+        replay = Replay(
+            datasource,
+            speed=config.REPLAY_SPEED,
+            delay=config.DELAY,
+            recorded_timestamps=config.REPLAY_RECORDED_TIMESTAMPS,
+        )
+        replay.run(batcher)
+        return
 
     # Infinity publish data into two topics
-    publish(client, config.MQTT_TOPIC, datasource, config.DELAY)
+    publish(batcher, datasource, config.DELAY)
 
 if __name__ == "__main__":
     run()
@@ -0,0 +1,170 @@
+import mmap
+from collections import OrderedDict
+from io import BytesIO
+
+import numpy as np
+
+from domain.aggregated_data import AggregatedData
+from file_datasource import (
+    FileDatasource,
+    TIMESTAMP_COLUMN,
+    accelerometer_columns,
+    parse_timestamp,
+)
+
+# Rows parsed together; the file keeps the byte offset of every block only
+BLOCK_ROWS = 256
+# Bytes scanned at once while indexing a file
+SCAN_CHUNK = 64 * 1024 * 1024
+
+
+class MappedCsv:
+    """A CSV file mapped into memory and parsed lazily, block by block.
+
+    Only the byte offset of every `BLOCK_ROWS`-th row is kept (8 bytes per
+    block), rows are parsed into NumPy arrays when they are first requested
+    and the most recently used blocks are cached. Indexing with an array of
+    row numbers works like indexing a 2-D NumPy array, so any number of
+    readers at different offsets share one mapping. Readers that move through
+    the file independently (fleet vehicles) each keep roughly one block hot,
+    so `cache_blocks` should not be smaller than their number.
+    """
+
+    def __init__(
+        self, filename: str, columns, dtype, converter=None, cache_blocks: int = 4096
+    ) -> None:
+        self.filename = filename
+        self.dtype = dtype
+        self.cache_blocks = cache_blocks
+        self._file = open(filename, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        header_end = self._map.find(b"\n") + 1
+        self.header = self._map[:header_end].decode("utf-8").strip().split(",")
+        # Columns are given by position or by header name
+        self.columns = tuple(
+            self.header.index(column) if isinstance(column, str) else column
+            for column in columns
+        )
+        # Function parsing a text value, for columns NumPy cannot parse itself
+        self.converter = converter
+        self._block_starts, self.rows = self._index(header_end)
+        self._cache = OrderedDict()
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def __getitem__(self, rows) -> np.ndarray:
+        rows = np.asarray(rows)
+        values = np.empty((len(rows), len(self.columns)), dtype=self.dtype)
+        blocks = rows // BLOCK_ROWS
+        order = np.argsort(blocks, kind="stable")
+        unique_blocks, firsts = np.unique(blocks[order], return_index=True)
+        lasts = np.append(firsts[1:], len(rows))
+        for block, first, last in zip(unique_blocks.tolist(), firsts.tolist(), lasts.tolist()):
+            selected = order[first:last]
+            values[selected] = self._block(block)[rows[selected] - block * BLOCK_ROWS]
+        return values
+
+    def close(self) -> None:
+        self._cache.clear()
+        self._map.close()
+        self._file.close()
+
+    def _index(self, header_end: int):
+        """Byte offsets of every `BLOCK_ROWS`-th row and the number of rows"""
+        size = len(self._map)
+        starts = [np.array([header_end], dtype=np.int64)]
+        rows = 0
+        for offset in range(header_end, size, SCAN_CHUNK):
+            count = min(SCAN_CHUNK, size - offset)
+            chunk = np.frombuffer(self._map, dtype=np.uint8, count=count, offset=offset)
+            # A newline ends row `rows + i` and starts the next one
+            ends = np.flatnonzero(chunk == ord("\n")) + offset + 1
+            row_numbers = np.arange(rows + 1, rows + 1 + len(ends))
+            rows += len(ends)
+            starts.append(ends[(row_numbers % BLOCK_ROWS == 0) & (ends < size)])
+        if size > header_end and self._map[size - 1:size] != b"\n":
+            rows += 1  # last row without a trailing newline
+        return np.concatenate(starts), rows
+
+    def _block(self, block: int) -> np.ndarray:
+        values = self._cache.get(block)
+        if values is not None:
+            self._cache.move_to_end(block)
+            return values
+        start = self._block_starts[block]
+        end = (
+            self._block_starts[block + 1]
+            if block + 1 < len(self._block_starts)
+            else len(self._map)
+        )
+        values = np.loadtxt(
+            BytesIO(self._map[start:end]),
+            delimiter=",",
+            dtype=self.dtype,
+            usecols=self.columns,
+            converters=self.converter,
+            ndmin=2,
+        )
+        self._cache[block] = values
+        if len(self._cache) > self.cache_blocks:
+            self._cache.popitem(last=False)
+        return values
+
+
+class MmapDatasource(FileDatasource):
+    """`FileDatasource` for recorded drives too large to load into memory.
+
+    The three files are memory-mapped instead of read into lists, so startup
+    only scans them for line offsets and memory does not grow with their size.
+    Every reader (the agent itself or each vehicle of a fleet) is just an
+    offset into the shared mappings, see `seek()` and `read_rows()`.
+    """
+
+    def __init__(
+        self,
+        accelerometer_filename: str,
+        gps_filename: str,
+        parking_filename: str,
+        seed: int = None,
+    ) -> None:
+        self.accel_filename = accelerometer_filename
+        self.gps_filename = gps_filename
+        self.parking_filename = parking_filename
+
+        # Same column order as the arrays of `FileDatasource`
+        with open(accelerometer_filename) as file:
+            self.accel_header = file.readline().rstrip().split(",")
+        self.accel_columns = accelerometer_columns(self.accel_header)
+        self.accel_values = MappedCsv(accelerometer_filename, self.accel_columns, np.int64)
+        self.gps_values = MappedCsv(gps_filename, (1, 0), np.float64)
+        self.parking_values = MappedCsv(parking_filename, (2, 0, 1), np.float64)
+
+        self.timestamps = None
+        if TIMESTAMP_COLUMN in self.accel_header:
+            self.timestamps = MappedCsv(
+                accelerometer_filename,
+                (TIMESTAMP_COLUMN,),
+                np.float64,
+                converter=parse_timestamp,
+            )
+
+        self.rng = np.random.default_rng(seed)
+        self._block = []
+        self._block_pos = 0
+        self.reading = False
+        self.seek(0)
+
+    def read(self) -> AggregatedData:
+        """Метод повертає дані отримані з датчиків"""
+        if self.reading == True:
+            return self.read_batch(1)[0]
+        return super().read()
+
+    def read_at(self, offset: int, user_id: int) -> AggregatedData:
+        return self.read_rows(np.array([offset]), np.array([user_id]))[0]
+
+    def close(self) -> None:
+        for mapped in (self.accel_values, self.gps_values, self.parking_values, self.timestamps):
+            if mapped is not None:
+                mapped.close()
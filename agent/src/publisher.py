@@ -0,0 +1,177 @@
+import threading
+import time
+from collections import deque
+
+import numpy as np
+from paho.mqtt import client as mqtt_client
+
+# Publish-to-ack latencies kept for the percentiles
+LATENCY_SAMPLES = 10000
+
+
+class AsyncPublisher:
+    """Publishes from a background thread at QoS 1 with a bounded in-flight window.
+
+    Stands in for the paho client where `FrameBatcher` publishes: `publish()`
+    only queues the message and returns at once. The thread sends at most
+    `rate` messages per second (token bucket holding up to `burst` tokens, 0
+    is unlimited) and keeps at most `window` messages waiting for their PUBACK.
+    When the broker slows down the window fills, then the queue, and once
+    `max_queue` messages are waiting `publish()` fails, so the caller can
+    spool or drop instead of blocking.
+
+    `stats()` returns the counters and the publish-to-ack latency percentiles,
+    which show agent-side saturation before it shows up downstream.
+
+    The edge's HubBatchMqttAdapter keeps a similar window, but it is not
+    shared: the agent and the edge are built and deployed separately, and
+    the edge's flusher blocks until the window has room and fails batches at
+    close's deadline, where the agent must never block the sensor loop and
+    fails at `publish()` so FrameBatcher can spool the frame instead.
+    """
+
+    def __init__(
+        self,
+        client,
+        window: int = 100,
+        rate: float = 0,
+        burst: int = 100,
+        max_queue: int = 10000,
+        report_every: float = 10,
+    ) -> None:
+        self.client = client
+        self.window = window
+        self.rate = rate
+        self.burst = burst
+        self.max_queue = max_queue
+        self.report_every = report_every
+        self.sent = 0
+        self.acked = 0
+        self.dropped = 0
+        self.failed = 0
+        self.in_flight = 0
+        self._queue = deque()
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        # mid -> monotonic time it was handed to paho
+        self._sent_at = {}
+        # mid -> time of a PUBACK that arrived before paho returned the mid
+        self._early_acks = {}
+        self._latencies = deque(maxlen=LATENCY_SAMPLES)
+        self._tokens = burst
+        self._refilled_at = time.monotonic()
+        self._running = False
+        self._thread = None
+        client.max_inflight_messages_set(window)
+        client.on_publish = self._on_publish
+
+    def is_connected(self) -> bool:
+        return self.client.is_connected()
+
+    def publish(self, topic: str, payload):
+        """Queue a message, returns (rc, mid) like the paho client with rc 0 when it was queued"""
+        with self._changed:
+            if len(self._queue) >= self.max_queue:
+                self.dropped += 1
+                return mqtt_client.MQTT_ERR_QUEUE_SIZE, None
+            self._queue.append((topic, payload))
+            self._changed.notify_all()
+        return mqtt_client.MQTT_ERR_SUCCESS, None
+
+    def start(self) -> None:
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        with self._changed:
+            self._running = False
+            self._changed.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+
+    def stats(self) -> dict:
+        """Counters and latency percentiles in milliseconds"""
+        with self._lock:
+            latencies = np.array(self._latencies)
+            stats = dict(
+                sent=self.sent,
+                acked=self.acked,
+                dropped=self.dropped,
+                failed=self.failed,
+                in_flight=self.in_flight,
+                queue_depth=len(self._queue),
+            )
+        for percentile in (50, 95, 99):
+            stats[f"p{percentile}_ms"] = (
+                float(np.percentile(latencies, percentile)) * 1000 if len(latencies) else None
+            )
+        return stats
+
+    def _run(self) -> None:
+        reported_at = time.monotonic()
+        while True:
+            with self._changed:
+                while self._running and (not self._queue or self.in_flight >= self.window):
+                    self._changed.wait(0.5)
+                    if self.report_every and time.monotonic() - reported_at >= self.report_every:
+                        break
+                if not self._running:
+                    return
+                message = None
+                if self._queue and self.in_flight < self.window:
+                    message = self._queue.popleft()
+                    self.in_flight += 1
+
+            if message is not None:
+                self._take_token()
+                self._send(*message)
+            if self.report_every and time.monotonic() - reported_at >= self.report_every:
+                reported_at = time.monotonic()
+                print(f"Publisher: {self.stats()}")
+
+    def _send(self, topic: str, payload) -> None:
+        sent_at = time.monotonic()
+        result = self.client.publish(topic, payload, qos=1)
+        with self._changed:
+            # Without a connection paho keeps QoS 1 messages and sends them on reconnect
+            if result.rc not in (mqtt_client.MQTT_ERR_SUCCESS, mqtt_client.MQTT_ERR_NO_CONN):
+                self.failed += 1
+                self.in_flight -= 1
+                self._changed.notify_all()
+                return
+            self.sent += 1
+            acked_at = self._early_acks.pop(result.mid, None)
+            if acked_at is None:
+                self._sent_at[result.mid] = sent_at
+            else:
+                self._acked(acked_at - sent_at)
+
+    def _on_publish(self, client, userdata, mid) -> None:
+        acked_at = time.monotonic()
+        with self._changed:
+            sent_at = self._sent_at.pop(mid, None)
+            if sent_at is None:
+                self._early_acks[mid] = acked_at
+            else:
+                self._acked(acked_at - sent_at)
+
+    def _acked(self, latency: float) -> None:
+        # Called with the lock held
+        self.acked += 1
+        self.in_flight -= 1
+        self._latencies.append(latency)
+        self._changed.notify_all()
+
+    def _take_token(self) -> None:
+        """Wait for the token bucket to allow one more message"""
+        if not self.rate:
+            return
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+        if self._tokens < 1:
+            time.sleep((1 - self._tokens) / self.rate)
+            self._tokens = 1
+            self._refilled_at = time.monotonic()
+        self._tokens -= 1
@@ -0,0 +1,87 @@
+import math
+import time
+
+import numpy as np
+
+from schema.aggregated_data_schema import dump_reading_batch
+
+
+class Replay:
+    """Publishes a recorded drive with the timing it was recorded with.
+
+    Row times come from the timestamp column of the accelerometer file, drives
+    without one are replayed at one row every `delay` seconds. `speed` scales
+    the timing (2 plays twice as fast), `math.inf` publishes as fast as
+    possible. When the drive ends it starts over, shifted by its duration.
+
+    Every row has an absolute due time relative to the start of the replay,
+    the loop sleeps until the next due time instead of sleeping fixed gaps, so
+    time spent reading and publishing never accumulates into drift. Rows that
+    are already due are read and published together as one batch, which is
+    what lets bursts of the recording come out as bursts. A row recorded
+    before the row ahead of it is due together with that row.
+    """
+
+    def __init__(
+        self,
+        datasource,
+        speed: float = 1.0,
+        delay: float = 1.0,
+        recorded_timestamps: bool = False,
+        max_batch: int = 1024,
+    ) -> None:
+        self.datasource = datasource
+        self.speed = speed
+        self.delay = delay
+        # Stamp readings with their recorded time instead of the time they are replayed at
+        self.recorded_timestamps = recorded_timestamps
+        self.max_batch = max_batch
+        self.rows = len(datasource.accel_values)
+        timestamps = datasource.timestamps
+        if timestamps is None or self.rows < 2:
+            self._first = 0.0
+            self._lap = self.rows * delay
+        else:
+            self._first = float(np.ravel(timestamps[np.array([0])])[0])
+            last = float(np.ravel(timestamps[np.array([self.rows - 1])])[0])
+            # The next lap starts one average gap after the last row
+            self._lap = (last - self._first) * self.rows / (self.rows - 1)
+
+    def schedule(self, first_row: int, count: int) -> np.ndarray:
+        """Recorded time of rows `first_row`.. since the start of the drive, in seconds"""
+        laps, rows = np.divmod(np.arange(first_row, first_row + count), self.rows)
+        if self.datasource.timestamps is None:
+            offsets = rows * self.delay
+        else:
+            offsets = np.ravel(self.datasource.timestamps[rows]) - self._first
+        return offsets + laps * self._lap
+
+    def run(self, batcher) -> None:
+        """Replay the drive through a `FrameBatcher` forever"""
+        self.datasource.startReading()
+        started_at = time.time()
+        started = time.monotonic()
+        row = 0
+        # Recorded time of the last published row, due times never go back before it
+        floor = -math.inf
+        while True:
+            # Out of order timestamps would break searchsorted
+            recorded = np.maximum.accumulate(np.maximum(self.schedule(row, self.max_batch), floor))
+            due_at = recorded / self.speed if self.speed != math.inf else np.zeros_like(recorded)
+            elapsed = time.monotonic() - started
+            due = int(np.searchsorted(due_at, elapsed, side="right"))
+            if due == 0:
+                batcher.poll()
+                time.sleep(due_at[0] - elapsed)
+                continue
+
+            batch = self.datasource.read_batch(due)
+            if self.recorded_timestamps and self.datasource.timestamps is not None:
+                batch.timestamp = self._first + recorded[:due]
+            elif self.speed != math.inf:
+                batch.timestamp = started_at + due_at[:due]
+            for reading in dump_reading_batch(batch):
+                batcher.add(reading)
+            batcher.poll()
+            row += due
+            floor = recorded[due - 1]
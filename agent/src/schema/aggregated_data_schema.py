@@ -1,3 +1,5 @@
+from datetime import datetime
+
 from marshmallow import Schema, fields
 from schema.accelerometer_schema import AccelerometerSchema
 from schema.gps_schema import GpsSchema
@@ -20,3 +22,47 @@ class AggregatedDataSchema(Schema):
     air_quality = fields.Nested(AirQualitySchema)
     timestamp = fields.DateTime("iso")
     user_id = fields.Int()
+
+
+def dump_reading_batch(batch) -> list:
+    """Readings of a `ReadingBatch` as JSON-ready dicts, without domain objects"""
+    timestamps = {}
+    records = []
+    for (
+        user_id, (x, y, z), (longitude, latitude), (empty_count, parking_longitude, parking_latitude),
+        temperature, humidity, (vx, vy, vz), light, (pm2_5, pm10), aqi, timestamp,
+    ) in zip(
+        batch.user_id.tolist(),
+        batch.accelerometer.tolist(),
+        batch.gps.tolist(),
+        batch.parking.tolist(),
+        batch.temperature.tolist(),
+        batch.humidity.tolist(),
+        batch.vibration.tolist(),
+        batch.light.tolist(),
+        batch.air_quality.tolist(),
+        batch.aqi.tolist(),
+        batch.timestamp.tolist(),
+    ):
+        # Readings of one batch usually share their timestamp
+        iso_timestamp = timestamps.get(timestamp)
+        if iso_timestamp is None:
+            iso_timestamp = timestamps[timestamp] = datetime.fromtimestamp(timestamp).isoformat()
+        records.append(
+            {
+                "accelerometer": {"x": x, "y": y, "z": z},
+                "gps": {"longitude": longitude, "latitude": latitude},
+                "parking": {
+                    "empty_count": empty_count,
+                    "gps": {"longitude": parking_longitude, "latitude": parking_latitude},
+                },
+                "temperature": {"value": temperature, "unit": "C"},
+                "humidity": {"value": humidity, "unit": "%"},
+                "vibration": {"x": vx, "y": vy, "z": vz, "magnitude": (vx ** 2 + vy ** 2 + vz ** 2) ** 0.5},
+                "light": {"illumination": light},
+                "air_quality": {"pm2_5": pm2_5, "pm10": pm10, "aqi": aqi},
+                "timestamp": iso_timestamp,
+                "user_id": user_id,
+            }
+        )
+    return records
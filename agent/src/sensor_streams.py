@@ -0,0 +1,55 @@
+import time
+
+from schema.aggregated_data_schema import dump_reading_batch
+
+# Sensors of every sub-stream, each message also carries user_id and timestamp.
+# The edge forwards a merged reading for every "accel" message and only keeps
+# the last values of the other streams.
+STREAMS = {
+    "accel": ("accelerometer", "gps", "vibration"),
+    "env": ("parking", "temperature", "humidity", "light", "air_quality"),
+}
+
+
+class SensorStreams:
+    """Publishes every group of sensors at its own rate, on its own topic.
+
+    Motion sensors change every few milliseconds while temperature or parking
+    change over minutes, so instead of one `AggregatedData` per tick each
+    stream of `STREAMS` is published `rates[stream]` times per second through
+    its own `FrameBatcher` (`agent/<user>/accel`, `agent/<user>/env`). Every
+    stream is published once right at the start so the edge can merge the
+    first motion readings. Due times are absolute, like in `Replay`, so the
+    rates do not drift.
+    """
+
+    def __init__(self, datasource, batchers: dict, rates: dict) -> None:
+        self.datasource = datasource
+        self.batchers = batchers
+        self.rates = rates
+
+    def run(self) -> None:
+        """Publish the streams forever"""
+        self.datasource.startReading()
+        started = time.monotonic()
+        published = {stream: 0 for stream in self.rates}
+        while True:
+            due_at = {
+                stream: started + count / self.rates[stream]
+                for stream, count in published.items()
+            }
+            now = time.monotonic()
+            due = [stream for stream, at in due_at.items() if at <= now]
+            if not due:
+                for batcher in self.batchers.values():
+                    batcher.poll()
+                time.sleep(min(due_at.values()) - now)
+                continue
+
+            reading = dump_reading_batch(self.datasource.read_batch(1))[0]
+            for stream in due:
+                message = {"user_id": reading["user_id"], "timestamp": reading["timestamp"]}
+                for sensor in STREAMS[stream]:
+                    message[sensor] = reading[sensor]
+                self.batchers[stream].add(message)
+                published[stream] += 1
@@ -0,0 +1,58 @@
+import zlib
+
+
+def shard_of(user_id: int, shards: int) -> int:
+    """Shard of a vehicle, the same on every agent and edge (see edge/app/adapters/mqtt_sharding.py)"""
+    return zlib.crc32(str(user_id).encode("ascii")) % shards
+
+
+def shard_topic(topic: str, user_id: int, shards: int) -> str:
+    """Topic of a vehicle's messages: shard/<shard>/<topic>, or `topic` itself without shards"""
+    if not shards:
+        return topic
+    return f"shard/{shard_of(user_id, shards)}/{topic}"
+
+
+class ShardedBatcher:
+    """Routes the readings of a fleet to one FrameBatcher per shard topic.
+
+    Every vehicle's readings land on the shard topic of its user_id, so the edge
+    instance owning that shard gets the whole stream of the vehicle. Batchers
+    are made on first use by `make_batcher(topic)`. Counters add up over all of
+    them, so it can stand in for a single FrameBatcher.
+    """
+
+    def __init__(self, make_batcher, topic: str, shards: int) -> None:
+        self.make_batcher = make_batcher
+        self.topic = topic
+        self.shards = shards
+        self.batchers = {}
+
+    def add(self, reading: dict) -> None:
+        shard = shard_of(reading["user_id"], self.shards)
+        batcher = self.batchers.get(shard)
+        if batcher is None:
+            batcher = self.batchers[shard] = self.make_batcher(f"shard/{shard}/{self.topic}")
+        batcher.add(reading)
+
+    def poll(self) -> None:
+        for batcher in self.batchers.values():
+            batcher.poll()
+
+    def flush(self) -> bool:
+        flushed = True
+        for batcher in self.batchers.values():
+            flushed = batcher.flush() and flushed
+        return flushed
+
+    @property
+    def sent_readings(self) -> int:
+        return sum(batcher.sent_readings for batcher in self.batchers.values())
+
+    @property
+    def sent_frames(self) -> int:
+        return sum(batcher.sent_frames for batcher in self.batchers.values())
+
+    @property
+    def failed_readings(self) -> int:
+        return sum(batcher.failed_readings for batcher in self.batchers.values())
@@ -0,0 +1,82 @@
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+# The agent runs from src with flat imports
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from deadband import DeadbandFilter, parse_tolerances  # noqa: E402
+
+
+def reading(temperature, humidity=50.0, user_id=1):
+    return {
+        "temperature": {"value": temperature, "unit": "C"},
+        "humidity": {"value": humidity, "unit": "%"},
+        "gps": {"longitude": 30.5, "latitude": 50.4},
+        "user_id": user_id,
+    }
+
+
+class TestDeadbandFilter(unittest.TestCase):
+    def setUp(self):
+        self.now = 1000.0
+        clock = patch("deadband.time.monotonic", side_effect=lambda: self.now)
+        clock.start()
+        self.addCleanup(clock.stop)
+        self.deadband = DeadbandFilter({"temperature": 0.5, "humidity": 1}, keyframe_interval=60)
+
+    def test_the_first_reading_is_a_keyframe(self):
+        first = reading(20.0)
+        self.assertEqual(self.deadband.filter(first), first)
+        # Every user has a keyframe of their own
+        other = reading(20.0, user_id=2)
+        self.assertEqual(self.deadband.filter(other), other)
+        self.assertEqual(self.deadband.suppressed, 0)
+
+    def test_changes_up_to_the_tolerance_are_suppressed(self):
+        self.deadband.filter(reading(20.0))
+        self.now += 1
+        message = self.deadband.filter(reading(20.5, humidity=49.0))
+        self.assertEqual(set(message), {"gps", "user_id"})
+        self.assertEqual(self.deadband.suppressed, 2)
+
+    def test_changes_beyond_the_tolerance_are_sent(self):
+        self.deadband.filter(reading(20.0))
+        self.now += 1
+        message = self.deadband.filter(reading(20.75))
+        self.assertEqual(message["temperature"], {"value": 20.75, "unit": "C"})
+        self.assertNotIn("humidity", message)
+        # Later changes are measured from the value last sent
+        self.now += 1
+        self.assertNotIn("temperature", self.deadband.filter(reading(20.25)))
+        self.now += 1
+        self.assertIn("temperature", self.deadband.filter(reading(20.0)))
+
+    def test_drift_below_the_tolerance_does_not_move_the_reference(self):
+        self.deadband.filter(reading(20.0))
+        for temperature in (20.25, 20.5):
+            self.now += 1
+            self.assertNotIn("temperature", self.deadband.filter(reading(temperature)))
+        self.now += 1
+        self.assertIn("temperature", self.deadband.filter(reading(20.75)))
+
+    def test_readings_are_sent_in_full_after_the_keyframe_interval(self):
+        self.deadband.filter(reading(20.0))
+        self.now += 59
+        self.assertNotIn("temperature", self.deadband.filter(reading(20.0)))
+        self.now += 1
+        full = reading(20.0)
+        self.assertEqual(self.deadband.filter(full), full)
+        self.now += 1
+        self.assertNotIn("temperature", self.deadband.filter(reading(20.0)))
+
+
+class TestParseTolerances(unittest.TestCase):
+    def test_tolerances_are_parsed_per_sensor(self):
+        self.assertEqual(parse_tolerances(" temperature=0.5, humidity = 1,"), {"temperature": 0.5, "humidity": 1.0})
+        self.assertEqual(parse_tolerances(""), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
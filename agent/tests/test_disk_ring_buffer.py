@@ -0,0 +1,95 @@
+import os
+import sys
+import tempfile
+import unittest
+
+# The agent runs from src with flat imports
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from disk_ring_buffer import HEADER, LENGTH, DiskRingBuffer  # noqa: E402
+
+
+class TestDiskRingBuffer(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "spool")
+
+    def buffer(self, capacity):
+        buffer = DiskRingBuffer(self.path, capacity)
+        self.addCleanup(buffer.close)
+        return buffer
+
+    def test_records_are_peeked_oldest_first_until_committed(self):
+        buffer = self.buffer(1024)
+        for payload in (b"first", b"second", b"third"):
+            self.assertTrue(buffer.append(payload))
+        self.assertEqual(len(buffer), 3)
+        self.assertEqual(buffer.used, 3 * LENGTH.size + 16)
+        self.assertEqual(buffer.peek(2), [b"first", b"second"])
+        # Peeking leaves the records in place
+        self.assertEqual(buffer.peek(10), [b"first", b"second", b"third"])
+        buffer.commit(2)
+        self.assertEqual(buffer.peek(10), [b"third"])
+        buffer.commit(5)
+        self.assertEqual((len(buffer), buffer.used, buffer.peek(10)), (0, 0, []))
+
+    def test_records_wrap_around_the_end_of_the_file(self):
+        # Room for two 10 byte records, the third one straddles the end
+        buffer = self.buffer(3 * (LENGTH.size + 10) - 2)
+        sent = []
+        for i in range(10):
+            payload = bytes([i]) * 10
+            buffer.append(payload)
+            sent.append(payload)
+            if len(buffer) == 2:
+                self.assertEqual(buffer.peek(1), [sent[-2]])
+                buffer.commit(1)
+        self.assertEqual(buffer.dropped, 0)
+        self.assertEqual(buffer.peek(10), [sent[-1]])
+        self.assertGreater(buffer.head, buffer.capacity)
+        self.assertEqual(os.path.getsize(self.path), HEADER.size + buffer.capacity)
+
+    def test_the_oldest_records_are_dropped_when_full(self):
+        buffer = self.buffer(3 * (LENGTH.size + 10))
+        for i in range(5):
+            self.assertTrue(buffer.append(bytes([i]) * 10))
+        self.assertEqual(buffer.dropped, 2)
+        self.assertEqual(buffer.peek(10), [bytes([i]) * 10 for i in (2, 3, 4)])
+        # A larger record pushes out as many as it needs
+        self.assertTrue(buffer.append(b"x" * 20))
+        self.assertEqual(buffer.peek(10), [bytes([4]) * 10, b"x" * 20])
+        self.assertEqual(buffer.dropped, 4)
+
+    def test_records_larger_than_the_buffer_are_refused(self):
+        buffer = self.buffer(16)
+        buffer.append(b"kept")
+        self.assertFalse(buffer.append(b"x" * 16))
+        self.assertEqual(buffer.peek(10), [b"kept"])
+        self.assertEqual(buffer.dropped, 1)
+
+    def test_records_survive_reopening_the_file(self):
+        buffer = DiskRingBuffer(self.path, 64)
+        for i in range(8):
+            buffer.append(b"record %d" % i)
+        buffer.commit(1)
+        expected = buffer.peek(10)
+        buffer.close()
+
+        reopened = self.buffer(64)
+        self.assertEqual(len(reopened), len(expected))
+        self.assertEqual(reopened.peek(10), expected)
+        reopened.append(b"after")
+        self.assertEqual(reopened.peek(10)[-1], b"after")
+
+    def test_a_file_of_another_capacity_starts_empty(self):
+        buffer = DiskRingBuffer(self.path, 64)
+        buffer.append(b"record")
+        buffer.close()
+        resized = self.buffer(128)
+        self.assertEqual((len(resized), resized.peek(10)), (0, []))
+        self.assertEqual(os.path.getsize(self.path), HEADER.size + 128)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+# The agent runs from src with flat imports
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+import mmap_datasource  # noqa: E402
+from file_datasource import FileDatasource  # noqa: E402
+from mmap_datasource import MappedCsv, MmapDatasource  # noqa: E402
+
+
+def write_drive(directory, accelerometer, gps_rows=7, parking_rows=5, timestamps=None):
+    """Accelerometer rows (x, y, z), optionally with a timestamp column, and short gps and parking files"""
+    paths = [os.path.join(directory, name) for name in ("accelerometer.csv", "gps.csv", "parking.csv")]
+    with open(paths[0], "w") as file:
+        file.write("x,y,z,timestamp\n" if timestamps is not None else "x,y,z\n")
+        for i, (x, y, z) in enumerate(accelerometer):
+            row = f"{x},{y},{z}" + (f",{timestamps[i]}" if timestamps is not None else "")
+            file.write(row + "\n")
+    with open(paths[1], "w") as file:
+        file.write("longitude,latitude\n")
+        for i in range(gps_rows):
+            file.write(f"{50 + i / 100},{30 + i / 100}\n")
+    with open(paths[2], "w") as file:
+        file.write("longitude,latitude,empty_count\n")
+        # The last row without a trailing newline
+        file.write("\n".join(f"{31 + i / 100},{47 + i / 100},{i}" for i in range(parking_rows)))
+    return paths
+
+
+class TestFileDatasource(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.accelerometer = [(i, -i, 16000 + i) for i in range(23)]
+        self.paths = write_drive(directory.name, self.accelerometer)
+        # Small blocks, so the rows below span several of them
+        block_rows = patch.object(mmap_datasource, "BLOCK_ROWS", 4)
+        block_rows.start()
+        self.addCleanup(block_rows.stop)
+
+    def mapped(self):
+        datasource = MmapDatasource(*self.paths, seed=1)
+        self.addCleanup(datasource.close)
+        return datasource
+
+    def test_mapped_files_match_the_in_memory_reader(self):
+        in_memory = FileDatasource(*self.paths, seed=1)
+        mapped = self.mapped()
+        for name in ("accel_values", "gps_values", "parking_values"):
+            expected = getattr(in_memory, name)
+            values = getattr(mapped, name)
+            self.assertEqual(len(values), len(expected))
+            rows = np.array([len(expected) - 1, 0, 4, 3, 2])
+            np.testing.assert_array_equal(values[rows], expected[rows])
+        np.testing.assert_array_equal(mapped.accel_values[np.arange(23)], np.array(self.accelerometer))
+
+    def test_mapped_csv_caches_a_bounded_number_of_blocks(self):
+        csv = MappedCsv(self.paths[0], ("x", "z"), np.int64, cache_blocks=2)
+        self.addCleanup(csv.close)
+        np.testing.assert_array_equal(csv[np.arange(23)][:, 1], [16000 + i for i in range(23)])
+        self.assertEqual(len(csv._cache), 2)
+
+    def test_seek_is_kept_by_start_reading(self):
+        for datasource in (FileDatasource(*self.paths, seed=1), self.mapped()):
+            datasource.seek(25)
+            datasource.startReading()
+            batch = datasource.read_batch(3)
+            self.assertEqual(batch.accelerometer[:, 0].tolist(), [2, 3, 4])
+            # The in-memory reader keeps the text of the file in read()
+            self.assertEqual(int(datasource.read().accelerometer.x), 5)
+
+    def test_reading_position_starts_at_the_first_row(self):
+        for datasource in (FileDatasource(*self.paths, seed=1), self.mapped()):
+            self.assertFalse(datasource.reading)
+            self.assertEqual(datasource.read_batch(2).accelerometer[:, 0].tolist(), [0, 1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import asyncio
+import os
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+# The agent runs from src with flat imports
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from file_datasource import FileDatasource  # noqa: E402
+from fleet import Fleet  # noqa: E402
+from test_file_datasource import write_drive  # noqa: E402
+
+
+class FakeBatcher:
+    """Collects the readings a fleet adds"""
+
+    def __init__(self):
+        self.readings = []
+        self.sent_readings = 0
+        self.sent_frames = 0
+        self.failed_readings = 0
+
+    def add(self, reading):
+        self.readings.append(reading)
+
+    def poll(self):
+        pass
+
+
+class TestFleet(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        paths = write_drive(directory.name, [(i, -i, 16000 + i) for i in range(23)])
+        self.datasource = FileDatasource(*paths, seed=1)
+        self.fleet = Fleet(self.datasource, size=4, rate=2000, first_user_id=10, seed=3)
+
+    def test_every_vehicle_has_its_own_user_id(self):
+        self.assertEqual(self.fleet.user_ids.tolist(), [10, 11, 12, 13])
+        offsets = self.fleet.offsets.copy()
+        batch = next(self.fleet.next_batch(4))
+        self.assertEqual(sorted(batch.user_id.tolist()), [10, 11, 12, 13])
+        # Each reading is the row of its own vehicle
+        for user_id, (x, _, _) in zip(batch.user_id.tolist(), batch.accelerometer.tolist()):
+            self.assertEqual(x, offsets[user_id - 10])
+
+    def test_vehicles_fire_in_phase_order_and_never_twice_in_a_batch(self):
+        offsets = self.fleet.offsets.copy()
+        batches = list(self.fleet.next_batch(10))
+        self.assertEqual([len(batch) for batch in batches], [4, 4, 2])
+        for batch in batches:
+            self.assertEqual(len(set(batch.user_id.tolist())), len(batch))
+        user_ids = np.concatenate([batch.user_id for batch in batches]).tolist()
+        in_phase_order = self.fleet.user_ids[self.fleet.order].tolist()
+        self.assertEqual(user_ids, in_phase_order * 2 + in_phase_order[:2])
+        # Every vehicle moves one row forward per reading
+        rows = np.concatenate([batch.accelerometer[:, 0] for batch in batches])
+        for i, user_id in enumerate(user_ids):
+            slot = user_id - 10
+            self.assertEqual(rows[i], (offsets[slot] + i // 4) % 23)
+
+    def test_run_interleaves_the_vehicles(self):
+        batcher = FakeBatcher()
+
+        async def run_briefly():
+            try:
+                await asyncio.wait_for(self.fleet.run(batcher), 0.1)
+            except asyncio.TimeoutError:
+                pass
+
+        asyncio.run(run_briefly())
+        user_ids = [reading["user_id"] for reading in batcher.readings]
+        self.assertGreater(len(user_ids), 8)
+        self.assertEqual(sorted(user_ids[:4]), [10, 11, 12, 13])
+        # One reading of every vehicle per period, always in the same order
+        self.assertEqual(user_ids[4:], user_ids[:-4])
+
+
+if __name__ == "__main__":
+    unittest.main()
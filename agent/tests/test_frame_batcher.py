@@ -0,0 +1,81 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# The agent runs from src with flat imports
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+import binary_codec  # noqa: E402
+from disk_ring_buffer import DiskRingBuffer  # noqa: E402
+from frame_batcher import FrameBatcher  # noqa: E402
+
+
+class FakeClient:
+    """Collects publishes, which fail while it is disconnected"""
+
+    def __init__(self):
+        self.connected = True
+        self.published = []
+
+    def is_connected(self):
+        return self.connected
+
+    def publish(self, topic, payload):
+        if not self.connected:
+            # MQTT_ERR_NO_CONN
+            return (4, None)
+        self.published.append(payload)
+        return (0, len(self.published))
+
+
+class TestFrameBatcher(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.spool = DiskRingBuffer(os.path.join(directory.name, "spool"), 64 * 1024)
+        self.addCleanup(self.spool.close)
+        self.client = FakeClient()
+        self.now = 1000.0
+        clock = patch("frame_batcher.time.monotonic", side_effect=lambda: self.now)
+        clock.start()
+        self.addCleanup(clock.stop)
+
+    def test_spooled_frames_are_drained_by_add_after_a_reconnect(self):
+        batcher = FrameBatcher(self.client, "agent", spool=self.spool, drain_rate=10)
+        self.client.connected = False
+        for i in range(5):
+            batcher.add({"reading": i})
+            self.now += 0.1
+        self.assertEqual(batcher.spooled_frames, 5)
+        self.assertEqual(len(self.spool), 5)
+
+        self.client.connected = True
+        for i in range(5, 10):
+            batcher.add({"reading": i})
+            self.now += 0.1
+        self.assertEqual(batcher.drained_frames, 5)
+        self.assertEqual(len(self.spool), 0)
+        readings = sorted(json.loads(payload)["reading"] for payload in self.client.published)
+        self.assertEqual(readings, list(range(10)))
+
+    def test_drain_is_limited_to_the_drain_rate(self):
+        batcher = FrameBatcher(self.client, "agent", spool=self.spool, drain_rate=2)
+        self.client.connected = False
+        for i in range(5):
+            batcher.add({"reading": i})
+        self.client.connected = True
+        self.now += 0.5
+        batcher.add({"reading": 5})
+        self.assertEqual(batcher.drained_frames, 1)
+        self.assertEqual(len(self.spool), 4)
+
+    def test_binary_frames_stay_within_the_record_count_limit(self):
+        batcher = FrameBatcher(self.client, "agent", max_readings=100000, wire_format="binary")
+        self.assertEqual(batcher.max_readings, binary_codec.MAX_RECORDS)
+
+
+if __name__ == "__main__":
+    unittest.main()
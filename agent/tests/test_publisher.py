@@ -0,0 +1,133 @@
+import os
+import sys
+import time
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from paho.mqtt import client as mqtt_client
+
+# The agent runs from src with flat imports
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from publisher import AsyncPublisher  # noqa: E402
+
+
+class FakeClient:
+    """
+    Collects QoS 1 publishes and acks them like a broker would: `early` acks
+    before publish returns the mid, `late` waits for ack() and `never` keeps
+    every message in flight.
+    """
+
+    def __init__(self, acks="late"):
+        self.acks = acks
+        self.published = []
+        self.on_publish = None
+        self.max_inflight = None
+
+    def max_inflight_messages_set(self, window):
+        self.max_inflight = window
+
+    def is_connected(self):
+        return True
+
+    def publish(self, topic, payload, qos=0):
+        self.published.append(payload)
+        mid = len(self.published)
+        if self.acks == "early":
+            # paho's network thread may see the PUBACK before publish returns
+            self.on_publish(self, None, mid)
+        return SimpleNamespace(rc=mqtt_client.MQTT_ERR_SUCCESS, mid=mid)
+
+    def ack(self, mid):
+        self.on_publish(self, None, mid)
+
+
+def wait_until(predicate, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError("timed out")
+        time.sleep(0.01)
+
+
+class TestAsyncPublisher(unittest.TestCase):
+    def publisher(self, client, **options):
+        publisher = AsyncPublisher(client, report_every=0, **options)
+        publisher.start()
+        self.addCleanup(publisher.stop)
+        return publisher
+
+    def test_the_window_limits_messages_waiting_for_their_ack(self):
+        client = FakeClient(acks="never")
+        publisher = self.publisher(client, window=3)
+        self.assertEqual(client.max_inflight, 3)
+        for i in range(10):
+            self.assertEqual(publisher.publish("agent", i), (mqtt_client.MQTT_ERR_SUCCESS, None))
+        wait_until(lambda: publisher.sent == 3)
+        time.sleep(0.05)
+        self.assertEqual(client.published, [0, 1, 2])
+        self.assertEqual(publisher.stats()["in_flight"], 3)
+        self.assertEqual(publisher.stats()["queue_depth"], 7)
+
+    def test_late_acks_free_the_window(self):
+        client = FakeClient(acks="late")
+        publisher = self.publisher(client, window=2)
+        for i in range(5):
+            publisher.publish("agent", i)
+        for mid in range(1, 6):
+            wait_until(lambda: len(client.published) >= mid)
+            self.assertLessEqual(publisher.in_flight, 2)
+            client.ack(mid)
+        wait_until(lambda: publisher.acked == 5)
+        stats = publisher.stats()
+        self.assertEqual((stats["sent"], stats["in_flight"], stats["queue_depth"]), (5, 0, 0))
+        self.assertIsNotNone(stats["p99_ms"])
+
+    def test_acks_before_publish_returns_are_not_lost(self):
+        client = FakeClient(acks="early")
+        publisher = self.publisher(client, window=2)
+        for i in range(10):
+            publisher.publish("agent", i)
+        # A lost ack would keep its message in the window and stall the rest
+        wait_until(lambda: publisher.acked == 10)
+        self.assertEqual(publisher.in_flight, 0)
+        self.assertEqual(publisher._early_acks, {})
+        self.assertEqual(publisher._sent_at, {})
+
+    def test_publish_fails_once_the_queue_is_full(self):
+        # Not started, nothing leaves the queue
+        publisher = AsyncPublisher(FakeClient(), max_queue=3, report_every=0)
+        for i in range(3):
+            self.assertEqual(publisher.publish("agent", i)[0], mqtt_client.MQTT_ERR_SUCCESS)
+        self.assertEqual(publisher.publish("agent", 3), (mqtt_client.MQTT_ERR_QUEUE_SIZE, None))
+        self.assertEqual(publisher.dropped, 1)
+        self.assertEqual(publisher.stats()["queue_depth"], 3)
+
+    def test_the_rate_is_limited_after_the_burst(self):
+        now = [1000.0]
+        sleeps = []
+
+        def sleep(seconds):
+            sleeps.append(seconds)
+            now[0] += seconds
+
+        with patch("publisher.time.monotonic", side_effect=lambda: now[0]), patch(
+            "publisher.time.sleep", side_effect=sleep
+        ):
+            publisher = AsyncPublisher(FakeClient(), rate=10, burst=2, report_every=0)
+            for _ in range(5):
+                publisher._take_token()
+            # The burst goes out at once, the rest at 10 per second
+            self.assertEqual(len(sleeps), 3)
+            self.assertAlmostEqual(sum(sleeps), 0.3)
+            # An idle second refills the bucket up to the burst only
+            now[0] += 1
+            for _ in range(3):
+                publisher._take_token()
+            self.assertEqual(len(sleeps), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+import os
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+# The agent runs from src with flat imports
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from file_datasource import FileDatasource  # noqa: E402
+from schema.aggregated_data_schema import AggregatedDataSchema, dump_reading_batch  # noqa: E402
+from test_file_datasource import write_drive  # noqa: E402
+
+
+class TestReadingBatch(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        # Files of 23, 7 and 5 rows, which wrap around at different rows
+        self.paths = write_drive(directory.name, [(i, -i, 16000 + i) for i in range(23)])
+        self.datasource = FileDatasource(*self.paths, seed=1)
+
+    def read_rows(self, n):
+        """Accelerometer, gps and parking of the next `n` calls of read()"""
+        datasource = FileDatasource(*self.paths, seed=1)
+        datasource.startReading()
+        rows = []
+        for _ in range(n):
+            data = datasource.read()
+            rows.append(
+                (
+                    [int(data.accelerometer.x), int(data.accelerometer.y), int(data.accelerometer.z)],
+                    [float(data.gps.longitude), float(data.gps.latitude)],
+                    [
+                        float(data.parking.empty_count),
+                        float(data.parking.gps.longitude),
+                        float(data.parking.gps.latitude),
+                    ],
+                )
+            )
+        return rows
+
+    def test_batches_wrap_around_like_read(self):
+        batches = [self.datasource.read_batch(5) for _ in range(10)]
+        self.assertEqual([len(batch) for batch in batches], [5] * 10)
+        rows = list(
+            zip(
+                np.concatenate([batch.accelerometer for batch in batches]).tolist(),
+                np.concatenate([batch.gps for batch in batches]).tolist(),
+                np.concatenate([batch.parking for batch in batches]).tolist(),
+            )
+        )
+        expected = self.read_rows(50)
+        for row, expected_row in zip(rows, expected):
+            self.assertEqual(row[0], expected_row[0])
+            np.testing.assert_allclose(row[1], expected_row[1])
+            np.testing.assert_allclose(row[2], expected_row[2])
+
+    def test_the_final_batch_of_the_file_starts_over(self):
+        self.datasource.seek(20)
+        batch = self.datasource.read_batch(5)
+        self.assertEqual(batch.accelerometer[:, 0].tolist(), [20, 21, 22, 0, 1])
+        # gps has 7 rows and parking 5, row 20 is their rows 6 and 0
+        np.testing.assert_allclose(batch.gps[:, 1], [50.06, 50.0, 50.01, 50.02, 50.03])
+        self.assertEqual(batch.parking[:, 0].tolist(), [0, 1, 2, 3, 4])
+        self.assertEqual(self.datasource.read_batch(1).accelerometer[:, 0].tolist(), [2])
+
+    def test_indexing_builds_the_reading_of_a_row(self):
+        batch = self.datasource.read_batch(3)
+        readings = list(batch)
+        self.assertEqual(len(readings), 3)
+        reading = batch[2]
+        self.assertEqual(
+            (reading.accelerometer.x, reading.accelerometer.y, reading.accelerometer.z), (2, -2, 16002)
+        )
+        self.assertEqual(reading.parking.empty_count, 2)
+        self.assertEqual(reading.temperature.value, batch.temperature[2])
+        self.assertEqual(reading.air_quality.aqi, batch.aqi[2])
+        self.assertAlmostEqual(reading.timestamp.timestamp(), batch.timestamp[2], places=5)
+        self.assertEqual(reading.user_id, batch.user_id[2])
+
+    def test_dumped_readings_match_the_schema(self):
+        batch = self.datasource.read_batch(4)
+        records = dump_reading_batch(batch)
+        schema = AggregatedDataSchema()
+        self.assertEqual(records, [schema.dump(reading) for reading in batch])
+        record = records[1]
+        self.assertEqual(
+            set(record),
+            {
+                "accelerometer", "gps", "parking", "temperature", "humidity",
+                "vibration", "light", "air_quality", "timestamp", "user_id",
+            },
+        )
+        self.assertEqual(record["accelerometer"], {"x": 1, "y": -1, "z": 16001})
+        self.assertEqual(set(record["parking"]), {"empty_count", "gps"})
+        self.assertEqual(set(record["vibration"]), {"x", "y", "z", "magnitude"})
+        self.assertEqual(set(record["air_quality"]), {"pm2_5", "pm10", "aqi"})
+        self.assertEqual(record["temperature"]["unit"], "C")
+        self.assertIsInstance(record["timestamp"], str)
+
+    def test_an_empty_batch_dumps_nothing(self):
+        batch = self.datasource.read_batch(0)
+        self.assertEqual(len(batch), 0)
+        self.assertEqual(dump_reading_batch(batch), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+import math
+import os
+import sys
+import tempfile
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+
+# The agent runs from src with flat imports
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from file_datasource import FileDatasource  # noqa: E402
+from replay import Replay  # noqa: E402
+from test_file_datasource import write_drive  # noqa: E402
+
+# Recorded time of the first row
+RECORDED_AT = 1700000000
+
+
+class Replayed(Exception):
+    pass
+
+
+class FakeBatcher:
+    """Collects (clock time, reading) pairs and ends the replay after `limit` readings"""
+
+    def __init__(self, clock, limit):
+        self.clock = clock
+        self.limit = limit
+        self.added = []
+
+    def add(self, reading):
+        self.added.append((self.clock.now, reading))
+        if len(self.added) == self.limit:
+            raise Replayed()
+
+    def poll(self):
+        pass
+
+
+class FakeClock:
+    """time.time and time.monotonic of the replay, which only move when it sleeps"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def sleep(self, seconds):
+        self.now += max(seconds, 0)
+
+
+class TestReplay(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.clock = FakeClock()
+        for name, fake in (
+            ("time", lambda: RECORDED_AT + 1000 + self.clock.now),
+            ("monotonic", lambda: self.clock.now),
+            ("sleep", self.clock.sleep),
+        ):
+            patcher = patch(f"replay.time.{name}", side_effect=fake)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def replay(self, timestamps, limit, **options):
+        """Replay rows recorded at `timestamps` seconds and return the (clock time, reading) pairs"""
+        paths = write_drive(
+            self.directory.name,
+            [(i, 0, 0) for i in range(len(timestamps))],
+            timestamps=[RECORDED_AT + timestamp for timestamp in timestamps],
+        )
+        batcher = FakeBatcher(self.clock, limit)
+        with self.assertRaises(Replayed):
+            Replay(FileDatasource(*paths, seed=1), **options).run(batcher)
+        return batcher.added
+
+    def test_speed_scales_the_recorded_gaps(self):
+        added = self.replay([0, 1, 2, 4], limit=8, speed=2)
+        self.assertEqual([reading["accelerometer"]["x"] for _, reading in added], [0, 1, 2, 3] * 2)
+        # The second lap starts one average gap (4/3 s) after the last row
+        expected = [0, 0.5, 1, 2, 8 / 3, 8 / 3 + 0.5, 8 / 3 + 1, 8 / 3 + 2]
+        for (at, reading), due in zip(added, expected):
+            self.assertAlmostEqual(at, due)
+            # Readings are stamped with the time they were due at
+            stamped = datetime.fromisoformat(reading["timestamp"]).timestamp()
+            self.assertAlmostEqual(stamped, RECORDED_AT + 1000 + due, places=5)
+
+    def test_rows_recorded_at_the_same_time_are_sent_together(self):
+        added = self.replay([0, 1, 1, 1, 2], limit=5, speed=1)
+        self.assertEqual([at for at, _ in added], [0, 1, 1, 1, 2])
+
+    def test_out_of_order_rows_are_sent_with_the_row_ahead_of_them(self):
+        added = self.replay([0, 3, 1, 2, 4, 5], limit=6, speed=1, max_batch=2, recorded_timestamps=True)
+        self.assertEqual([reading["accelerometer"]["x"] for _, reading in added], [0, 1, 2, 3, 4, 5])
+        self.assertEqual([at for at, _ in added], [0, 3, 3, 3, 4, 5])
+        stamped = [datetime.fromisoformat(reading["timestamp"]).timestamp() for _, reading in added]
+        self.assertEqual(stamped, sorted(stamped))
+
+    def test_infinite_speed_sends_without_waiting(self):
+        added = self.replay([0, 10, 20], limit=6, speed=math.inf)
+        self.assertEqual([at for at, _ in added], [0] * 6)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,10 +1,28 @@
+import json
 import logging
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List
+
 import paho.mqtt.client as mqtt
+from pydantic import TypeAdapter
+from app.adapters import binary_codec
+from app.adapters.mqtt_sharding import strip_shard, subscriptions
+from app.adapters.worker_pool import WorkerPool
 from app.interfaces.agent_gateway import AgentGateway
 from app.entities.agent_data import AgentData, GpsData
+from app.entities.processed_agent_data import ProcessedAgentData
+from app.usecases.classification_rules import DEFAULT_RULES, RuleFile
 from app.usecases.data_processing import process_agent_data
+from app.usecases.environment_window import EnvironmentWindows
+from app.usecases.road_peak_detector import RoadPeakDetector
+from app.usecases.stream_merger import StreamMerger
 from app.interfaces.hub_gateway import HubGateway
 
+# Frames of batching agents are JSON arrays of readings
+agent_data_frame = TypeAdapter(List[AgentData])
+
 
 class AgentMQTTAdapter(AgentGateway):
     def __init__(
@@ -14,47 +32,272 @@ class AgentMQTTAdapter(AgentGateway):
         topic,
         hub_gateway: HubGateway,
         batch_size=10,
+        streams_topic=None,
+        workers=0,
+        worker_mode="thread",
+        queue_size=10000,
+        drop_policy="drop_oldest",
+        metrics_interval=0,
+        road_detector: RoadPeakDetector = None,
+        rule_file: RuleFile = None,
+        environment_windows: EnvironmentWindows = None,
+        shards=0,
+        instance=0,
+        instances=1,
+        share_group="",
     ):
         self.batch_size = batch_size
         # MQTT
         self.broker_host = broker_host
         self.broker_port = broker_port
         self.topic = topic
+        # Per-sensor streams of agents (agent/+/+), merged back into full readings
+        self.streams_topic = streams_topic
+        self.stream_merger = StreamMerger()
+        self.shards = shards
+        # With shards this instance only subscribes to the shard topics it owns,
+        # so every vehicle's messages reach one instance (see mqtt_sharding.py)
+        self.subscriptions = subscriptions(
+            [topic, streams_topic] if streams_topic else [topic],
+            shards=shards,
+            instance=instance,
+            instances=instances,
+            share_group=share_group,
+        )
+        self._merge_lock = threading.Lock()
         self.client = mqtt.Client()
         # Hub
         self.hub_gateway = hub_gateway
+        # Status thresholds, reloaded when the file changes (built-in ones without a file)
+        self.rule_file = rule_file
+        # Labels road_state from peaks per vehicle instead of single samples,
+        # holding records back until their label is final
+        self.road_detector = road_detector
+        # Forwards bumps and potholes as they come and the rest as per-window summaries
+        self.environment_windows = environment_windows
+        self._reduce_lock = threading.Lock()
+        # Vehicles that went quiet are released on this timer, without waiting
+        # for another message (0 when nothing holds records back)
+        intervals = []
+        if road_detector is not None:
+            intervals.append(road_detector.idle_flush)
+        if environment_windows is not None:
+            intervals.append(environment_windows.window_seconds)
+        self.idle_check_interval = min(intervals, default=0)
+        self._idle_thread = None
+        self._idle_stopped = threading.Event()
+        # Messages are handled on the MQTT network thread unless there are
+        # workers. In "process" mode plain messages are parsed and classified
+        # in worker processes, the worker threads only wait for them and save.
+        self.pool = None
+        self.process_pool = None
+        if workers > 0:
+            self.pool = WorkerPool(self.handle_message, workers, queue_size, drop_policy)
+            if worker_mode == "process":
+                self.process_pool = ProcessPoolExecutor(workers)
+        # Seconds spent in every stage, summed over all handled messages
+        self.metrics_interval = metrics_interval
+        self.stage_times = {"parse": 0.0, "process": 0.0, "save": 0.0}
+        self.messages = 0
+        self._metrics_lock = threading.Lock()
+        self._running = False
 
     def on_connect(self, client, userdata, flags, rc):
         if rc == 0:
             logging.info("Connected to MQTT broker")
-            self.client.subscribe(self.topic)
+            for subscription in self.subscriptions:
+                self.client.subscribe(subscription)
         else:
             logging.info(f"Failed to connect to MQTT broker with code: {rc}")
 
     def on_message(self, client, userdata, msg):
         """Processing agent data and sent it to hub gateway"""
+        if self.pool is None:
+            self.handle_message(msg.topic, msg.payload)
+        else:
+            self.pool.submit(msg.topic, msg.payload)
+
+    def handle_message(self, topic: str, payload: bytes):
+        """Parse, classify and save one MQTT message"""
         try:
-            payload: str = msg.payload.decode("utf-8")
-            # Create AgentData instance with the received data
-            agent_data = AgentData.model_validate_json(payload, strict=True)
-            # Process the received data (you can call a use case here if needed)
-            processed_data = process_agent_data(agent_data)
+            processed_data_batch, parse_time, process_time = self.process_message(topic, payload)
+            if not processed_data_batch:
+                return
+            started = time.perf_counter()
             # Store the agent_data in the database (you can send it to the data processing module)
-            if not self.hub_gateway.save_data(processed_data):
+            if not self.hub_gateway.save_batch(processed_data_batch):
                 logging.error("Hub is not available")
+            self.record_stage_times(parse_time, process_time, time.perf_counter() - started)
         except Exception as e:
             logging.error(f"Error processing MQTT message: {e}")
 
+    def process_message(self, topic: str, payload: bytes):
+        """
+        Parse and classify one MQTT message.
+        Returns:
+            (processed, parse_time, process_time): The processed readings, empty
+                if the message completed none, and the seconds both stages took.
+        """
+        started = time.perf_counter()
+        if self.shards:
+            topic = strip_shard(topic)
+        # Create AgentData instances with the received data
+        if self.streams_topic and mqtt.topic_matches_sub(self.streams_topic, topic):
+            agent_data_batch = self.merge_stream_payload(topic, payload)
+        elif self.process_pool is not None:
+            # Parsed and processed at once in a worker process, timed as parsing
+            rules = self.rules()
+            processed_data_batch = self.process_pool.submit(parse_and_process, payload, rules).result()
+            parsed = time.perf_counter()
+            return self.reduce(processed_data_batch, rules), parsed - started, 0.0
+        else:
+            agent_data_batch = self.parse_payload(payload)
+        parsed = time.perf_counter()
+        # Process the received data (you can call a use case here if needed)
+        rules = self.rules()
+        processed_data_batch = self.reduce(
+            [process_agent_data(agent_data, rules=rules) for agent_data in agent_data_batch], rules
+        )
+        return processed_data_batch, parsed - started, time.perf_counter() - parsed
+
+    def rules(self):
+        """The rule table to classify the next message with"""
+        if self.rule_file is None:
+            return DEFAULT_RULES
+        return self.rule_file.rules
+
+    def reduce(self, processed_data_batch: List[ProcessedAgentData], rules) -> List[ProcessedAgentData]:
+        """
+        The records to forward: those the road detector has final labels for,
+        reduced to anomalies and window summaries if environment windows are set.
+        """
+        if self.road_detector is None and self.environment_windows is None:
+            return processed_data_batch
+        with self._reduce_lock:
+            if self.road_detector is not None:
+                processed_data_batch = self.road_detector.feed(processed_data_batch)
+            if self.environment_windows is not None:
+                processed_data_batch = self.environment_windows.feed(processed_data_batch, rules)
+            return processed_data_batch
+
+    def flush_held(self) -> List[ProcessedAgentData]:
+        """The records the road detector and the environment windows still hold"""
+        held = []
+        with self._reduce_lock:
+            if self.road_detector is not None:
+                held = self.road_detector.flush()
+            if self.environment_windows is not None:
+                rules = self.rules()
+                held = self.environment_windows.feed(held, rules) + self.environment_windows.flush(rules)
+        return held
+
+    def release_idle(self) -> List[ProcessedAgentData]:
+        """
+        The records of vehicles that went quiet: those the road detector held
+        and the summaries of the windows that closed.
+        """
+        held = []
+        with self._reduce_lock:
+            if self.road_detector is not None:
+                held = self.road_detector.release_idle()
+            if self.environment_windows is not None:
+                rules = self.rules()
+                held = self.environment_windows.feed(held, rules) + self.environment_windows.close_idle(rules)
+        return held
+
+    def record_stage_times(self, parse_time: float, process_time: float, save_time: float):
+        with self._metrics_lock:
+            self.messages += 1
+            self.stage_times["parse"] += parse_time
+            self.stage_times["process"] += process_time
+            self.stage_times["save"] += save_time
+
+    def metrics(self) -> dict:
+        """Queue depth, drops and average milliseconds per message of every stage"""
+        with self._metrics_lock:
+            messages = self.messages
+            metrics = {
+                f"{stage}_ms": seconds / messages * 1000 if messages else 0.0
+                for stage, seconds in self.stage_times.items()
+            }
+        metrics["messages"] = messages
+        if self.pool is not None:
+            metrics.update(self.pool.metrics())
+        return metrics
+
+    @staticmethod
+    def parse_payload(payload: bytes) -> List[AgentData]:
+        """Readings of one MQTT message: a binary frame, a JSON frame (array) or a single JSON object"""
+        if binary_codec.is_binary(payload):
+            _, records = binary_codec.decode_frame(payload)
+            return [AgentData.model_validate(record, strict=True) for record in records]
+        payload = payload.decode("utf-8")
+        if payload.lstrip().startswith("["):
+            return agent_data_frame.validate_json(payload, strict=True)
+        return [AgentData.model_validate_json(payload, strict=True)]
+
+    def merge_stream_payload(self, topic: str, payload: bytes) -> List[AgentData]:
+        """Full readings completed by one message of a per-sensor stream"""
+        stream = topic.rsplit("/", 1)[-1]
+        messages = json.loads(payload)
+        if isinstance(messages, dict):
+            messages = [messages]
+        with self._merge_lock:
+            merged = [self.stream_merger.merge(stream, message) for message in messages]
+        # Stream messages are JSON, so timestamps are still ISO strings here
+        return agent_data_frame.validate_python([m for m in merged if m is not None])
+
     def connect(self):
         self.client.on_connect = self.on_connect
         self.client.on_message = self.on_message
         self.client.connect(self.broker_host, self.broker_port, 60)
 
     def start(self):
+        self._running = True
+        if self.pool is not None:
+            self.pool.start()
+        if self.metrics_interval:
+            threading.Thread(target=self._report_metrics, daemon=True).start()
+        if self.idle_check_interval:
+            self._idle_thread = threading.Thread(target=self._release_idle_loop, daemon=True)
+            self._idle_thread.start()
         self.client.loop_start()
 
     def stop(self):
+        self._running = False
         self.client.loop_stop()
+        if self.pool is not None:
+            self.pool.stop()
+        if self.process_pool is not None:
+            self.process_pool.shutdown()
+        if self._idle_thread is not None:
+            self._idle_stopped.set()
+            self._idle_thread.join()
+        held = self.flush_held()
+        if held and not self.hub_gateway.save_batch(held):
+            logging.error("Hub is not available")
+
+    def _release_idle_loop(self):
+        while not self._idle_stopped.wait(self.idle_check_interval):
+            try:
+                held = self.release_idle()
+                if held and not self.hub_gateway.save_batch(held):
+                    logging.error("Hub is not available")
+            except Exception as e:
+                logging.error(f"Error releasing idle vehicles: {e}")
+
+    def _report_metrics(self):
+        while self._running:
+            time.sleep(self.metrics_interval)
+            logging.info(f"Edge metrics: {self.metrics()}")
+
+
+def parse_and_process(payload: bytes, rules=DEFAULT_RULES) -> List[ProcessedAgentData]:
+    """Parse and classify one plain MQTT message, in a worker process"""
+    return [
+        process_agent_data(agent_data, rules=rules)
+        for agent_data in AgentMQTTAdapter.parse_payload(payload)
+    ]
 
 
 # Usage example:
@@ -70,7 +313,7 @@ if __name__ == "__main__":
     try:
         # Keep the adapter running in the background
         while True:
-            pass
+            time.sleep(1)
     except KeyboardInterrupt:
         adapter.stop()
         logging.info("Adapter stopped.")
@@ -0,0 +1,115 @@
+import asyncio
+import logging
+import time
+
+from app.adapters.agent_mqtt_adapter import AgentMQTTAdapter
+from app.adapters.asyncio_mqtt import AsyncioMqttHelper
+from app.interfaces.async_hub_gateway import AsyncHubGateway
+
+
+class AsyncAgentMQTTAdapter(AgentMQTTAdapter):
+    """
+    AgentMQTTAdapter for the asyncio runtime. The paho client runs on the event
+    loop and every message is handled by a task that awaits the hub gateway,
+    so a slow hub call never blocks intake. Once `max_pending` messages are
+    being handled the socket is no longer read, which leaves backpressure to
+    the broker, until half of them are done.
+    """
+
+    def __init__(
+        self,
+        broker_host,
+        broker_port,
+        topic,
+        hub_gateway: AsyncHubGateway,
+        batch_size=10,
+        streams_topic=None,
+        max_pending=1000,
+        road_detector=None,
+        rule_file=None,
+        environment_windows=None,
+        **sharding,
+    ):
+        super().__init__(
+            broker_host,
+            broker_port,
+            topic,
+            hub_gateway,
+            batch_size=batch_size,
+            streams_topic=streams_topic,
+            road_detector=road_detector,
+            rule_file=rule_file,
+            environment_windows=environment_windows,
+            **sharding,
+        )
+        self.max_pending = max_pending
+        self.helper = None
+        self._pending = set()
+        self._stopping = False
+        self._idle_task = None
+
+    def on_message(self, client, userdata, msg):
+        """Start handling a message in a task of the event loop"""
+        task = self.helper.loop.create_task(self.handle_message_async(msg.topic, msg.payload))
+        self._pending.add(task)
+        task.add_done_callback(self._message_done)
+        if len(self._pending) >= self.max_pending:
+            self.helper.pause_reading()
+
+    async def handle_message_async(self, topic: str, payload: bytes):
+        """Parse, classify and save one MQTT message"""
+        try:
+            processed_data_batch, parse_time, process_time = self.process_message(topic, payload)
+            if not processed_data_batch:
+                return
+            started = time.perf_counter()
+            if not await self.hub_gateway.save_batch(processed_data_batch):
+                logging.error("Hub is not available")
+            self.record_stage_times(parse_time, process_time, time.perf_counter() - started)
+        except Exception as e:
+            logging.error(f"Error processing MQTT message: {e}")
+
+    def connect(self):
+        """Connect on the running event loop"""
+        self.client.on_connect = self.on_connect
+        self.client.on_message = self.on_message
+        self.helper = AsyncioMqttHelper(self.client)
+        self.helper.connect(self.broker_host, self.broker_port, 60)
+        if self.idle_check_interval:
+            self._idle_task = self.helper.loop.create_task(self.release_idle_async())
+
+    def start(self):
+        # The event loop drives the client, there is no thread to start
+        pass
+
+    async def release_idle_async(self):
+        """Save the records of vehicles that went quiet, every idle_check_interval seconds"""
+        while True:
+            await asyncio.sleep(self.idle_check_interval)
+            try:
+                held = self.release_idle()
+                if held and not await self.hub_gateway.save_batch(held):
+                    logging.error("Hub is not available")
+            except Exception as e:
+                logging.error(f"Error releasing idle vehicles: {e}")
+
+    async def stop(self):
+        """Stop receiving and wait for the messages being handled"""
+        self._stopping = True
+        for subscription in self.subscriptions:
+            self.client.unsubscribe(subscription)
+        self.helper.pause_reading()
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+        if self._idle_task is not None:
+            self._idle_task.cancel()
+            await asyncio.gather(self._idle_task, return_exceptions=True)
+        held = self.flush_held()
+        if held and not await self.hub_gateway.save_batch(held):
+            logging.error("Hub is not available")
+        await self.helper.disconnect()
+
+    def _message_done(self, task):
+        self._pending.discard(task)
+        if not self._stopping and len(self._pending) <= self.max_pending // 2:
+            self.helper.resume_reading()
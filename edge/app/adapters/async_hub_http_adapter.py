@@ -0,0 +1,26 @@
+import asyncio
+from typing import List
+
+from app.adapters.hub_batch_http_adapter import HubBatchHttpAdapter
+from app.entities.processed_agent_data import ProcessedAgentData
+from app.interfaces.async_hub_gateway import AsyncHubGateway
+
+
+class AsyncHubHttpAdapter(AsyncHubGateway):
+    """
+    HTTP hub gateway for the asyncio runtime. HubBatchHttpAdapter sends from its
+    own thread, so saving only queues records and does not block the event
+    loop. Closing waits in the default executor for the last batches to go out.
+    """
+
+    def __init__(self, api_base_url, **options):
+        self.http_adapter = HubBatchHttpAdapter(api_base_url, **options)
+
+    async def save_data(self, data: ProcessedAgentData):
+        return self.http_adapter.save_data(data)
+
+    async def save_batch(self, data_batch: List[ProcessedAgentData]):
+        return self.http_adapter.save_batch(data_batch)
+
+    async def close(self):
+        await asyncio.to_thread(self.http_adapter.close)
@@ -0,0 +1,89 @@
+import asyncio
+import logging
+from typing import List
+
+from paho.mqtt import client as mqtt_client
+
+from app.adapters import binary_codec
+from app.adapters.asyncio_mqtt import AsyncioMqttHelper
+from app.adapters.hub_batch_mqtt_adapter import HubBatchMqttAdapter
+from app.entities.processed_agent_data import ProcessedAgentData
+from app.interfaces.async_hub_gateway import AsyncHubGateway
+
+
+class AsyncHubMqttAdapter(AsyncHubGateway):
+    """HubMqttAdapter for the asyncio runtime, its paho client runs on the event loop"""
+
+    def __init__(self, broker, port, topic, wire_format="json"):
+        self.broker = broker
+        self.port = port
+        self.topic = topic
+        # "json" publishes one JSON document per record, "binary" one binary frame per batch
+        self.wire_format = wire_format
+        self.mqtt_client = mqtt_client.Client()
+        self.helper = None
+
+    async def connect(self):
+        def on_connect(client, userdata, flags, rc):
+            if rc == 0:
+                logging.info(f"Connected to hub MQTT broker ({self.broker}:{self.port})")
+            else:
+                logging.error(f"Failed to connect to hub MQTT broker, return code {rc}")
+
+        self.mqtt_client.on_connect = on_connect
+        self.helper = AsyncioMqttHelper(self.mqtt_client)
+        self.helper.connect(self.broker, self.port)
+
+    async def save_data(self, data: ProcessedAgentData):
+        """
+        Send the processed road data to the Hub.
+        Parameters:
+            data (ProcessedAgentData): Processed road data to be saved.
+        Returns:
+            bool: True if paho accepted the message, False otherwise.
+        """
+        if self.wire_format == "binary":
+            return await self.save_batch([data])
+        return self._publish(data.model_dump_json())
+
+    async def save_batch(self, data_batch: List[ProcessedAgentData]):
+        if self.wire_format != "binary":
+            return await super().save_batch(data_batch)
+        frames = binary_codec.encode_frames(
+            binary_codec.KIND_PROCESSED, [data.model_dump() for data in data_batch]
+        )
+        return all([self._publish(msg) for msg in frames])
+
+    async def close(self):
+        """Write out the messages paho still holds, then disconnect"""
+        if self.helper is not None:
+            await self.helper.disconnect()
+
+    def _publish(self, msg):
+        # Only queues the message, the event loop writes it when the socket is ready
+        result = self.mqtt_client.publish(self.topic, msg)
+        if result[0] == 0:
+            return True
+        logging.error(f"Failed to send message to topic {self.topic}")
+        return False
+
+
+class AsyncHubBatchMqttAdapter(AsyncHubGateway):
+    """
+    Batching QoS 1 hub gateway for the asyncio runtime. HubBatchMqttAdapter
+    publishes from its own threads, so saving only queues records and does not
+    block the event loop. Closing waits in the default executor for the last
+    batches to be acknowledged.
+    """
+
+    def __init__(self, broker, port, topic, **options):
+        self.mqtt_adapter = HubBatchMqttAdapter(broker, port, topic, **options)
+
+    async def save_data(self, data: ProcessedAgentData):
+        return self.mqtt_adapter.save_data(data)
+
+    async def save_batch(self, data_batch: List[ProcessedAgentData]):
+        return self.mqtt_adapter.save_batch(data_batch)
+
+    async def close(self):
+        await asyncio.to_thread(self.mqtt_adapter.close)
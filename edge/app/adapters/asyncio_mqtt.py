@@ -0,0 +1,82 @@
+import asyncio
+import logging
+
+import paho.mqtt.client as mqtt
+
+# Seconds between paho housekeeping calls (keepalive pings, retries, reconnects)
+MISC_INTERVAL = 1
+
+
+class AsyncioMqttHelper:
+    """
+    Runs a paho client on an asyncio event loop instead of its own thread.
+    paho reports its socket through callbacks, the helper watches it with
+    add_reader/add_writer and calls loop_read/loop_write when it is ready,
+    and loop_misc once a second. Nothing is polled, so an idle client costs
+    no CPU. Lost connections are re-established by the housekeeping task.
+    """
+
+    def __init__(self, client: mqtt.Client, loop: asyncio.AbstractEventLoop = None):
+        self.client = client
+        self.loop = loop or asyncio.get_running_loop()
+        self._sock = None
+        self._reading = True
+        self._stopping = False
+        self._misc = None
+        client.on_socket_open = self.on_socket_open
+        client.on_socket_close = self.on_socket_close
+        client.on_socket_register_write = self.on_socket_register_write
+        client.on_socket_unregister_write = self.on_socket_unregister_write
+
+    def connect(self, host, port, keepalive=60):
+        """Connect and start housekeeping, must be called on the event loop"""
+        self.client.connect(host, port, keepalive)
+        self._misc = self.loop.create_task(self._misc_loop())
+
+    async def disconnect(self, timeout=5.0):
+        """Write out what paho still has queued, then disconnect"""
+        self._stopping = True
+        deadline = self.loop.time() + timeout
+        while self.client.want_write() and self.loop.time() < deadline:
+            await asyncio.sleep(0.01)
+        self.client.disconnect()
+        while self._sock is not None and self.loop.time() < deadline:
+            await asyncio.sleep(0.01)
+        if self._misc is not None:
+            self._misc.cancel()
+
+    def pause_reading(self):
+        """Stop reading from the socket, the broker holds messages back meanwhile"""
+        if self._reading and self._sock is not None:
+            self.loop.remove_reader(self._sock)
+        self._reading = False
+
+    def resume_reading(self):
+        if not self._reading and self._sock is not None:
+            self.loop.add_reader(self._sock, self.client.loop_read)
+        self._reading = True
+
+    def on_socket_open(self, client, userdata, sock):
+        self._sock = sock
+        if self._reading:
+            self.loop.add_reader(sock, client.loop_read)
+
+    def on_socket_close(self, client, userdata, sock):
+        self.loop.remove_reader(sock)
+        self.loop.remove_writer(sock)
+        self._sock = None
+
+    def on_socket_register_write(self, client, userdata, sock):
+        self.loop.add_writer(sock, client.loop_write)
+
+    def on_socket_unregister_write(self, client, userdata, sock):
+        self.loop.remove_writer(sock)
+
+    async def _misc_loop(self):
+        while not self._stopping:
+            if self.client.loop_misc() == mqtt.MQTT_ERR_NO_CONN and not self._stopping:
+                try:
+                    self.client.reconnect()
+                except OSError as e:
+                    logging.info(f"MQTT reconnect failed: {e}")
+            await asyncio.sleep(MISC_INTERVAL)
@@ -0,0 +1,103 @@
+import logging
+import threading
+import time
+from typing import Callable, List, Optional
+
+
+class BatchBuffer:
+    """
+    Coalesces records into batches for the batching hub gateways. A batch is
+    handed to `send(batch, saved_at)` from a background thread once it holds
+    `max_batch` records or `max_bytes` bytes, or `linger` seconds after its
+    first record was added; `saved_at` is the monotonic time that record was
+    added. `add` never blocks, it refuses records once `max_pending` wait.
+    If `send` raises, the error is logged, the batch is handed to
+    `failed(batch)` and the thread goes on with the next batch.
+    """
+
+    def __init__(
+        self,
+        send: Callable[[List, float], None],
+        max_batch=500,
+        max_bytes=1024 * 1024,
+        linger=0.05,
+        max_pending=100000,
+        failed: Optional[Callable[[List], None]] = None,
+    ):
+        self.send = send
+        self.failed = failed
+        self.max_batch = max_batch
+        self.max_bytes = max_bytes
+        self.linger = linger
+        self.max_pending = max_pending
+        # (record, size in bytes, monotonic time it was added)
+        self._buffer = []
+        self._buffer_bytes = 0
+        self._changed = threading.Condition()
+        self._running = True
+        self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+        self._flusher.start()
+
+    def add(self, records: List, sizes: List[int]) -> bool:
+        """
+        Queue records for the next batches.
+        Returns:
+            bool: False if the records were refused because too many are waiting.
+        """
+        now = time.monotonic()
+        with self._changed:
+            if len(self._buffer) + len(records) > self.max_pending:
+                return False
+            self._buffer.extend(zip(records, sizes, [now] * len(records)))
+            self._buffer_bytes += sum(sizes)
+            self._changed.notify()
+        return True
+
+    def close(self):
+        """Send whatever is queued and stop the background thread"""
+        with self._changed:
+            self._running = False
+            self._changed.notify()
+        self._flusher.join()
+
+    def _due(self):
+        # Called with the lock held
+        if not self._buffer:
+            return False
+        return (
+            not self._running
+            or len(self._buffer) >= self.max_batch
+            or self._buffer_bytes >= self.max_bytes
+            or time.monotonic() - self._buffer[0][2] >= self.linger
+        )
+
+    def _take(self):
+        # Called with the lock held, the next batch within the size limits
+        count, size = 0, 0
+        for _, record_size, _ in self._buffer:
+            if count and (count >= self.max_batch or size + record_size > self.max_bytes):
+                break
+            count += 1
+            size += record_size
+        batch, self._buffer = self._buffer[:count], self._buffer[count:]
+        self._buffer_bytes -= size
+        return [record for record, _, _ in batch], batch[0][2]
+
+    def _flush_loop(self):
+        while True:
+            with self._changed:
+                while not self._due():
+                    if not self._running:
+                        return
+                    timeout = None
+                    if self._buffer:
+                        timeout = max(0.0, self._buffer[0][2] + self.linger - time.monotonic())
+                    self._changed.wait(timeout)
+                batch, saved_at = self._take()
+            try:
+                self.send(batch, saved_at)
+            except Exception:
+                # A dead flusher would queue records until max_pending and then drop them all
+                logging.exception(f"Failed to send a batch of {len(batch)} records")
+                if self.failed:
+                    self.failed(batch)
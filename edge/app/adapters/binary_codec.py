@@ -0,0 +1,243 @@
+"""
+Compact binary wire format for agent -> edge -> hub messages.
+
+A frame starts with a header byte that can never begin a JSON document, so
+subscribers tell binary frames from JSON payloads by their first byte.
+
+    header   <BBBHB  magic, version, kind, record count, string count
+             (so at most MAX_RECORDS records per frame)
+    strings  per string: length (B) + UTF-8 bytes
+    records  fixed-size struct per record, layout given by the kind
+
+Units and status labels are stored once per frame in the string table and
+records refer to them by index, so new labels need no format change.
+Timestamps keep their wall-clock value in microseconds plus the UTC offset
+in minutes, which round-trips naive and aware datetimes exactly.
+
+The same module lives in agent, edge and hub, keep the copies in sync.
+"""
+import math
+import struct
+from datetime import datetime, timedelta, timezone
+from typing import List, Tuple
+
+MAGIC = 0xB5
+VERSION = 1
+
+# Reading of the agent (AggregatedData), with parking
+KIND_AGGREGATED = 1
+# Record of the edge (ProcessedAgentData), with statuses
+KIND_PROCESSED = 2
+
+HEADER = struct.Struct("<BBBHB")
+# The record count is an unsigned 16-bit field of the header
+MAX_RECORDS = 0xFFFF
+# user_id, timestamp (µs), utc offset (min), accelerometer x/y/z, gps latitude/longitude,
+# temperature + unit, humidity + unit, vibration x/y/z/magnitude, illumination,
+# pm2_5, pm10, aqi
+AGENT_DATA_FORMAT = "Iqh" "ddd" "dd" "dB" "dB" "dddd" "d" "dd" "i"
+# parking empty_count, longitude, latitude
+PARKING_FORMAT = "idd"
+# road_state, temp, humidity, vibration, light and air quality statuses
+STATUSES_FORMAT = "BBBBBB"
+RECORDS = {
+    KIND_AGGREGATED: struct.Struct("<" + AGENT_DATA_FORMAT + PARKING_FORMAT),
+    KIND_PROCESSED: struct.Struct("<" + AGENT_DATA_FORMAT + STATUSES_FORMAT),
+}
+STATUSES = (
+    "road_state",
+    "temp_status",
+    "humidity_status",
+    "vibration_status",
+    "light_status",
+    "air_quality_status",
+)
+
+NAIVE = -32768  # utc offset of a naive timestamp
+NO_STRING = 0xFF  # string index of None
+NO_AQI = -(2**31)
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+
+
+def is_binary(payload: bytes) -> bool:
+    """True if the payload is a binary frame rather than JSON"""
+    return len(payload) > 0 and payload[0] == MAGIC
+
+
+def encode_frame(kind: int, records: List[dict]) -> bytes:
+    """
+    Pack records into one binary frame.
+    Parameters:
+        kind: KIND_AGGREGATED or KIND_PROCESSED.
+        records: Records as nested dicts, shaped like their JSON documents
+            (AggregatedData or ProcessedAgentData with its agent_data).
+            Timestamps may be datetimes or ISO 8601 strings.
+    Returns:
+        bytes: The frame.
+    Raises:
+        ValueError: If there are more than MAX_RECORDS records, see encode_frames.
+    """
+    if len(records) > MAX_RECORDS:
+        raise ValueError(f"A binary frame holds at most {MAX_RECORDS} records, got {len(records)}")
+    record_struct = RECORDS[kind]
+    strings = {}
+
+    def string_index(value):
+        if value is None:
+            return NO_STRING
+        index = strings.get(value)
+        if index is None:
+            index = strings[value] = len(strings)
+            if index >= NO_STRING:
+                raise ValueError("Too many distinct strings in one frame")
+        return index
+
+    body = []
+    for processed in records:
+        record = processed["agent_data"] if kind == KIND_PROCESSED else processed
+        accelerometer, gps = record["accelerometer"], record["gps"]
+        temperature, humidity = record["temperature"], record["humidity"]
+        vibration, air_quality = record["vibration"], record["air_quality"]
+        micros, offset = _pack_timestamp(record["timestamp"])
+        magnitude = vibration.get("magnitude")
+        aqi = air_quality.get("aqi")
+        values = [
+            record["user_id"],
+            micros,
+            offset,
+            accelerometer["x"],
+            accelerometer["y"],
+            accelerometer["z"],
+            gps["latitude"],
+            gps["longitude"],
+            temperature["value"],
+            string_index(temperature["unit"]),
+            humidity["value"],
+            string_index(humidity["unit"]),
+            vibration["x"],
+            vibration["y"],
+            vibration["z"],
+            math.nan if magnitude is None else magnitude,
+            record["light"]["illumination"],
+            air_quality["pm2_5"],
+            air_quality["pm10"],
+            NO_AQI if aqi is None else aqi,
+        ]
+        if kind == KIND_AGGREGATED:
+            parking = record["parking"]
+            values += [
+                int(parking["empty_count"]),
+                parking["gps"]["longitude"],
+                parking["gps"]["latitude"],
+            ]
+        else:
+            values += [string_index(processed.get(status)) for status in STATUSES]
+        body.append(record_struct.pack(*values))
+
+    header = [HEADER.pack(MAGIC, VERSION, kind, len(records), len(strings))]
+    for value in strings:
+        encoded = value.encode("utf-8")
+        header.append(bytes((len(encoded),)) + encoded)
+    return b"".join(header + body)
+
+
+def encode_frames(kind: int, records: List[dict]) -> List[bytes]:
+    """Pack records into as many binary frames as MAX_RECORDS requires"""
+    return [
+        encode_frame(kind, records[start:start + MAX_RECORDS])
+        for start in range(0, max(len(records), 1), MAX_RECORDS)
+    ]
+
+
+def decode_frame(payload: bytes) -> Tuple[int, List[dict]]:
+    """
+    Unpack a binary frame.
+    Parameters:
+        payload: The frame.
+    Returns:
+        (kind, records): The kind of the frame and its records as nested dicts,
+            shaped like their JSON documents, with datetime timestamps.
+    """
+    magic, version, kind, count, string_count = HEADER.unpack_from(payload, 0)
+    if magic != MAGIC:
+        raise ValueError("Not a binary frame")
+    if version != VERSION:
+        raise ValueError(f"Unsupported binary frame version: {version}")
+    record_struct = RECORDS.get(kind)
+    if record_struct is None:
+        raise ValueError(f"Unknown binary frame kind: {kind}")
+
+    position = HEADER.size
+    strings = []
+    for _ in range(string_count):
+        length = payload[position]
+        strings.append(payload[position + 1:position + 1 + length].decode("utf-8"))
+        position += 1 + length
+    if len(payload) - position != count * record_struct.size:
+        raise ValueError("Truncated binary frame")
+
+    def string(index):
+        return None if index == NO_STRING else strings[index]
+
+    records = []
+    for values in record_struct.iter_unpack(payload[position:]):
+        (
+            user_id, micros, offset, x, y, z, latitude, longitude,
+            temperature, temperature_unit, humidity, humidity_unit,
+            vx, vy, vz, magnitude, illumination, pm2_5, pm10, aqi,
+        ) = values[:20]
+        record = {
+            "user_id": user_id,
+            "accelerometer": {"x": x, "y": y, "z": z},
+            "gps": {"latitude": latitude, "longitude": longitude},
+            "temperature": {"value": temperature, "unit": string(temperature_unit)},
+            "humidity": {"value": humidity, "unit": string(humidity_unit)},
+            "vibration": {
+                "x": vx,
+                "y": vy,
+                "z": vz,
+                "magnitude": None if math.isnan(magnitude) else magnitude,
+            },
+            "light": {"illumination": illumination},
+            "air_quality": {
+                "pm2_5": pm2_5,
+                "pm10": pm10,
+                "aqi": None if aqi == NO_AQI else aqi,
+            },
+            "timestamp": _unpack_timestamp(micros, offset),
+        }
+        if kind == KIND_AGGREGATED:
+            empty_count, parking_longitude, parking_latitude = values[20:]
+            record["parking"] = {
+                "empty_count": empty_count,
+                "gps": {"longitude": parking_longitude, "latitude": parking_latitude},
+            }
+        else:
+            record = {"agent_data": record}
+            for status, index in zip(STATUSES, values[20:]):
+                record[status] = string(index)
+        records.append(record)
+    return kind, records
+
+
+def _pack_timestamp(value) -> Tuple[int, int]:
+    if isinstance(value, str):
+        # fromisoformat of Python < 3.11 does not accept the "Z" suffix
+        if value.endswith("Z"):
+            value = value[:-1] + "+00:00"
+        value = datetime.fromisoformat(value)
+    offset = value.utcoffset()
+    micros = (value.replace(tzinfo=None) - EPOCH) // MICROSECOND
+    if offset is None:
+        return micros, NAIVE
+    return micros, offset // timedelta(minutes=1)
+
+
+def _unpack_timestamp(micros: int, offset: int) -> datetime:
+    value = EPOCH + micros * MICROSECOND
+    if offset == NAIVE:
+        return value
+    if offset == 0:
+        return value.replace(tzinfo=timezone.utc)
+    return value.replace(tzinfo=timezone(timedelta(minutes=offset)))
@@ -0,0 +1,111 @@
+import gzip
+import logging
+import random
+import time
+from typing import List
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.adapters.batch_buffer import BatchBuffer
+from app.entities.processed_agent_data import ProcessedAgentData
+from app.interfaces.hub_gateway import HubGateway
+
+# Responses worth another attempt, anything else is final
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class HubBatchHttpAdapter(HubGateway):
+    """
+    High-throughput HubHttpAdapter. Records are serialized once when they are
+    saved and coalesced into batched POSTs (a JSON array) of at most
+    `max_batch` records or `max_bytes` bytes, or whatever arrived within
+    `linger` seconds of the first one. A background thread sends the batches
+    over a pooled keep-alive session, gzipped, retrying failed attempts with
+    jittered exponential backoff. save_data only queues, so it returns True
+    unless `max_pending` records are already waiting.
+    """
+
+    def __init__(
+        self,
+        api_base_url,
+        max_batch=500,
+        max_bytes=1024 * 1024,
+        linger=0.05,
+        compress=True,
+        retries=3,
+        backoff=0.1,
+        max_pending=100000,
+        timeout=10,
+    ):
+        self.url = f"{api_base_url}/agent_data/"
+        self.compress = compress
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=4))
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=4))
+        self.sent_batches = 0
+        self.sent_records = 0
+        self.failed_records = 0
+        self.dropped_records = 0
+        self.buffer = BatchBuffer(self._post, max_batch, max_bytes, linger, max_pending, self._failed)
+
+    def save_data(self, data: ProcessedAgentData):
+        """
+        Queue the road data for the Hub.
+        Parameters:
+            data (ProcessedAgentData): Processed road data to be saved.
+        Returns:
+            bool: True if the data is queued, False if too much is already waiting.
+        """
+        return self.save_batch([data])
+
+    def save_batch(self, data_batch: List[ProcessedAgentData]):
+        """
+        Queue several processed records for the Hub.
+        Returns:
+            bool: True if the data is queued, False if too much is already waiting.
+        """
+        documents = [data.model_dump_json().encode("utf-8") for data in data_batch]
+        # Every document takes a comma in the JSON array
+        if not self.buffer.add(documents, [len(document) + 1 for document in documents]):
+            self.dropped_records += len(documents)
+            logging.error("Hub is not keeping up, dropping processed data")
+            return False
+        return True
+
+    def close(self):
+        """Send whatever is queued and stop the background thread"""
+        self.buffer.close()
+        self.session.close()
+
+    def _post(self, batch, saved_at):
+        body = b"[" + b",".join(batch) + b"]"
+        headers = {"Content-Type": "application/json"}
+        if self.compress:
+            body = gzip.compress(body, compresslevel=5)
+            headers["Content-Encoding"] = "gzip"
+        for attempt in range(self.retries + 1):
+            if attempt:
+                # Full jitter keeps edges that failed together from retrying together
+                time.sleep(random.uniform(0, self.backoff * 2 ** (attempt - 1)))
+            try:
+                response = self.session.post(self.url, data=body, headers=headers, timeout=self.timeout)
+            except requests.RequestException as e:
+                logging.info(f"Hub request failed: {e}")
+                continue
+            if response.status_code == 200:
+                self.sent_batches += 1
+                self.sent_records += len(batch)
+                return True
+            logging.info(f"Invalid Hub response: {response}")
+            if response.status_code not in RETRY_STATUSES:
+                break
+        self.failed_records += len(batch)
+        logging.error(f"Hub is not available, {len(batch)} records lost")
+        return False
+
+    def _failed(self, batch):
+        self.failed_records += len(batch)
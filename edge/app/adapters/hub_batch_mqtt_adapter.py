@@ -0,0 +1,196 @@
+import logging
+import threading
+import time
+from collections import deque
+from typing import List
+
+import numpy as np
+from paho.mqtt import client as mqtt_client
+
+from app.adapters import binary_codec
+from app.adapters.batch_buffer import BatchBuffer
+from app.adapters.hub_mqtt_adapter import HubMqttAdapter
+from app.entities.processed_agent_data import ProcessedAgentData
+
+# Delivery latencies kept for the percentiles
+LATENCY_SAMPLES = 10000
+
+
+class HubBatchMqttAdapter(HubMqttAdapter):
+    """
+    HubMqttAdapter that publishes batches at QoS 1. Records are coalesced into
+    one payload per batch (a JSON array, or a binary frame with the binary
+    wire format, see BatchBuffer for when a batch is sent) and at most
+    `window` batches wait for their PUBACK. A batch counts as delivered when
+    paho reports its PUBACK through on_publish, and the time from saving its
+    first record to that moment is its delivery latency, logged with the
+    other counters every `report_every` seconds (0 disables the reports).
+    save_data only queues, so it returns True unless `max_pending` records are
+    already waiting, which happens once the window has been full for a while.
+    close(timeout) bounds the whole shutdown, batches that still wait for room
+    in the window at its deadline count as failed.
+    """
+
+    def __init__(
+        self,
+        broker,
+        port,
+        topic,
+        wire_format="json",
+        max_batch=500,
+        max_bytes=256 * 1024,
+        linger=0.05,
+        window=20,
+        max_pending=100000,
+        report_every=0,
+    ):
+        super().__init__(broker, port, topic, wire_format)
+        if wire_format == "binary":
+            # A batch is one frame
+            max_batch = min(max_batch, binary_codec.MAX_RECORDS)
+        self.window = window
+        self.report_every = report_every
+        self._next_report = time.monotonic() + report_every
+        self.sent_batches = 0
+        self.delivered_batches = 0
+        self.delivered_records = 0
+        self.failed_records = 0
+        self.dropped_records = 0
+        self.in_flight = 0
+        # Monotonic deadline of close, None until it is called
+        self._close_deadline = None
+        self._lock = threading.Lock()
+        self._window_free = threading.Condition(self._lock)
+        # mid -> (records in the batch, monotonic time its first record was saved)
+        self._batches = {}
+        # mid -> monotonic time of a PUBACK that arrived before paho returned the mid
+        self._early_acks = {}
+        self._latencies = deque(maxlen=LATENCY_SAMPLES)
+        self.mqtt_client.max_inflight_messages_set(window)
+        self.mqtt_client.on_publish = self._on_publish
+        self.buffer = BatchBuffer(self._publish_batch, max_batch, max_bytes, linger, max_pending, self._failed)
+
+    def save_data(self, data: ProcessedAgentData):
+        """
+        Queue the road data for the Hub.
+        Parameters:
+            data (ProcessedAgentData): Processed road data to be saved.
+        Returns:
+            bool: True if the data is queued, False if too much is already waiting.
+        """
+        return self.save_batch([data])
+
+    def save_batch(self, data_batch: List[ProcessedAgentData]):
+        """
+        Queue several processed records for the Hub.
+        Returns:
+            bool: True if the data is queued, False if too much is already waiting.
+        """
+        if self.wire_format == "binary":
+            records = [data.model_dump() for data in data_batch]
+            sizes = [binary_codec.RECORDS[binary_codec.KIND_PROCESSED].size] * len(records)
+        else:
+            records = [data.model_dump_json().encode("utf-8") for data in data_batch]
+            sizes = [len(record) + 1 for record in records]
+        if not self.buffer.add(records, sizes):
+            self.dropped_records += len(records)
+            logging.error("Hub is not keeping up, dropping processed data")
+            return False
+        return True
+
+    def close(self, timeout=10.0):
+        """
+        Publish whatever is queued and wait for the outstanding PUBACKs, for
+        at most `timeout` seconds.
+        """
+        deadline = time.monotonic() + timeout
+        with self._window_free:
+            # Wakes a flusher waiting for the window, it gives up at the deadline
+            self._close_deadline = deadline
+            self._window_free.notify_all()
+        self.buffer.close()
+        with self._window_free:
+            while self.in_flight and time.monotonic() < deadline:
+                self._window_free.wait(deadline - time.monotonic())
+
+    def stats(self) -> dict:
+        """Counters and delivery latency percentiles in milliseconds"""
+        with self._lock:
+            latencies = np.array(self._latencies)
+            stats = dict(
+                sent_batches=self.sent_batches,
+                delivered_batches=self.delivered_batches,
+                delivered_records=self.delivered_records,
+                failed_records=self.failed_records,
+                dropped_records=self.dropped_records,
+                in_flight=self.in_flight,
+            )
+        for percentile in (50, 95, 99):
+            stats[f"p{percentile}_ms"] = (
+                float(np.percentile(latencies, percentile)) * 1000 if len(latencies) else None
+            )
+        return stats
+
+    def _publish_batch(self, batch, saved_at):
+        if self.wire_format == "binary":
+            payload = binary_codec.encode_frame(binary_codec.KIND_PROCESSED, batch)
+        else:
+            payload = b"[" + b",".join(batch) + b"]"
+        with self._window_free:
+            while self.in_flight >= self.window:
+                if self._close_deadline is None:
+                    self._window_free.wait()
+                    continue
+                remaining = self._close_deadline - time.monotonic()
+                if remaining <= 0:
+                    self.failed_records += len(batch)
+                    logging.error(f"Hub did not acknowledge in time, {len(batch)} records lost")
+                    return
+                self._window_free.wait(remaining)
+            self.in_flight += 1
+        try:
+            result = self.mqtt_client.publish(self.topic, payload, qos=1)
+        except Exception:
+            with self._window_free:
+                self.in_flight -= 1
+                self._window_free.notify_all()
+            raise
+        with self._window_free:
+            # Without a connection paho keeps QoS 1 messages and sends them on reconnect
+            if result.rc not in (mqtt_client.MQTT_ERR_SUCCESS, mqtt_client.MQTT_ERR_NO_CONN):
+                self.in_flight -= 1
+                self.failed_records += len(batch)
+                self._window_free.notify_all()
+                logging.error(f"Failed to send message to topic {self.topic}")
+                return
+            self.sent_batches += 1
+            acked_at = self._early_acks.pop(result.mid, None)
+            if acked_at is None:
+                self._batches[result.mid] = (len(batch), saved_at)
+            else:
+                self._delivered(len(batch), acked_at - saved_at)
+
+    def _failed(self, batch):
+        with self._lock:
+            self.failed_records += len(batch)
+
+    def _on_publish(self, client, userdata, mid):
+        acked_at = time.monotonic()
+        with self._window_free:
+            batch = self._batches.pop(mid, None)
+            if batch is None:
+                self._early_acks[mid] = acked_at
+            else:
+                records, saved_at = batch
+                self._delivered(records, acked_at - saved_at)
+        if self.report_every and acked_at >= self._next_report:
+            self._next_report = acked_at + self.report_every
+            logging.info(f"Hub batch delivery: {self.stats()}")
+
+    def _delivered(self, records, latency):
+        # Called with the lock held
+        self.in_flight -= 1
+        self.delivered_batches += 1
+        self.delivered_records += records
+        self._latencies.append(latency)
+        self._window_free.notify_all()
@@ -19,11 +19,12 @@ class HubHttpAdapter(HubGateway):
             bool: True if the data is successfully saved, False otherwise.
         """
         url = f"{self.api_base_url}/agent_data/"
+        body = data.model_dump_json()
 
-        response = requests.post(url, data=data.model_dump_json())
+        response = requests.post(url, data=body)
         if response.status_code != 200:
             logging.info(
-                f"Invalid Hub response\nData: {data.model_dump_json()}\nResponse: {response}"
+                f"Invalid Hub response\nData: {body}\nResponse: {response}"
             )
             return False
         return True
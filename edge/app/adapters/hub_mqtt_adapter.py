@@ -1,17 +1,21 @@
 import logging
+from typing import List
 
 import requests as requests
 from paho.mqtt import client as mqtt_client
 
+from app.adapters import binary_codec
 from app.entities.processed_agent_data import ProcessedAgentData
 from app.interfaces.hub_gateway import HubGateway
 
 
 class HubMqttAdapter(HubGateway):
-    def __init__(self, broker, port, topic):
+    def __init__(self, broker, port, topic, wire_format="json"):
         self.broker = broker
         self.port = port
         self.topic = topic
+        # "json" publishes one JSON document per record, "binary" one binary frame per batch
+        self.wire_format = wire_format
         self.mqtt_client = self._connect_mqtt(broker, port)
 
     def save_data(self, data: ProcessedAgentData):
@@ -22,7 +26,27 @@ class HubMqttAdapter(HubGateway):
         Returns:
             bool: True if the data is successfully saved, False otherwise.
         """
-        msg = data.model_dump_json()
+        if self.wire_format == "binary":
+            return self.save_batch([data])
+        return self._publish(data.model_dump_json())
+
+    def save_batch(self, data_batch: List[ProcessedAgentData]):
+        """
+        Save several processed records, as one binary frame if the binary wire
+        format is used (several for more than binary_codec.MAX_RECORDS records).
+        Parameters:
+            data_batch (List[ProcessedAgentData]): Processed road data to be saved.
+        Returns:
+            bool: True if the data is successfully saved, False otherwise.
+        """
+        if self.wire_format != "binary":
+            return super().save_batch(data_batch)
+        frames = binary_codec.encode_frames(
+            binary_codec.KIND_PROCESSED, [data.model_dump() for data in data_batch]
+        )
+        return all([self._publish(msg) for msg in frames])
+
+    def _publish(self, msg):
         result = self.mqtt_client.publish(self.topic, msg)
         status = result[0]
         if status == 0:
@@ -0,0 +1,60 @@
+import hashlib
+import zlib
+from typing import List
+
+# Agents publishing with MQTT_SHARDS put their topics under shard/<shard>/
+SHARD_PREFIX = "shard/"
+
+
+def shard_of(user_id: int, shards: int) -> int:
+    """Shard of a vehicle, the same on every agent and edge (see agent/src/sharding.py)"""
+    return zlib.crc32(str(user_id).encode("ascii")) % shards
+
+
+def shard_owner(shard: int, instances: int) -> int:
+    """
+    Edge instance owning a shard, by rendezvous hashing: the instance with the
+    highest hash of (shard, instance). Going from N to N + 1 instances only
+    moves the shards the new instance wins, about 1 / (N + 1) of them.
+    """
+    return max(range(instances), key=lambda instance: _weight(shard, instance))
+
+
+def owned_shards(instance: int, instances: int, shards: int) -> List[int]:
+    return [shard for shard in range(shards) if shard_owner(shard, instances) == instance]
+
+
+def subscriptions(topics: List[str], shards=0, instance=0, instances=1, share_group="") -> List[str]:
+    """
+    Topic filters an edge instance subscribes to.
+    Parameters:
+        topics: The topic filters of the agents, e.g. MQTT_TOPIC and MQTT_STREAMS_TOPIC.
+        shards: Number of shard topics the agents publish on, 0 if they do not shard.
+        instance, instances: This instance's index and the number of edge instances.
+        share_group: Subscribe as a member of this shared subscription group
+            ($share/<group>/<filter>), the broker then hands every message to
+            one member only. Messages are spread one by one, so a vehicle's
+            stream is split between the members: use it only without
+            per-vehicle state (stream merging, EDGE_ROAD_DETECTOR=peaks,
+            EDGE_ENV_WINDOW).
+    """
+    if shards:
+        topics = [
+            f"{SHARD_PREFIX}{shard}/{topic}"
+            for shard in owned_shards(instance, instances, shards)
+            for topic in topics
+        ]
+    if share_group:
+        topics = [f"$share/{share_group}/{topic}" for topic in topics]
+    return topics
+
+
+def strip_shard(topic: str) -> str:
+    """The topic the agent would have used without shards"""
+    if topic.startswith(SHARD_PREFIX):
+        return topic.split("/", 2)[2]
+    return topic
+
+
+def _weight(shard: int, instance: int) -> bytes:
+    return hashlib.blake2b(f"{shard}:{instance}".encode("ascii"), digest_size=8).digest()
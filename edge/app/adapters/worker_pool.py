@@ -0,0 +1,101 @@
+import logging
+import queue
+import threading
+import time
+
+# "block" makes the caller wait for room in the queue (backpressure onto the
+# MQTT connection), "drop_newest" rejects the new item, "drop_oldest" evicts
+# the item that has been waiting longest to make room for it
+DROP_POLICIES = ("block", "drop_newest", "drop_oldest")
+
+
+class WorkerPool:
+    """
+    Bounded queue in front of a pool of worker threads calling `handler`.
+    Lets the MQTT network thread hand messages over and return at once, so a
+    slow hub does not stall intake and keepalives. When the queue is full the
+    drop policy decides what happens.
+    """
+
+    def __init__(self, handler, workers=4, queue_size=10000, drop_policy="drop_oldest"):
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError(f"Unknown drop policy: {drop_policy}")
+        self.handler = handler
+        self.workers = workers
+        self.drop_policy = drop_policy
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.submitted = 0
+        self.dropped = 0
+        self.handled = 0
+        # Seconds items spent in the queue, summed over all handled items
+        self.wait_time = 0.0
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def start(self):
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"edge-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        """Let the workers finish what is queued and wait for them"""
+        for _ in self._threads:
+            self.queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def submit(self, *args) -> bool:
+        """
+        Queue one call of the handler.
+        Returns:
+            bool: False if the item was dropped.
+        """
+        item = (time.perf_counter(), args)
+        self.submitted += 1
+        if self.drop_policy == "block":
+            self.queue.put(item)
+            return True
+        try:
+            self.queue.put_nowait(item)
+            return True
+        except queue.Full:
+            pass
+        if self.drop_policy == "drop_oldest":
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                pass
+            try:
+                self.queue.put_nowait(item)
+            except queue.Full:
+                pass
+        self.dropped += 1
+        return self.drop_policy == "drop_oldest"
+
+    def metrics(self) -> dict:
+        with self._lock:
+            handled, wait_time = self.handled, self.wait_time
+        return dict(
+            queue_depth=self.queue.qsize(),
+            submitted=self.submitted,
+            dropped=self.dropped,
+            handled=handled,
+            queue_wait_ms=wait_time / handled * 1000 if handled else 0.0,
+        )
+
+    def _work(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            queued_at, args = item
+            waited = time.perf_counter() - queued_at
+            try:
+                self.handler(*args)
+            except Exception as e:
+                logging.error(f"Error in worker: {e}")
+            with self._lock:
+                self.handled += 1
+                self.wait_time += waited
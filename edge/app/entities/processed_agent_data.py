@@ -1,7 +1,29 @@
+from datetime import datetime
+from typing import Optional
+
 from pydantic import BaseModel
 from app.entities.agent_data import AgentData
 
 
+class ChannelSummary(BaseModel):
+    mean: float
+    min: float
+    max: float
+    count: int
+
+
+class EnvironmentSummary(BaseModel):
+    """Environmental readings of one vehicle over one window"""
+    window_start: datetime
+    window_seconds: float
+    temperature: ChannelSummary
+    humidity: ChannelSummary
+    illumination: ChannelSummary
+    pm2_5: ChannelSummary
+    pm10: ChannelSummary
+    aqi: Optional[ChannelSummary] = None
+
+
 class ProcessedAgentData(BaseModel):
     agent_data: AgentData
     road_state: str
@@ -10,3 +32,6 @@ class ProcessedAgentData(BaseModel):
     vibration_status: str = None
     light_status: str = None
     air_quality_status: str = None
+    # Set on the summaries of the edge's environment windows, whose agent_data
+    # holds the window means
+    environment: Optional[EnvironmentSummary] = None
@@ -0,0 +1,47 @@
+from abc import ABC, abstractmethod
+from typing import List
+from app.entities.processed_agent_data import ProcessedAgentData
+
+
+class AsyncHubGateway(ABC):
+    """
+    Abstract class representing the Hub Gateway interface of the asyncio runtime.
+    All async hub gateway adapters must implement these methods.
+    """
+
+    @abstractmethod
+    async def save_data(self, data: ProcessedAgentData) -> bool:
+        """
+        Method to send one processed record to the hub.
+        Parameters:
+            data (ProcessedAgentData): The processed data to be saved.
+        Returns:
+            bool: True if the data is successfully saved, False otherwise.
+        """
+        pass
+
+    async def save_batch(self, data_batch: List[ProcessedAgentData]) -> bool:
+        """
+        Method to send several processed records at once.
+        Adapters that can send a batch in one request should override it.
+        Parameters:
+            data_batch (List[ProcessedAgentData]): The processed data to be saved.
+        Returns:
+            bool: True if all the data is successfully saved, False otherwise.
+        """
+        saved = True
+        for data in data_batch:
+            saved = await self.save_data(data) and saved
+        return saved
+
+    async def connect(self):
+        """
+        Method to connect to the hub, called on the event loop before any data is saved.
+        """
+        pass
+
+    async def close(self):
+        """
+        Method to flush whatever is still being sent and release the connection.
+        """
+        pass
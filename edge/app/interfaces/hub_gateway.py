@@ -1,5 +1,7 @@
 from abc import ABC, abstractmethod
+from typing import List
 from app.entities.agent_data import AgentData
+from app.entities.processed_agent_data import ProcessedAgentData
 
 
 class HubGateway(ABC):
@@ -18,3 +20,17 @@ class HubGateway(ABC):
             bool: True if the data is successfully saved, False otherwise.
         """
         pass
+
+    def save_batch(self, data_batch: List[ProcessedAgentData]) -> bool:
+        """
+        Method to save several processed records at once.
+        Adapters that can send a batch in one request should override it.
+        Parameters:
+            data_batch (List[ProcessedAgentData]): The processed data to be saved.
+        Returns:
+            bool: True if all the data is successfully saved, False otherwise.
+        """
+        saved = True
+        for data in data_batch:
+            saved = self.save_data(data) and saved
+        return saved
@@ -0,0 +1,128 @@
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from typing import Dict, Optional
+
+import numpy as np
+
+# Built-in rule table, the thresholds the edge has always used. Every rule maps
+# a value to labels[i] where breakpoints[i - 1] <= value < breakpoints[i], or
+# breakpoints[i - 1] < value <= breakpoints[i] with "inclusive" upper bounds.
+# Values that are unknown (None or NaN) get the "missing" label.
+DEFAULT_RULE_TABLE = {
+    "vibration_status": {"breakpoints": [1.0, 3.0], "labels": ["smooth", "moderate", "rough"]},
+    "temp_status": {"breakpoints": [0, 20, 30], "labels": ["freezing", "cool", "warm", "hot"]},
+    "humidity_status": {"breakpoints": [30, 60], "labels": ["dry", "normal", "humid"]},
+    "light_status": {"breakpoints": [50], "labels": ["dark", "well-lit"]},
+    "air_quality_status": {
+        "breakpoints": [50, 100],
+        "labels": ["good", "moderate", "poor"],
+        "inclusive": True,
+        "missing": "unknown",
+    },
+}
+
+
+class Rule:
+    """Breakpoints of one status field, looked up with bisect or np.searchsorted"""
+
+    def __init__(self, breakpoints, labels, inclusive=False, missing=None):
+        self.breakpoints = [float(breakpoint) for breakpoint in breakpoints]
+        self.labels = list(labels)
+        self.inclusive = inclusive
+        self.missing = missing
+        if len(self.labels) != len(self.breakpoints) + 1:
+            raise ValueError("a rule needs exactly one label more than it has breakpoints")
+        if any(a >= b for a, b in zip(self.breakpoints, self.breakpoints[1:])):
+            raise ValueError("breakpoints must be strictly increasing")
+        # The missing label goes last, so NaN can be mapped to it by index
+        self._label_array = np.array(self.labels + [missing])
+        self._bisect = bisect_left if inclusive else bisect_right
+        self._side = "left" if inclusive else "right"
+
+    def label(self, value: Optional[float]) -> Optional[str]:
+        """Label of one value"""
+        if value is None or value != value:
+            return self.missing
+        return self.labels[self._bisect(self.breakpoints, value)]
+
+    def label_column(self, values: np.ndarray) -> list:
+        """Labels of a float array, NaN where the value is unknown"""
+        index = np.searchsorted(self.breakpoints, values, side=self._side)
+        index = np.where(np.isnan(values), len(self.labels), index)
+        return self._label_array[index].tolist()
+
+
+def compile_rules(table: dict) -> Dict[str, Rule]:
+    """
+    Compile a rule table. Fields the table leaves out keep their built-in rule.
+    Raises:
+        ValueError: If a field is unknown or a rule is malformed.
+    """
+    unknown = set(table) - set(DEFAULT_RULE_TABLE)
+    if unknown:
+        raise ValueError(f"unknown status fields: {', '.join(sorted(unknown))}")
+    merged = dict(DEFAULT_RULE_TABLE, **table)
+    try:
+        return {field: Rule(**rule) for field, rule in merged.items()}
+    except TypeError as e:
+        raise ValueError(str(e)) from e
+
+
+DEFAULT_RULES = compile_rules({})
+
+
+class RuleFile:
+    """
+    Rule table loaded from a JSON file and reloaded when the file changes.
+    `rules` checks the file at most every `check_interval` seconds and swaps
+    in the new table at once, so records are classified with either the old
+    or the new rules and none wait for a reload. A file that fails to load
+    is logged and the rules in use stay.
+    """
+
+    def __init__(self, path, check_interval=1.0):
+        self.path = path
+        self.check_interval = check_interval
+        self.reloads = 0
+        self._rules = DEFAULT_RULES
+        self._version = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+        self._reload()
+        if self._version is None:
+            logging.warning(f"No classification rules at {self.path}, using the built-in ones")
+
+    @property
+    def rules(self) -> Dict[str, Rule]:
+        if time.monotonic() >= self._next_check and self._lock.acquire(blocking=False):
+            try:
+                self._reload()
+            finally:
+                self._lock.release()
+        return self._rules
+
+    def _reload(self):
+        self._next_check = time.monotonic() + self.check_interval
+        try:
+            stat = os.stat(self.path)
+        except OSError as e:
+            if self._version is not None:
+                logging.error(f"Classification rules {self.path} are gone, keeping the loaded ones: {e}")
+                self._version = None
+            return
+        version = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        if version == self._version:
+            return
+        self._version = version
+        try:
+            with open(self.path) as file:
+                self._rules = compile_rules(json.load(file))
+        except (OSError, ValueError) as e:
+            logging.error(f"Invalid classification rules in {self.path}, keeping the loaded ones: {e}")
+            return
+        self.reloads += 1
+        logging.info(f"Loaded classification rules from {self.path}")
@@ -0,0 +1,138 @@
+import math
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List
+
+from app.entities.processed_agent_data import ChannelSummary, EnvironmentSummary, ProcessedAgentData
+from app.usecases.classification_rules import DEFAULT_RULES, Rule
+from app.usecases.data_processing import process_agent_data
+
+# Summarized channels and how to read them from AgentData
+CHANNELS = {
+    "temperature": lambda a: a.temperature.value,
+    "humidity": lambda a: a.humidity.value,
+    "illumination": lambda a: a.light.illumination,
+    "pm2_5": lambda a: a.air_quality.pm2_5,
+    "pm10": lambda a: a.air_quality.pm10,
+    "aqi": lambda a: a.air_quality.aqi,
+}
+
+EPOCH = datetime(1970, 1, 1)
+
+
+class Window:
+    """Running mean, min, max and count of every channel of one vehicle's window"""
+
+    def __init__(self, index):
+        self.index = index
+        self.last = None
+        self.stats = {channel: [0.0, math.inf, -math.inf, 0] for channel in CHANNELS}
+        self.last_fed = time.monotonic()
+
+    def add(self, processed: ProcessedAgentData):
+        self.last = processed
+        self.last_fed = time.monotonic()
+        for channel, read in CHANNELS.items():
+            value = read(processed.agent_data)
+            if value is None:
+                continue
+            stats = self.stats[channel]
+            stats[0] += value
+            stats[1] = min(stats[1], value)
+            stats[2] = max(stats[2], value)
+            stats[3] += 1
+
+    def summary(self, channel):
+        total, low, high, count = self.stats[channel]
+        if not count:
+            return None
+        return ChannelSummary(mean=total / count, min=low, max=high, count=count)
+
+
+class EnvironmentWindows:
+    """
+    Reduces the environmental channels (temperature, humidity, light and air
+    quality) of every vehicle to one summary per `window_seconds` window of
+    reading timestamps. Bumps and potholes are passed on as they come, every
+    other record only counts towards its window. When a window closes, one
+    record is forwarded for it: the last reading of the window with the
+    channel means in place of its values, statuses classified from those
+    means, and mean, min, max and count of every channel in `environment`.
+    A window closes with the first reading of a later one, once its vehicle
+    has sent nothing for `window_seconds` (see `close_idle`, which the edge
+    calls on a timer and feed calls every `window_seconds`), or on `flush`.
+    """
+
+    def __init__(self, window_seconds: float):
+        self.window_seconds = window_seconds
+        # user_id -> open Window
+        self.windows = {}
+        self._next_idle_check = time.monotonic() + window_seconds
+
+    def feed(
+        self, processed_data_batch: List[ProcessedAgentData], rules: Dict[str, Rule] = DEFAULT_RULES
+    ) -> List[ProcessedAgentData]:
+        """
+        Add labelled records.
+        Returns:
+            List[ProcessedAgentData]: The anomalies among them and the summaries
+                of the windows that closed.
+        """
+        forwarded = []
+        for processed in processed_data_batch:
+            user_id = processed.agent_data.user_id
+            index = self.window_index(processed.agent_data.timestamp)
+            window = self.windows.get(user_id)
+            if window is not None and window.index != index:
+                forwarded.append(self.summarize(self.windows.pop(user_id), rules))
+                window = None
+            if window is None:
+                window = self.windows[user_id] = Window(index)
+            window.add(processed)
+            if processed.road_state != "normal":
+                forwarded.append(processed)
+        if time.monotonic() >= self._next_idle_check:
+            forwarded.extend(self.close_idle(rules))
+        return forwarded
+
+    def close_idle(self, rules: Dict[str, Rule] = DEFAULT_RULES) -> List[ProcessedAgentData]:
+        """Summaries of the windows whose vehicle has been idle for `window_seconds`"""
+        now = time.monotonic()
+        self._next_idle_check = now + self.window_seconds
+        summaries = []
+        for user_id, window in list(self.windows.items()):
+            if now - window.last_fed >= self.window_seconds:
+                summaries.append(self.summarize(self.windows.pop(user_id), rules))
+        return summaries
+
+    def flush(self, rules: Dict[str, Rule] = DEFAULT_RULES) -> List[ProcessedAgentData]:
+        """Summaries of every open window"""
+        summaries = [self.summarize(window, rules) for window in self.windows.values()]
+        self.windows = {}
+        return summaries
+
+    def window_index(self, timestamp: datetime) -> int:
+        if timestamp.tzinfo is not None:
+            timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+        return math.floor((timestamp - EPOCH).total_seconds() / self.window_seconds)
+
+    def summarize(self, window: Window, rules: Dict[str, Rule]) -> ProcessedAgentData:
+        summaries = {channel: window.summary(channel) for channel in CHANNELS}
+        agent_data = window.last.agent_data.model_copy(deep=True)
+        agent_data.temperature.value = summaries["temperature"].mean
+        agent_data.humidity.value = summaries["humidity"].mean
+        agent_data.light.illumination = summaries["illumination"].mean
+        agent_data.air_quality.pm2_5 = summaries["pm2_5"].mean
+        agent_data.air_quality.pm10 = summaries["pm10"].mean
+        if summaries["aqi"] is not None:
+            agent_data.air_quality.aqi = round(summaries["aqi"].mean)
+        summary = process_agent_data(agent_data, rules=rules)
+        # Anomalies were forwarded on their own, the summary stands for the normal road
+        summary.road_state = "normal"
+        window_start = EPOCH + timedelta(seconds=window.index * self.window_seconds)
+        if window.last.agent_data.timestamp.tzinfo is not None:
+            window_start = window_start.replace(tzinfo=timezone.utc)
+        summary.environment = EnvironmentSummary(
+            window_start=window_start, window_seconds=self.window_seconds, **summaries
+        )
+        return summary
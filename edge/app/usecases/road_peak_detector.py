@@ -0,0 +1,198 @@
+import time
+from collections import deque
+from typing import List, Optional
+
+from app.entities.processed_agent_data import ProcessedAgentData
+
+# Defaults of the hub's batch rescan, scipy.signal.find_peaks(prominence=7000, width=3)
+PEAK_PROMINENCE = 7000
+PEAK_WIDTH = 3
+# Samples on each side of a peak find_peaks looks at (wlen = 2 * window + 1), and so the delay of a label
+PEAK_HALF_WINDOW = 25
+
+
+def peak_at(values: List[float], pos: int, prominence: float, width: float) -> bool:
+    """
+    Whether values[pos] is a peak the way scipy.signal.find_peaks finds it
+    with `values` as the wlen window around it, clipped at the ends of the
+    stream: a local maximum (the middle sample of a flat top) with at least
+    the given prominence within the window and at least the given width at
+    half that prominence. Flat tops wider than the window are not found.
+    """
+    peak = values[pos]
+    last = len(values) - 1
+    left = pos
+    while left > 0 and values[left - 1] == peak:
+        left -= 1
+    right = pos
+    while right < last and values[right + 1] == peak:
+        right += 1
+    if left == 0 or right == last or values[left - 1] > peak or values[right + 1] > peak:
+        return False
+    if (left + right) // 2 != pos:
+        return False
+    # Lowest sample on each side before a higher one, the closest if several
+    left_min, left_base = peak, pos
+    i = pos - 1
+    while i >= 0 and values[i] <= peak:
+        if values[i] < left_min:
+            left_min, left_base = values[i], i
+        i -= 1
+    right_min, right_base = peak, pos
+    i = pos + 1
+    while i <= last and values[i] <= peak:
+        if values[i] < right_min:
+            right_min, right_base = values[i], i
+        i += 1
+    peak_prominence = peak - max(left_min, right_min)
+    if peak_prominence < prominence:
+        return False
+    # Interpolated crossings of the half-prominence line between the bases, like scipy's peak_widths
+    height = peak - peak_prominence / 2
+    i = pos
+    while left_base < i and height < values[i]:
+        i -= 1
+    left_ip = float(i)
+    if values[i] < height:
+        left_ip += (height - values[i]) / (values[i + 1] - values[i])
+    i = pos
+    while i < right_base and height < values[i]:
+        i += 1
+    right_ip = float(i)
+    if values[i] < height:
+        right_ip -= (height - values[i]) / (values[i - 1] - values[i])
+    return right_ip - left_ip >= width
+
+
+class PeakDetector:
+    """
+    Streaming scipy.signal.find_peaks(prominence, width, wlen=2 * half_window + 1)
+    for one signal. A sample is reported once `half_window` more samples have
+    arrived, which is all of its window find_peaks looks at. Only samples not
+    lower than their neighbours are measured, at O(half_window) each.
+    """
+
+    def __init__(self, prominence=PEAK_PROMINENCE, width=PEAK_WIDTH, half_window=PEAK_HALF_WINDOW):
+        self.prominence = prominence
+        self.width = width
+        self.half_window = half_window
+        self.samples = deque(maxlen=2 * half_window + 1)
+        self.count = 0
+
+    def push(self, value: float) -> Optional[bool]:
+        """
+        Add the next sample.
+        Returns:
+            bool: Whether the sample `half_window` samples back is a peak, or
+                None while there are no such samples yet.
+        """
+        self.count += 1
+        self.samples.append(value)
+        if self.count <= self.half_window:
+            return None
+        pos = len(self.samples) - 1 - self.half_window
+        center = self.samples[pos]
+        if pos == 0 or self.samples[pos - 1] > center or self.samples[pos + 1] > center:
+            return False
+        return peak_at(list(self.samples), pos, self.prominence, self.width)
+
+    def flush(self) -> List[bool]:
+        """Verdicts for the samples still waiting for their right-hand side"""
+        values = list(self.samples)
+        verdicts = []
+        for pos in range(len(values) - min(self.count, self.half_window), len(values)):
+            first = max(pos - self.half_window, 0)
+            verdicts.append(peak_at(values[first:], pos - first, self.prominence, self.width))
+        return verdicts
+
+
+class RoadPeakDetector:
+    """
+    Labels road_state per vehicle (user_id) from bumps (peaks of accelerometer
+    z) and potholes (peaks of -z), replacing the single-sample thresholds.
+    Records are held back until their label is final, `half_window` samples
+    of the same vehicle later. The records of a vehicle that sends nothing
+    for `idle_flush` seconds are labelled with what is known and released by
+    `release_idle`, which the edge calls on a timer and feed calls every
+    `idle_flush` seconds, and `flush` releases everything when the edge stops.
+    """
+
+    def __init__(
+        self,
+        prominence=PEAK_PROMINENCE,
+        width=PEAK_WIDTH,
+        half_window=PEAK_HALF_WINDOW,
+        idle_flush=5.0,
+    ):
+        self.prominence = prominence
+        self.width = width
+        self.half_window = half_window
+        self.idle_flush = idle_flush
+        # user_id -> [bump detector, pothole detector, held records, last feed time]
+        self.vehicles = {}
+        self._next_idle_check = time.monotonic() + idle_flush
+
+    def feed(self, processed_data_batch: List[ProcessedAgentData]) -> List[ProcessedAgentData]:
+        """
+        Add processed records, in the order they were measured.
+        Returns:
+            List[ProcessedAgentData]: The records whose label is now final.
+        """
+        now = time.monotonic()
+        released = []
+        for processed in processed_data_batch:
+            vehicle = self.vehicles.get(processed.agent_data.user_id)
+            if vehicle is None:
+                vehicle = [
+                    PeakDetector(self.prominence, self.width, self.half_window),
+                    PeakDetector(self.prominence, self.width, self.half_window),
+                    deque(),
+                    now,
+                ]
+                self.vehicles[processed.agent_data.user_id] = vehicle
+            bumps, potholes, held, _ = vehicle
+            vehicle[3] = now
+            z = processed.agent_data.accelerometer.z
+            held.append(processed)
+            bump = bumps.push(z)
+            pothole = potholes.push(-z)
+            if bump is not None:
+                released.append(self._label(held.popleft(), bump, pothole))
+        if now >= self._next_idle_check:
+            released.extend(self.release_idle())
+        return released
+
+    def release_idle(self) -> List[ProcessedAgentData]:
+        """Label and release the held records of vehicles idle for `idle_flush` seconds"""
+        now = time.monotonic()
+        self._next_idle_check = now + self.idle_flush
+        released = []
+        for user_id, vehicle in list(self.vehicles.items()):
+            if now - vehicle[3] >= self.idle_flush:
+                released.extend(self._release(user_id))
+        return released
+
+    def flush(self) -> List[ProcessedAgentData]:
+        """Label and release every held record"""
+        released = []
+        for user_id in list(self.vehicles):
+            released.extend(self._release(user_id))
+        return released
+
+    def _release(self, user_id):
+        bumps, potholes, held, _ = self.vehicles.pop(user_id)
+        return [
+            self._label(processed, bump, pothole)
+            for processed, bump, pothole in zip(held, bumps.flush(), potholes.flush())
+        ]
+
+    @staticmethod
+    def _label(processed: ProcessedAgentData, bump: bool, pothole: bool) -> ProcessedAgentData:
+        # A pothole wins over a bump, like in the hub's rescan
+        if pothole:
+            processed.road_state = "pothole"
+        elif bump:
+            processed.road_state = "bump"
+        else:
+            processed.road_state = "normal"
+        return processed
@@ -0,0 +1,41 @@
+from typing import Optional
+
+from app.entities.agent_data import AgentData
+
+# Streams that only update last-known values, messages of any other stream
+# ("accel", or "reading" for dead-band filtered full readings) are forwarded
+SLOW_STREAMS = ("env",)
+
+
+class StreamMerger:
+    """
+    Rebuilds full agent readings from per-sensor streams (agent/<user>/<stream>)
+    and from readings the agent's dead-band filter left sensors out of.
+    Every message updates the last known value of the sensors it carries. A
+    message of a stream that is not slow produces a complete reading, with its
+    own timestamp, once every sensor of AgentData has been seen for that user.
+    """
+
+    def __init__(self, slow_streams=SLOW_STREAMS):
+        self.slow_streams = slow_streams
+        # user_id -> last known value of every sensor
+        self.last_known = {}
+
+    def merge(self, stream: str, message: dict) -> Optional[dict]:
+        """
+        Record a stream message.
+        Parameters:
+            stream: The last level of the topic, e.g. "accel" or "env".
+            message: The JSON-decoded message, with user_id and timestamp.
+        Returns:
+            dict: The merged reading, shaped like AggregatedData, or None if the
+                message is from a slow stream or some sensor has not been
+                received yet.
+        """
+        sensors = self.last_known.setdefault(message["user_id"], {})
+        sensors.update(message)
+        if stream in self.slow_streams:
+            return None
+        if any(field not in sensors for field in AgentData.model_fields):
+            return None
+        return dict(sensors)
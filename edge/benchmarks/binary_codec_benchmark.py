@@ -0,0 +1,103 @@
+"""
+Bytes per message and encode/decode time of the binary wire format against JSON.
+
+Run from the edge directory:
+    python benchmarks/binary_codec_benchmark.py
+"""
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.adapters import binary_codec  # noqa: E402
+from app.adapters.agent_mqtt_adapter import agent_data_frame  # noqa: E402
+from app.entities.agent_data import AgentData  # noqa: E402
+from app.usecases.data_processing import process_agent_data  # noqa: E402
+
+AGGREGATED_JSON = (
+    '{"accelerometer": {"x": -112, "y": -318, "z": 16533},'
+    ' "gps": {"longitude": 30.52389376262598, "latitude": 50.450729742682526},'
+    ' "parking": {"empty_count": 28.0, "gps": {"longitude": 30.55241079830006, "latitude": 48.22563307460689}},'
+    ' "temperature": {"value": 30.37, "unit": "C"}, "humidity": {"value": 30.22, "unit": "%"},'
+    ' "vibration": {"x": -4.532, "y": 4.785, "z": 0.454, "magnitude": 6.606161139421291},'
+    ' "light": {"illumination": 992.7}, "air_quality": {"pm2_5": 353.4, "pm10": 329.5, "aqi": 261},'
+    ' "timestamp": "2024-02-21T12:34:56.123456", "user_id": 7}'
+)
+
+
+def per_message_us(statement, messages, number):
+    return min(timeit.repeat(statement, number=number, repeat=5)) / number / messages * 1e6
+
+
+def main():
+    record = json.loads(AGGREGATED_JSON)
+    agent_data = AgentData.model_validate_json(AGGREGATED_JSON, strict=True)
+    processed = process_agent_data(agent_data)
+    processed_json = processed.model_dump_json()
+    processed_dict = processed.model_dump()
+
+    print(f"{'':34}{'bytes/msg':>10}{'encode µs':>12}{'decode µs':>12}")
+    for batch in (1, 100):
+        records = [record] * batch
+        processed_dicts = [processed_dict] * batch
+
+        json_frame = AGGREGATED_JSON if batch == 1 else json.dumps(records)
+        binary_frame = binary_codec.encode_frame(binary_codec.KIND_AGGREGATED, records)
+        rows = [
+            (
+                f"agent->edge JSON, {batch}/frame",
+                len(json_frame) / batch,
+                per_message_us(lambda: json.dumps(records), batch, 2000 // batch),
+                per_message_us(
+                    lambda: AgentData.model_validate_json(AGGREGATED_JSON, strict=True)
+                    if batch == 1
+                    else agent_data_frame.validate_json(json_frame, strict=True),
+                    batch,
+                    2000 // batch,
+                ),
+            ),
+            (
+                f"agent->edge binary, {batch}/frame",
+                len(binary_frame) / batch,
+                per_message_us(
+                    lambda: binary_codec.encode_frame(binary_codec.KIND_AGGREGATED, records),
+                    batch,
+                    2000 // batch,
+                ),
+                per_message_us(
+                    lambda: [
+                        AgentData.model_validate(r, strict=True)
+                        for r in binary_codec.decode_frame(binary_frame)[1]
+                    ],
+                    batch,
+                    2000 // batch,
+                ),
+            ),
+            (
+                f"edge->hub JSON, {batch}/frame",
+                len(processed_json),
+                per_message_us(lambda: [processed.model_dump_json() for _ in range(batch)], batch, 2000 // batch),
+                None,
+            ),
+            (
+                f"edge->hub binary, {batch}/frame",
+                len(binary_codec.encode_frame(binary_codec.KIND_PROCESSED, processed_dicts)) / batch,
+                per_message_us(
+                    lambda: binary_codec.encode_frame(
+                        binary_codec.KIND_PROCESSED, [processed.model_dump() for _ in range(batch)]
+                    ),
+                    batch,
+                    2000 // batch,
+                ),
+                None,
+            ),
+        ]
+        for name, size, encode, decode in rows:
+            decode = "" if decode is None else f"{decode:12.2f}"
+            print(f"{name:34}{size:10.1f}{encode:12.2f}{decode:>12}")
+
+
+if __name__ == "__main__":
+    main()
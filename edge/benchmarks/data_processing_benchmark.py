@@ -0,0 +1,67 @@
+"""
+Per-record cost of process_agent_data against process_agent_data_batch, and of
+classify_columns alone on columns that are already NumPy arrays.
+
+Run from the edge directory:
+    python benchmarks/data_processing_benchmark.py
+"""
+import os
+import random
+import sys
+import timeit
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.entities.agent_data import AgentData  # noqa: E402
+from app.usecases.data_processing import (  # noqa: E402
+    process_agent_data,
+    process_agent_data_batch,
+    classify_columns,
+)
+
+
+def random_agent_data(rng):
+    return AgentData.model_validate(
+        {
+            "user_id": 1,
+            "accelerometer": {"x": 0, "y": 0, "z": rng.uniform(-10000, 20000)},
+            "gps": {"longitude": 30.52, "latitude": 50.45},
+            "temperature": {"value": rng.uniform(-10, 40), "unit": "C"},
+            "humidity": {"value": rng.uniform(0, 100), "unit": "%"},
+            "vibration": {"x": rng.uniform(-5, 5), "y": rng.uniform(-5, 5), "z": 0},
+            "light": {"illumination": rng.uniform(0, 2000)},
+            "air_quality": {"pm2_5": 35.4, "pm10": 32.9, "aqi": rng.randint(0, 300)},
+            "timestamp": "2024-02-21T12:34:56.123456",
+        }
+    )
+
+
+def per_record_us(statement, records):
+    number = max(1, 20000 // records)
+    return min(timeit.repeat(statement, number=number, repeat=5)) / number / records * 1e6
+
+
+def main():
+    rng = random.Random(0)
+    print(f"{'batch size':>10}{'scalar µs':>12}{'batch µs':>12}{'columns µs':>12}")
+    for size in (1, 100, 10000):
+        batch = [random_agent_data(rng) for _ in range(size)]
+        assert process_agent_data_batch(batch) == [process_agent_data(a) for a in batch]
+        scalar = per_record_us(lambda: [process_agent_data(a) for a in batch], size)
+        vectorized = per_record_us(lambda: process_agent_data_batch(batch), size)
+        columns = np.array(
+            [
+                (a.vibration.magnitude, a.temperature.value, a.humidity.value,
+                 a.light.illumination, a.air_quality.aqi, a.accelerometer.z)
+                for a in batch
+            ],
+            dtype=np.float64,
+        ).T
+        columnar = per_record_us(lambda: classify_columns(*columns), size)
+        print(f"{size:10}{scalar:12.2f}{vectorized:12.2f}{columnar:12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Per-record cost of validating agent readings: AgentData.model_validate_json
+(strict=True) for single readings and the cached agent_data_frame TypeAdapter
+for JSON frames, against the same models with the per-record magnitude
+validator they used to run.
+
+Run from the edge directory:
+    python benchmarks/ingest_benchmark.py
+"""
+import os
+import sys
+import timeit
+from datetime import datetime
+from typing import List
+
+from pydantic import BaseModel, TypeAdapter, ValidationInfo, field_validator
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.adapters.agent_mqtt_adapter import agent_data_frame  # noqa: E402
+from app.entities import agent_data as entities  # noqa: E402
+from tests.test_binary_codec import AGGREGATED_JSON  # noqa: E402
+
+
+class ValidatedVibrationData(entities.AccelerometerData):
+    magnitude: float = None
+
+    @field_validator('magnitude', mode='after')
+    def compute_magnitude(cls, v, info: ValidationInfo):
+        x = info.data.get('x', 0)
+        y = info.data.get('y', 0)
+        z = info.data.get('z', 0)
+        return (x**2 + y**2 + z**2) ** 0.5
+
+
+class ValidatedAgentData(BaseModel):
+    user_id: int
+    accelerometer: entities.AccelerometerData
+    gps: entities.GpsData
+    temperature: entities.TemperatureData
+    humidity: entities.HumidityData
+    vibration: ValidatedVibrationData
+    light: entities.LightData
+    air_quality: entities.AirQualityData
+    timestamp: datetime
+
+
+def per_record_us(statement, records):
+    number = max(1, 20000 // records)
+    return min(timeit.repeat(statement, number=number, repeat=7)) / number / records * 1e6
+
+
+def main():
+    single = AGGREGATED_JSON.encode("utf-8")
+    frame = ("[" + ",".join([AGGREGATED_JSON] * 100) + "]").encode("utf-8")
+    validated_frame = TypeAdapter(List[ValidatedAgentData])
+    rows = [
+        (
+            "single",
+            1,
+            lambda: ValidatedAgentData.model_validate_json(single, strict=True),
+            lambda: entities.AgentData.model_validate_json(single, strict=True),
+        ),
+        (
+            "frame of 100",
+            100,
+            lambda: validated_frame.validate_json(frame, strict=True),
+            lambda: agent_data_frame.validate_json(frame, strict=True),
+        ),
+    ]
+    print(f"{'payload':>14} {'validator µs':>13} {'now µs':>8}")
+    for name, records, before, after in rows:
+        print(f"{name:>14} {per_record_us(before, records):>13.2f} {per_record_us(after, records):>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -12,13 +12,75 @@ def try_parse_int(value: str):
 MQTT_BROKER_HOST = os.environ.get("MQTT_BROKER_HOST") or "localhost"
 MQTT_BROKER_PORT = try_parse_int(os.environ.get("MQTT_BROKER_PORT")) or 1883
 MQTT_TOPIC = os.environ.get("MQTT_TOPIC") or "agent_data_topic"
+# Per-sensor streams of agents (agent/<user>/accel, agent/<user>/env), empty disables them
+MQTT_STREAMS_TOPIC = os.environ.get("MQTT_STREAMS_TOPIC", "agent/+/+")
+# Number of shard topics the agents publish on (their MQTT_SHARDS, 0 if they do not shard)
+MQTT_SHARDS = try_parse_int(os.environ.get("MQTT_SHARDS")) or 0
+# This instance's index and the number of edge instances splitting the shards
+EDGE_INSTANCE = try_parse_int(os.environ.get("EDGE_INSTANCE")) or 0
+EDGE_INSTANCES = try_parse_int(os.environ.get("EDGE_INSTANCES")) or 1
+# Shared subscription group ($share/<group>/...) the instances join, empty disables it.
+# The broker spreads messages one by one, so only for edges without per-vehicle state
+MQTT_SHARE_GROUP = os.environ.get("MQTT_SHARE_GROUP") or ""
+
+# Configuration for message handling
+# "thread" (paho network threads) or "asyncio" (everything on one event loop)
+EDGE_RUNTIME = os.environ.get("EDGE_RUNTIME") or "thread"
+# Messages handled at once by the asyncio runtime before it stops reading from the broker
+EDGE_MAX_PENDING = try_parse_int(os.environ.get("EDGE_MAX_PENDING")) or 1000
+# Threads handling agent messages off the MQTT network thread (0 handles them on it)
+EDGE_WORKERS = try_parse_int(os.environ.get("EDGE_WORKERS")) or 0
+# "thread", or "process" to also parse and classify in as many worker processes
+EDGE_WORKER_MODE = os.environ.get("EDGE_WORKER_MODE") or "thread"
+# Messages waiting for a worker at most
+EDGE_QUEUE_SIZE = try_parse_int(os.environ.get("EDGE_QUEUE_SIZE")) or 10000
+# What to do when the queue is full: "block", "drop_newest" or "drop_oldest"
+EDGE_DROP_POLICY = os.environ.get("EDGE_DROP_POLICY") or "drop_oldest"
+# Seconds between queue and stage time reports in the log (0 disables them)
+EDGE_METRICS_INTERVAL = try_parse_int(os.environ.get("EDGE_METRICS_INTERVAL")) or 0
+# "threshold" labels road_state from single samples, "peaks" from bumps and
+# potholes found per vehicle like the hub's find_peaks rescan does. Peaks need
+# every vehicle's messages in order, so use it with EDGE_WORKERS of 0 or 1.
+EDGE_ROAD_DETECTOR = os.environ.get("EDGE_ROAD_DETECTOR") or "threshold"
+# Minimum prominence and width (samples) of a bump or pothole
+EDGE_PEAK_PROMINENCE = try_parse_int(os.environ.get("EDGE_PEAK_PROMINENCE")) or 7000
+EDGE_PEAK_WIDTH = try_parse_int(os.environ.get("EDGE_PEAK_WIDTH")) or 3
+# Samples a peak must be the extreme of on each side, and so the delay of its label
+EDGE_PEAK_WINDOW = try_parse_int(os.environ.get("EDGE_PEAK_WINDOW")) or 25
+# Seconds without samples before the records held for a vehicle are released
+EDGE_PEAK_IDLE_FLUSH = try_parse_int(os.environ.get("EDGE_PEAK_IDLE_FLUSH")) or 5
+# JSON rule table with the status thresholds (see rules/default.json), reloaded
+# when it changes; empty uses the built-in thresholds
+EDGE_RULES_FILE = os.environ.get("EDGE_RULES_FILE") or ""
+# Seconds between checks of EDGE_RULES_FILE for changes
+EDGE_RULES_CHECK_INTERVAL = try_parse_int(os.environ.get("EDGE_RULES_CHECK_INTERVAL")) or 1
+# Seconds of the per-vehicle windows temperature, humidity, light and air quality
+# are summarized over; only bumps, potholes and window summaries are forwarded
+# then (0 forwards every reading)
+EDGE_ENV_WINDOW = try_parse_int(os.environ.get("EDGE_ENV_WINDOW")) or 0
 
 # Configuration for hub MQTT
 HUB_MQTT_BROKER_HOST = os.environ.get("HUB_MQTT_BROKER_HOST") or "localhost"
 HUB_MQTT_BROKER_PORT = try_parse_int(os.environ.get("HUB_MQTT_BROKER_PORT")) or 1883
 HUB_MQTT_TOPIC = os.environ.get("HUB_MQTT_TOPIC") or "agent_data_topic"
+# "json" or "binary" (compact struct frames, see app/adapters/binary_codec.py)
+HUB_WIRE_FORMAT = os.environ.get("HUB_WIRE_FORMAT") or "json"
 
 # Configuration for the Hub
 HUB_HOST = os.environ.get("HUB_HOST") or "localhost"
 HUB_PORT = try_parse_int(os.environ.get("HUB_PORT")) or 12000
 HUB_URL = f"http://{HUB_HOST}:{HUB_PORT}"
+# "mqtt" publishes processed data to HUB_MQTT_TOPIC, "mqtt_batch" publishes batches of it
+# there at QoS 1, "http" posts batches to HUB_URL
+HUB_GATEWAY = os.environ.get("HUB_GATEWAY") or "mqtt"
+# Records per batch at most, and bytes per batch before compression
+HUB_BATCH_SIZE = try_parse_int(os.environ.get("HUB_BATCH_SIZE")) or 500
+HUB_BATCH_BYTES = try_parse_int(os.environ.get("HUB_BATCH_BYTES")) or 1024 * 1024
+# Milliseconds the first record of a batch waits for more
+HUB_LINGER_MS = try_parse_int(os.environ.get("HUB_LINGER_MS")) or 50
+# Gzip request bodies ("0" sends them uncompressed)
+HUB_GZIP = os.environ.get("HUB_GZIP") != "0"
+# Attempts after the first one for a failed POST
+HUB_RETRIES = try_parse_int(os.environ.get("HUB_RETRIES") or "3")
+# Batches published to the hub broker that may wait for their PUBACK at once
+HUB_INFLIGHT_WINDOW = try_parse_int(os.environ.get("HUB_INFLIGHT_WINDOW")) or 20
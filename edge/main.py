@@ -1,17 +1,194 @@
+import asyncio
 import logging
+import signal
+import threading
 from app.adapters.agent_mqtt_adapter import AgentMQTTAdapter
-from app.adapters.hub_http_adapter import HubHttpAdapter
+from app.adapters.async_agent_mqtt_adapter import AsyncAgentMQTTAdapter
+from app.adapters.async_hub_http_adapter import AsyncHubHttpAdapter
+from app.adapters.async_hub_mqtt_adapter import AsyncHubBatchMqttAdapter, AsyncHubMqttAdapter
+from app.adapters.hub_batch_http_adapter import HubBatchHttpAdapter
+from app.adapters.hub_batch_mqtt_adapter import HubBatchMqttAdapter
 from app.adapters.hub_mqtt_adapter import HubMqttAdapter
+from app.usecases.classification_rules import RuleFile
+from app.usecases.environment_window import EnvironmentWindows
+from app.usecases.road_peak_detector import RoadPeakDetector
 from config import (
     MQTT_BROKER_HOST,
     MQTT_BROKER_PORT,
     MQTT_TOPIC,
+    MQTT_STREAMS_TOPIC,
+    MQTT_SHARDS,
+    MQTT_SHARE_GROUP,
+    EDGE_INSTANCE,
+    EDGE_INSTANCES,
+    EDGE_WORKERS,
+    EDGE_WORKER_MODE,
+    EDGE_QUEUE_SIZE,
+    EDGE_DROP_POLICY,
+    EDGE_METRICS_INTERVAL,
+    EDGE_RUNTIME,
+    EDGE_MAX_PENDING,
+    EDGE_ROAD_DETECTOR,
+    EDGE_PEAK_PROMINENCE,
+    EDGE_PEAK_WIDTH,
+    EDGE_PEAK_WINDOW,
+    EDGE_PEAK_IDLE_FLUSH,
+    EDGE_RULES_FILE,
+    EDGE_RULES_CHECK_INTERVAL,
+    EDGE_ENV_WINDOW,
     HUB_URL,
+    HUB_GATEWAY,
+    HUB_BATCH_SIZE,
+    HUB_BATCH_BYTES,
+    HUB_LINGER_MS,
+    HUB_GZIP,
+    HUB_RETRIES,
+    HUB_INFLIGHT_WINDOW,
     HUB_MQTT_BROKER_HOST,
     HUB_MQTT_BROKER_PORT,
     HUB_MQTT_TOPIC,
+    HUB_WIRE_FORMAT,
 )
 
+# Which agent topics this edge instance subscribes to
+SHARDING_OPTIONS = dict(
+    shards=MQTT_SHARDS,
+    instance=EDGE_INSTANCE,
+    instances=EDGE_INSTANCES,
+    share_group=MQTT_SHARE_GROUP,
+)
+# Options of the batching HTTP hub gateways
+HUB_HTTP_OPTIONS = dict(
+    max_batch=HUB_BATCH_SIZE,
+    max_bytes=HUB_BATCH_BYTES,
+    linger=HUB_LINGER_MS / 1000,
+    compress=HUB_GZIP,
+    retries=HUB_RETRIES,
+)
+# Options of the batching QoS 1 MQTT hub gateways
+HUB_MQTT_BATCH_OPTIONS = dict(
+    wire_format=HUB_WIRE_FORMAT,
+    max_batch=HUB_BATCH_SIZE,
+    max_bytes=HUB_BATCH_BYTES,
+    linger=HUB_LINGER_MS / 1000,
+    window=HUB_INFLIGHT_WINDOW,
+    report_every=EDGE_METRICS_INTERVAL,
+)
+
+
+def create_road_detector():
+    """The per-vehicle peak detector, or None to keep the single-sample thresholds"""
+    if EDGE_ROAD_DETECTOR != "peaks":
+        return None
+    return RoadPeakDetector(
+        prominence=EDGE_PEAK_PROMINENCE,
+        width=EDGE_PEAK_WIDTH,
+        half_window=EDGE_PEAK_WINDOW,
+        idle_flush=EDGE_PEAK_IDLE_FLUSH,
+    )
+
+
+def create_rule_file():
+    """The hot-reloaded rule table, or None to keep the built-in thresholds"""
+    if not EDGE_RULES_FILE:
+        return None
+    return RuleFile(EDGE_RULES_FILE, check_interval=EDGE_RULES_CHECK_INTERVAL)
+
+
+def run_threads():
+    """paho network threads and, with EDGE_WORKERS, a pool of worker threads"""
+    # Create an instance of the hub gateway using the configuration
+    if HUB_GATEWAY == "http":
+        hub_adapter = HubBatchHttpAdapter(api_base_url=HUB_URL, **HUB_HTTP_OPTIONS)
+    elif HUB_GATEWAY == "mqtt_batch":
+        hub_adapter = HubBatchMqttAdapter(
+            broker=HUB_MQTT_BROKER_HOST,
+            port=HUB_MQTT_BROKER_PORT,
+            topic=HUB_MQTT_TOPIC,
+            **HUB_MQTT_BATCH_OPTIONS,
+        )
+    else:
+        hub_adapter = HubMqttAdapter(
+            broker=HUB_MQTT_BROKER_HOST,
+            port=HUB_MQTT_BROKER_PORT,
+            topic=HUB_MQTT_TOPIC,
+            wire_format=HUB_WIRE_FORMAT,
+        )
+    # Create an instance of the AgentMQTTAdapter using the configuration
+    agent_adapter = AgentMQTTAdapter(
+        broker_host=MQTT_BROKER_HOST,
+        broker_port=MQTT_BROKER_PORT,
+        topic=MQTT_TOPIC,
+        hub_gateway=hub_adapter,
+        streams_topic=MQTT_STREAMS_TOPIC,
+        workers=EDGE_WORKERS,
+        worker_mode=EDGE_WORKER_MODE,
+        queue_size=EDGE_QUEUE_SIZE,
+        drop_policy=EDGE_DROP_POLICY,
+        metrics_interval=EDGE_METRICS_INTERVAL,
+        road_detector=create_road_detector(),
+        rule_file=create_rule_file(),
+        environment_windows=EnvironmentWindows(EDGE_ENV_WINDOW) if EDGE_ENV_WINDOW else None,
+        **SHARDING_OPTIONS,
+    )
+    # Sleep until SIGINT or SIGTERM instead of spinning
+    stopped = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *args: stopped.set())
+    # Connect to the MQTT broker and start listening for messages
+    agent_adapter.connect()
+    agent_adapter.start()
+    stopped.wait()
+    # Stop the MQTT adapter and exit gracefully
+    agent_adapter.stop()
+    if HUB_GATEWAY in ("http", "mqtt_batch"):
+        hub_adapter.close()
+    logging.info("System stopped.")
+
+
+async def run_asyncio():
+    """Both MQTT clients and all message handling on one event loop"""
+    if HUB_GATEWAY == "http":
+        hub_adapter = AsyncHubHttpAdapter(api_base_url=HUB_URL, **HUB_HTTP_OPTIONS)
+    elif HUB_GATEWAY == "mqtt_batch":
+        hub_adapter = AsyncHubBatchMqttAdapter(
+            broker=HUB_MQTT_BROKER_HOST,
+            port=HUB_MQTT_BROKER_PORT,
+            topic=HUB_MQTT_TOPIC,
+            **HUB_MQTT_BATCH_OPTIONS,
+        )
+    else:
+        hub_adapter = AsyncHubMqttAdapter(
+            broker=HUB_MQTT_BROKER_HOST,
+            port=HUB_MQTT_BROKER_PORT,
+            topic=HUB_MQTT_TOPIC,
+            wire_format=HUB_WIRE_FORMAT,
+        )
+    agent_adapter = AsyncAgentMQTTAdapter(
+        broker_host=MQTT_BROKER_HOST,
+        broker_port=MQTT_BROKER_PORT,
+        topic=MQTT_TOPIC,
+        hub_gateway=hub_adapter,
+        streams_topic=MQTT_STREAMS_TOPIC,
+        max_pending=EDGE_MAX_PENDING,
+        road_detector=create_road_detector(),
+        rule_file=create_rule_file(),
+        environment_windows=EnvironmentWindows(EDGE_ENV_WINDOW) if EDGE_ENV_WINDOW else None,
+        **SHARDING_OPTIONS,
+    )
+    stopped = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stopped.set)
+    await hub_adapter.connect()
+    agent_adapter.connect()
+    await stopped.wait()
+    # Finish the messages being handled, then flush what the hub adapter still holds
+    await agent_adapter.stop()
+    await hub_adapter.close()
+    logging.info("System stopped.")
+
+
 if __name__ == "__main__":
     # Configure logging settings
     logging.basicConfig(
@@ -22,30 +199,7 @@ if __name__ == "__main__":
             logging.FileHandler("app.log"),  # Save log messages to a file
         ],
     )
-    # Create an instance of the StoreApiAdapter using the configuration
-    # hub_adapter = HubHttpAdapter(
-    #     api_base_url=HUB_URL,
-    # )
-    hub_adapter = HubMqttAdapter(
-        broker=HUB_MQTT_BROKER_HOST,
-        port=HUB_MQTT_BROKER_PORT,
-        topic=HUB_MQTT_TOPIC,
-    )
-    # Create an instance of the AgentMQTTAdapter using the configuration
-    agent_adapter = AgentMQTTAdapter(
-        broker_host=MQTT_BROKER_HOST,
-        broker_port=MQTT_BROKER_PORT,
-        topic=MQTT_TOPIC,
-        hub_gateway=hub_adapter,
-    )
-    try:
-        # Connect to the MQTT broker and start listening for messages
-        agent_adapter.connect()
-        agent_adapter.start()
-        # Keep the system running indefinitely (you can add other logic as needed)
-        while True:
-            pass
-    except KeyboardInterrupt:
-        # Stop the MQTT adapter and exit gracefully if interrupted by the user
-        agent_adapter.stop()
-        logging.info("System stopped.")
+    if EDGE_RUNTIME == "asyncio":
+        asyncio.run(run_asyncio())
+    else:
+        run_threads()
@@ -0,0 +1,80 @@
+import asyncio
+import unittest
+from unittest.mock import AsyncMock, Mock, patch
+
+from app.adapters.async_agent_mqtt_adapter import AsyncAgentMQTTAdapter
+from app.interfaces.async_hub_gateway import AsyncHubGateway
+from app.usecases.environment_window import EnvironmentWindows
+from app.usecases.road_peak_detector import RoadPeakDetector
+from tests.test_binary_codec import AGGREGATED_JSON
+
+
+class SlowHubGateway(AsyncHubGateway):
+    def __init__(self):
+        self.saved = []
+
+    async def save_data(self, data):
+        await asyncio.sleep(0.01)
+        self.saved.append(data)
+        return True
+
+
+class TestAsyncAgentMQTTAdapter(unittest.TestCase):
+    def test_stop_waits_for_messages_being_handled(self):
+        async def run():
+            hub_gateway = SlowHubGateway()
+            adapter = AsyncAgentMQTTAdapter("localhost", 1883, "agent_data_topic", hub_gateway, max_pending=4)
+            adapter.helper = AsyncMock(loop=asyncio.get_running_loop())
+            adapter.helper.pause_reading = Mock()
+            adapter.helper.resume_reading = Mock()
+            for _ in range(5):
+                adapter.on_message(None, None, Mock(topic="agent_data_topic", payload=AGGREGATED_JSON.encode()))
+            # The fourth pending message stops reading from the broker
+            adapter.helper.pause_reading.assert_called()
+            await adapter.stop()
+            return hub_gateway, adapter
+
+        hub_gateway, adapter = asyncio.run(run())
+        self.assertEqual(len(hub_gateway.saved), 5)
+        self.assertEqual(hub_gateway.saved[0].road_state, "bump")
+        self.assertEqual(adapter.metrics()["messages"], 5)
+        adapter.helper.disconnect.assert_awaited_once()
+
+    def run_until_idle(self, **reducers):
+        """Handle one message, wait for the idle timer and return what was saved before stop"""
+
+        async def run():
+            hub_gateway = SlowHubGateway()
+            adapter = AsyncAgentMQTTAdapter("localhost", 1883, "agent_data_topic", hub_gateway, **reducers)
+            helper = AsyncMock(loop=asyncio.get_running_loop())
+            helper.pause_reading = Mock()
+            helper.resume_reading = Mock()
+            with patch("app.adapters.async_agent_mqtt_adapter.AsyncioMqttHelper", return_value=helper):
+                adapter.connect()
+            adapter.on_message(None, None, Mock(topic="agent_data_topic", payload=AGGREGATED_JSON.encode()))
+            await asyncio.sleep(0.01)
+            before_idle = list(hub_gateway.saved)
+            await asyncio.sleep(0.3)
+            saved = list(hub_gateway.saved)
+            await adapter.stop()
+            return before_idle, saved
+
+        return asyncio.run(run())
+
+    def test_idle_vehicles_are_saved_without_more_messages(self):
+        road_detector = RoadPeakDetector(half_window=10, idle_flush=0.05)
+        before_idle, saved = self.run_until_idle(road_detector=road_detector)
+        # Held until half_window more readings of the vehicle come
+        self.assertEqual(before_idle, [])
+        self.assertEqual(len(saved), 1)
+
+    def test_idle_windows_are_summarized_without_more_messages(self):
+        _, saved = self.run_until_idle(environment_windows=EnvironmentWindows(0.05))
+        # The bump goes at once, the window's summary once the vehicle is idle
+        self.assertEqual([data.road_state for data in saved], ["bump", "normal"])
+        self.assertIsNone(saved[0].environment)
+        self.assertEqual(saved[1].environment.temperature.count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+import json
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import Mock, patch
+
+from app.adapters import binary_codec
+from app.adapters.agent_mqtt_adapter import AgentMQTTAdapter
+from app.entities.agent_data import AgentData
+from app.entities.processed_agent_data import ProcessedAgentData
+from app.interfaces.hub_gateway import HubGateway
+from app.usecases.data_processing import process_agent_data
+
+AGGREGATED_JSON = (
+    '{"accelerometer": {"x": -112, "y": -318, "z": 16533},'
+    ' "gps": {"longitude": 30.52389376262598, "latitude": 50.450729742682526},'
+    ' "parking": {"empty_count": 28.0, "gps": {"longitude": 30.55241079830006, "latitude": 48.22563307460689}},'
+    ' "temperature": {"value": 30.37, "unit": "C"}, "humidity": {"value": 30.22, "unit": "%"},'
+    ' "vibration": {"x": -4.532, "y": 4.785, "z": 0.454, "magnitude": 6.606161139421291},'
+    ' "light": {"illumination": 992.7}, "air_quality": {"pm2_5": 353.4, "pm10": 329.5, "aqi": 261},'
+    ' "timestamp": "2024-02-21T12:34:56.123456", "user_id": 7}'
+)
+
+
+class TestBinaryCodec(unittest.TestCase):
+    def test_aggregated_round_trip(self):
+        record = json.loads(AGGREGATED_JSON)
+        frame = binary_codec.encode_frame(binary_codec.KIND_AGGREGATED, [record, record])
+        self.assertTrue(binary_codec.is_binary(frame))
+        kind, records = binary_codec.decode_frame(frame)
+        self.assertEqual(kind, binary_codec.KIND_AGGREGATED)
+        self.assertEqual(len(records), 2)
+        expected = dict(record, timestamp=datetime(2024, 2, 21, 12, 34, 56, 123456))
+        self.assertEqual(records[0], expected)
+        self.assertEqual(
+            AgentData.model_validate(records[1], strict=True),
+            AgentData.model_validate_json(AGGREGATED_JSON, strict=True),
+        )
+
+    def test_processed_round_trip(self):
+        agent_data = AgentData.model_validate_json(AGGREGATED_JSON, strict=True)
+        processed = process_agent_data(agent_data)
+        frame = binary_codec.encode_frame(binary_codec.KIND_PROCESSED, [processed.model_dump()])
+        _, records = binary_codec.decode_frame(frame)
+        self.assertEqual(ProcessedAgentData.model_validate(records[0], strict=True), processed)
+        self.assertLess(len(frame), len(processed.model_dump_json()) / 2)
+
+    def test_optional_values_and_aware_timestamps(self):
+        record = json.loads(AGGREGATED_JSON)
+        record["air_quality"]["aqi"] = None
+        record["vibration"]["magnitude"] = None
+        record["timestamp"] = "2024-02-21T12:34:56Z"
+        kyiv = dict(record, timestamp=datetime(2024, 2, 21, 14, 34, 56, tzinfo=timezone(timedelta(hours=2))))
+        _, (utc, local) = binary_codec.decode_frame(
+            binary_codec.encode_frame(binary_codec.KIND_AGGREGATED, [record, kyiv])
+        )
+        self.assertIsNone(utc["air_quality"]["aqi"])
+        self.assertIsNone(utc["vibration"]["magnitude"])
+        self.assertEqual(utc["timestamp"], datetime(2024, 2, 21, 12, 34, 56, tzinfo=timezone.utc))
+        self.assertEqual(local["timestamp"], kyiv["timestamp"])
+        self.assertEqual(local["timestamp"].utcoffset(), timedelta(hours=2))
+
+    def test_rejects_unknown_version_and_truncated_frames(self):
+        frame = binary_codec.encode_frame(binary_codec.KIND_AGGREGATED, [json.loads(AGGREGATED_JSON)])
+        with self.assertRaises(ValueError):
+            binary_codec.decode_frame(frame[:1] + bytes((binary_codec.VERSION + 1,)) + frame[2:])
+        with self.assertRaises(ValueError):
+            binary_codec.decode_frame(frame[:-1])
+        self.assertFalse(binary_codec.is_binary(AGGREGATED_JSON.encode("utf-8")))
+
+    def test_record_count_is_limited_by_the_header(self):
+        record = json.loads(AGGREGATED_JSON)
+        frame = binary_codec.encode_frame(binary_codec.KIND_AGGREGATED, [record] * binary_codec.MAX_RECORDS)
+        self.assertEqual(len(binary_codec.decode_frame(frame)[1]), binary_codec.MAX_RECORDS)
+        with self.assertRaises(ValueError):
+            binary_codec.encode_frame(binary_codec.KIND_AGGREGATED, [record] * (binary_codec.MAX_RECORDS + 1))
+
+    def test_large_batches_are_split_into_frames(self):
+        records = [dict(json.loads(AGGREGATED_JSON), user_id=user_id) for user_id in range(5)]
+        with patch.object(binary_codec, "MAX_RECORDS", 2):
+            frames = binary_codec.encode_frames(binary_codec.KIND_AGGREGATED, records)
+        decoded = [binary_codec.decode_frame(frame)[1] for frame in frames]
+        self.assertEqual([len(frame_records) for frame_records in decoded], [2, 2, 1])
+        self.assertEqual([record["user_id"] for frame_records in decoded for record in frame_records], list(range(5)))
+
+    def test_agent_adapter_accepts_binary_frames(self):
+        hub_gateway = Mock(spec=HubGateway)
+        adapter = AgentMQTTAdapter("test_broker", 1234, "test_topic", hub_gateway)
+        frame = binary_codec.encode_frame(
+            binary_codec.KIND_AGGREGATED, [json.loads(AGGREGATED_JSON)] * 3
+        )
+        adapter.on_message(None, None, Mock(payload=frame))
+        (processed_batch,), _ = hub_gateway.save_batch.call_args
+        self.assertEqual(len(processed_batch), 3)
+        self.assertEqual(processed_batch[0].agent_data.user_id, 7)
+
+
+if __name__ == "__main__":
+    unittest.main()
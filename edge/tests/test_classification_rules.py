@@ -0,0 +1,72 @@
+import json
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from app.usecases.classification_rules import DEFAULT_RULES, Rule, RuleFile, compile_rules
+
+RULES_FILE = os.path.join(os.path.dirname(__file__), "..", "rules", "default.json")
+
+
+class TestRule(unittest.TestCase):
+    def test_bisect_and_column_lookups_agree(self):
+        rule = Rule([0, 20, 30], ["freezing", "cool", "warm", "hot"])
+        values = [-5, 0, 19.9, 20, 30, 45]
+        expected = ["freezing", "cool", "cool", "warm", "hot", "hot"]
+        self.assertEqual([rule.label(v) for v in values], expected)
+        self.assertEqual(rule.label_column(np.array(values, dtype=float)), expected)
+
+    def test_inclusive_upper_bounds_and_missing_values(self):
+        rule = DEFAULT_RULES["air_quality_status"]
+        self.assertEqual([rule.label(v) for v in (50, 51, 100, 101, None)],
+                         ["good", "moderate", "moderate", "poor", "unknown"])
+        column = np.array([50, np.nan, 101], dtype=float)
+        self.assertEqual(rule.label_column(column), ["good", "unknown", "poor"])
+
+    def test_malformed_rules_are_rejected(self):
+        with self.assertRaises(ValueError):
+            compile_rules({"light_status": {"breakpoints": [50, 10], "labels": ["a", "b", "c"]}})
+        with self.assertRaises(ValueError):
+            compile_rules({"light_status": {"breakpoints": [50], "labels": ["dark"]}})
+        with self.assertRaises(ValueError):
+            compile_rules({"noise_status": {"breakpoints": [], "labels": ["quiet"]}})
+
+    def test_shipped_rules_match_the_built_in_ones(self):
+        with open(RULES_FILE) as file:
+            rules = compile_rules(json.load(file))
+        for field, rule in DEFAULT_RULES.items():
+            self.assertEqual(rules[field].breakpoints, rule.breakpoints)
+            self.assertEqual(rules[field].labels, rule.labels)
+
+
+class TestRuleFile(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "rules.json")
+
+    def write(self, table, mtime):
+        with open(self.path, "w") as file:
+            file.write(table if isinstance(table, str) else json.dumps(table))
+        os.utime(self.path, (mtime, mtime))
+
+    def test_changes_are_reloaded_and_bad_files_ignored(self):
+        self.write({"light_status": {"breakpoints": [100], "labels": ["dim", "bright"]}}, 1000)
+        rule_file = RuleFile(self.path, check_interval=0)
+        self.assertEqual(rule_file.rules["light_status"].label(75), "dim")
+        # Fields the file leaves out keep their built-in rule
+        self.assertEqual(rule_file.rules["temp_status"].label(25), "warm")
+        self.write("{not json", 2000)
+        self.assertEqual(rule_file.rules["light_status"].label(75), "dim")
+        self.write({"light_status": {"breakpoints": [10], "labels": ["dim", "bright"]}}, 3000)
+        self.assertEqual(rule_file.rules["light_status"].label(75), "bright")
+        self.assertEqual(rule_file.reloads, 2)
+
+    def test_missing_file_uses_built_in_rules(self):
+        self.assertIs(RuleFile(self.path).rules, DEFAULT_RULES)
+
+
+if __name__ == "__main__":
+    unittest.main()
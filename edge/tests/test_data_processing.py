@@ -0,0 +1,66 @@
+import json
+import unittest
+
+from app.entities.agent_data import AgentData
+from app.usecases.data_processing import process_agent_data, process_agent_data_batch
+
+AGGREGATED = {
+    "accelerometer": {"x": -112, "y": -318, "z": 16533},
+    "gps": {"longitude": 30.52389376262598, "latitude": 50.450729742682526},
+    "temperature": {"value": 30.37, "unit": "C"},
+    "humidity": {"value": 30.22, "unit": "%"},
+    "vibration": {"x": -4.532, "y": 4.785, "z": 0.454, "magnitude": 6.606161139421291},
+    "light": {"illumination": 992.7},
+    "air_quality": {"pm2_5": 353.4, "pm10": 329.5, "aqi": 261},
+    "timestamp": "2024-02-21T12:34:56.123456",
+    "user_id": 7,
+}
+
+
+def agent_data(z, temperature, humidity, vibration, illumination, aqi):
+    record = json.loads(json.dumps(AGGREGATED))
+    record["accelerometer"]["z"] = z
+    record["temperature"]["value"] = temperature
+    record["humidity"]["value"] = humidity
+    # The magnitude is computed from x, y, z when it is missing
+    record["vibration"] = {"x": vibration, "y": 0.0, "z": 0.0}
+    record["light"]["illumination"] = illumination
+    if aqi is None:
+        del record["air_quality"]["aqi"]
+    else:
+        record["air_quality"]["aqi"] = aqi
+    return AgentData.model_validate(record)
+
+
+class TestProcessAgentDataBatch(unittest.TestCase):
+    def test_batch_matches_scalar_path(self):
+        # Values on and around every threshold
+        batch = [
+            agent_data(z, temperature, humidity, vibration, illumination, aqi)
+            for z, temperature, humidity, vibration, illumination, aqi in [
+                (7000, -0.01, 29.99, 0.99, 49.9, 50),
+                (7000.5, 0, 30, 1.0, 50, 51),
+                (-7000, 19.99, 59.99, 2.99, 50.1, 100),
+                (-7000.5, 20, 60, 3.0, 0, 101),
+                (0, 29.99, 100, 3.5, 2000, None),
+                (16533, 30, 0, 0, 992.7, 0),
+            ]
+        ]
+        self.assertEqual(
+            process_agent_data_batch(batch),
+            [process_agent_data(a) for a in batch],
+        )
+
+    def test_custom_thresholds(self):
+        batch = [agent_data(z, 20, 50, 1, 100, 10) for z in (-10, 0, 10)]
+        self.assertEqual(
+            [p.road_state for p in process_agent_data_batch(batch, 5, -5)],
+            ["pothole", "normal", "bump"],
+        )
+
+    def test_empty_batch(self):
+        self.assertEqual(process_agent_data_batch([]), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+from datetime import timedelta
+from unittest.mock import patch
+
+from app.entities.agent_data import AgentData
+from app.entities.processed_agent_data import ProcessedAgentData
+from app.usecases.data_processing import process_agent_data
+from app.usecases.environment_window import EnvironmentWindows
+from tests.test_binary_codec import AGGREGATED_JSON
+
+
+def reading(user_id, seconds, temperature, z=0.0):
+    agent_data = AgentData.model_validate_json(AGGREGATED_JSON)
+    agent_data.user_id = user_id
+    agent_data.timestamp = agent_data.timestamp.replace(microsecond=0, second=0) + timedelta(seconds=seconds)
+    agent_data.temperature.value = temperature
+    agent_data.accelerometer.z = z
+    return process_agent_data(agent_data)
+
+
+class TestEnvironmentWindows(unittest.TestCase):
+    def test_normal_readings_are_summarized_per_window(self):
+        windows = EnvironmentWindows(10)
+        forwarded = windows.feed([reading(1, s, 10.0 + s) for s in range(10)])
+        self.assertEqual(forwarded, [])
+        # The first reading of the next window closes the previous one
+        forwarded = windows.feed([reading(1, 10, 50.0)])
+        self.assertEqual(len(forwarded), 1)
+        summary = forwarded[0]
+        self.assertEqual(summary.agent_data.temperature.value, 14.5)
+        self.assertEqual(summary.temp_status, "cool")
+        self.assertEqual(summary.road_state, "normal")
+        temperature = summary.environment.temperature
+        self.assertEqual((temperature.min, temperature.max, temperature.count), (10.0, 19.0, 10))
+        self.assertEqual(summary.environment.window_start.second, 0)
+        self.assertEqual(summary.agent_data.timestamp.second, 9)
+        # The summary survives the hub's JSON round trip
+        self.assertEqual(
+            ProcessedAgentData.model_validate_json(summary.model_dump_json(), strict=True), summary
+        )
+        flushed = windows.flush()
+        self.assertEqual([s.agent_data.temperature.value for s in flushed], [50.0])
+
+    def test_anomalies_pass_through_at_once(self):
+        windows = EnvironmentWindows(10)
+        bump = reading(1, 3, 20.0, z=9000)
+        self.assertEqual(bump.road_state, "bump")
+        forwarded = windows.feed([reading(1, 1, 20.0), bump, reading(2, 2, 30.0)])
+        self.assertEqual(forwarded, [bump])
+        summaries = windows.flush()
+        self.assertEqual(len(summaries), 2)
+        self.assertEqual({s.agent_data.user_id: s.environment.temperature.count for s in summaries}, {1: 2, 2: 1})
+
+    def test_idle_windows_close_without_more_input(self):
+        with patch("time.monotonic", return_value=1000.0):
+            windows = EnvironmentWindows(10)
+            windows.feed([reading(1, 1, 20.0)])
+        with patch("time.monotonic", return_value=1005.0):
+            windows.feed([reading(2, 2, 30.0)])
+            self.assertEqual(windows.close_idle(), [])
+        with patch("time.monotonic", return_value=1010.0):
+            summaries = windows.close_idle()
+        self.assertEqual([s.agent_data.user_id for s in summaries], [1])
+        self.assertEqual(list(windows.windows), [2])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import gzip
+import json
+import unittest
+from unittest.mock import Mock
+
+import requests
+
+from app.adapters.hub_batch_http_adapter import HubBatchHttpAdapter
+from app.entities.agent_data import AgentData
+from app.usecases.data_processing import process_agent_data
+from tests.test_binary_codec import AGGREGATED_JSON
+
+
+class TestHubBatchHttpAdapter(unittest.TestCase):
+    def setUp(self):
+        self.processed = process_agent_data(AgentData.model_validate_json(AGGREGATED_JSON))
+
+    def adapter(self, responses, **options):
+        adapter = HubBatchHttpAdapter("http://hub", backoff=0, **options)
+        adapter.session = Mock()
+        adapter.session.post.side_effect = responses
+        return adapter
+
+    def test_records_are_sent_in_gzipped_batches(self):
+        adapter = self.adapter([Mock(status_code=200)] * 3, max_batch=4, linger=10)
+        for _ in range(10):
+            self.assertTrue(adapter.save_data(self.processed))
+        adapter.close()
+        self.assertEqual(adapter.session.post.call_count, 3)
+        url = adapter.session.post.call_args_list[0][0][0]
+        kwargs = adapter.session.post.call_args_list[0][1]
+        self.assertEqual(url, "http://hub/agent_data/")
+        self.assertEqual(kwargs["headers"]["Content-Encoding"], "gzip")
+        batch = json.loads(gzip.decompress(kwargs["data"]))
+        self.assertEqual(len(batch), 4)
+        self.assertEqual(batch[0], json.loads(self.processed.model_dump_json()))
+        self.assertEqual(adapter.sent_records, 10)
+
+    def test_failed_posts_are_retried(self):
+        responses = [requests.ConnectionError("refused"), Mock(status_code=503), Mock(status_code=200)]
+        adapter = self.adapter(responses, linger=0)
+        adapter.save_batch([self.processed, self.processed])
+        adapter.close()
+        self.assertEqual(adapter.session.post.call_count, 3)
+        self.assertEqual(adapter.sent_records, 2)
+
+    def test_client_errors_are_not_retried(self):
+        adapter = self.adapter([Mock(status_code=422)], linger=0)
+        adapter.save_data(self.processed)
+        adapter.close()
+        self.assertEqual(adapter.session.post.call_count, 1)
+        self.assertEqual(adapter.failed_records, 1)
+
+    def test_unexpected_errors_do_not_stop_the_flusher(self):
+        adapter = self.adapter([ValueError("bad batch"), Mock(status_code=200)], max_batch=1, linger=0)
+        with self.assertLogs(level="ERROR"):
+            adapter.save_batch([self.processed, self.processed])
+            adapter.close()
+        self.assertEqual(adapter.session.post.call_count, 2)
+        self.assertEqual(adapter.failed_records, 1)
+        self.assertEqual(adapter.sent_records, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
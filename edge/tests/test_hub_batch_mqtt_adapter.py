@@ -0,0 +1,115 @@
+import json
+import threading
+import time
+import unittest
+from unittest.mock import Mock, patch
+
+from paho.mqtt import client as mqtt_client
+
+from app.adapters import binary_codec
+from app.adapters.hub_batch_mqtt_adapter import HubBatchMqttAdapter
+from app.adapters.hub_mqtt_adapter import HubMqttAdapter
+from app.entities.agent_data import AgentData
+from app.usecases.data_processing import process_agent_data
+from tests.test_binary_codec import AGGREGATED_JSON
+
+
+class FakeClient:
+    """Collects QoS 1 publishes, PUBACKs are sent by calling ack"""
+
+    def __init__(self, ack_immediately=False, rc=mqtt_client.MQTT_ERR_SUCCESS):
+        self.ack_immediately = ack_immediately
+        self.rc = rc
+        self.published = []
+        self.on_publish = None
+        self.max_inflight_messages_set = Mock()
+        self._published = threading.Condition()
+
+    def publish(self, topic, payload, qos=0):
+        with self._published:
+            self.published.append((topic, payload, qos))
+            mid = len(self.published)
+            self._published.notify_all()
+        if self.ack_immediately:
+            # Like a PUBACK that is read before publish returns
+            self.on_publish(self, None, mid)
+        return Mock(rc=self.rc, mid=mid)
+
+    def wait_for(self, count):
+        with self._published:
+            self._published.wait_for(lambda: len(self.published) >= count, timeout=5)
+
+    def ack(self, mid):
+        self.on_publish(self, None, mid)
+
+
+class TestHubBatchMqttAdapter(unittest.TestCase):
+    def setUp(self):
+        self.processed = process_agent_data(AgentData.model_validate_json(AGGREGATED_JSON))
+
+    def adapter(self, client, **options):
+        with patch.object(HubMqttAdapter, "_connect_mqtt", return_value=client):
+            return HubBatchMqttAdapter("broker", 1883, "hub", **options)
+
+    def test_records_are_published_in_batches_at_qos_1(self):
+        client = FakeClient(ack_immediately=True)
+        adapter = self.adapter(client, max_batch=4, linger=10)
+        for _ in range(10):
+            self.assertTrue(adapter.save_data(self.processed))
+        adapter.close()
+        self.assertEqual(len(client.published), 3)
+        topic, payload, qos = client.published[0]
+        self.assertEqual((topic, qos), ("hub", 1))
+        batch = json.loads(payload)
+        self.assertEqual(len(batch), 4)
+        self.assertEqual(batch[0], json.loads(self.processed.model_dump_json()))
+        stats = adapter.stats()
+        self.assertEqual(stats["delivered_batches"], 3)
+        self.assertEqual(stats["delivered_records"], 10)
+        self.assertIsNotNone(stats["p99_ms"])
+
+    def test_binary_batches_are_one_frame(self):
+        client = FakeClient(ack_immediately=True)
+        adapter = self.adapter(client, wire_format="binary", linger=0)
+        adapter.save_batch([self.processed, self.processed])
+        adapter.close()
+        kind, records = binary_codec.decode_frame(client.published[0][1])
+        self.assertEqual(kind, binary_codec.KIND_PROCESSED)
+        self.assertEqual(len(records), 2)
+
+    def test_window_waits_for_pubacks(self):
+        client = FakeClient()
+        adapter = self.adapter(client, max_batch=1, linger=0, window=2)
+        client.max_inflight_messages_set.assert_called_once_with(2)
+        adapter.save_batch([self.processed] * 3)
+        client.wait_for(2)
+        self.assertEqual(len(client.published), 2)
+        self.assertEqual(adapter.stats()["in_flight"], 2)
+        client.ack(1)
+        client.wait_for(3)
+        self.assertEqual(len(client.published), 3)
+        client.ack(2)
+        client.ack(3)
+        adapter.close(timeout=1)
+        stats = adapter.stats()
+        self.assertEqual(stats["in_flight"], 0)
+        self.assertEqual(stats["delivered_records"], 3)
+
+    def test_close_gives_up_on_an_unreachable_hub(self):
+        # Without a connection paho keeps the messages and no PUBACK comes
+        client = FakeClient(rc=mqtt_client.MQTT_ERR_NO_CONN)
+        adapter = self.adapter(client, max_batch=1, linger=0, window=2)
+        adapter.save_batch([self.processed] * 4)
+        client.wait_for(2)
+        started = time.monotonic()
+        with self.assertLogs(level="ERROR"):
+            adapter.close(timeout=0.2)
+        self.assertLess(time.monotonic() - started, 2)
+        stats = adapter.stats()
+        self.assertEqual(len(client.published), 2)
+        self.assertEqual(stats["in_flight"], 2)
+        self.assertEqual(stats["failed_records"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
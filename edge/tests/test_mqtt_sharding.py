@@ -0,0 +1,140 @@
+import json
+import unittest
+from collections import defaultdict
+from unittest.mock import Mock
+
+import paho.mqtt.client as mqtt
+
+from app.adapters.agent_mqtt_adapter import AgentMQTTAdapter
+from app.adapters.mqtt_sharding import owned_shards, shard_of, shard_owner, strip_shard, subscriptions
+from app.interfaces.hub_gateway import HubGateway
+from tests.test_binary_codec import AGGREGATED_JSON
+from tests.test_stream_merger import ACCEL, ENV
+
+SHARDS = 16
+
+
+class FakeBroker:
+    """In-process stand-in for the broker: plain and $share subscriptions, QoS 0"""
+
+    def __init__(self):
+        # (topic filter, share group or None, client)
+        self.subscriptions = []
+        self._next_member = defaultdict(int)
+
+    def publish(self, topic, payload):
+        # Like paho, str payloads go out UTF-8 encoded
+        payload = payload.encode("utf-8")
+        groups = defaultdict(list)
+        for topic_filter, group, client in self.subscriptions:
+            if not mqtt.topic_matches_sub(topic_filter, topic):
+                continue
+            if group is None:
+                client.deliver(topic, payload)
+            else:
+                groups[group, topic_filter].append(client)
+        # Every shared subscription group hands the message to one member, round robin
+        for key, members in groups.items():
+            self._next_member[key] += 1
+            members[self._next_member[key] % len(members)].deliver(topic, payload)
+
+
+class FakeClient:
+    def __init__(self, broker, adapter):
+        self.broker = broker
+        self.adapter = adapter
+
+    def subscribe(self, topic_filter):
+        group = None
+        if topic_filter.startswith("$share/"):
+            _, group, topic_filter = topic_filter.split("/", 2)
+        self.broker.subscriptions.append((topic_filter, group, self))
+
+    def deliver(self, topic, payload):
+        self.adapter.on_message(self, None, Mock(topic=topic, payload=payload))
+
+
+def start_edges(broker, count, **options):
+    edges = []
+    for instance in range(count):
+        adapter = AgentMQTTAdapter(
+            "broker",
+            1883,
+            "agent_data_topic",
+            Mock(spec=HubGateway),
+            streams_topic="agent/+/+",
+            instance=instance,
+            instances=count,
+            **options,
+        )
+        adapter.client = FakeClient(broker, adapter)
+        adapter.on_connect(adapter.client, None, None, 0)
+        edges.append(adapter)
+    return edges
+
+
+def saved_user_ids(edge):
+    return [
+        processed.agent_data.user_id
+        for call in edge.hub_gateway.save_batch.call_args_list
+        for processed in call.args[0]
+    ]
+
+
+def reading(user_id):
+    return json.dumps(dict(json.loads(AGGREGATED_JSON), user_id=user_id))
+
+
+class TestMqttSharding(unittest.TestCase):
+    def test_shards_are_split_between_instances(self):
+        owners = [shard_owner(shard, 3) for shard in range(64)]
+        self.assertEqual(set(owners), {0, 1, 2})
+        self.assertEqual(sorted(sum((owned_shards(i, 3, 64) for i in range(3)), [])), list(range(64)))
+        # A fourth instance only takes shards over, none move between the others
+        for shard, owner in enumerate(owners):
+            self.assertIn(shard_owner(shard, 4), (owner, 3))
+
+    def test_subscriptions(self):
+        self.assertEqual(subscriptions(["agent_data_topic"]), ["agent_data_topic"])
+        self.assertEqual(
+            subscriptions(["agent_data_topic"], shards=4, instance=0, instances=1),
+            [f"shard/{shard}/agent_data_topic" for shard in range(4)],
+        )
+        self.assertEqual(
+            subscriptions(["agent/+/+"], share_group="edges"), ["$share/edges/agent/+/+"]
+        )
+        self.assertEqual(strip_shard("shard/3/agent/7/accel"), "agent/7/accel")
+        self.assertEqual(strip_shard("agent/7/accel"), "agent/7/accel")
+
+    def test_every_vehicle_lands_on_one_instance(self):
+        broker = FakeBroker()
+        edges = start_edges(broker, 3, shards=SHARDS)
+        for _ in range(5):
+            for user_id in range(30):
+                broker.publish(f"shard/{shard_of(user_id, SHARDS)}/agent_data_topic", reading(user_id))
+        per_edge = [saved_user_ids(edge) for edge in edges]
+        self.assertEqual(sum(len(user_ids) for user_ids in per_edge), 150)
+        self.assertTrue(all(per_edge))
+        for user_id in range(30):
+            self.assertEqual(sum(user_id in user_ids for user_ids in per_edge), 1)
+
+    def test_sharded_streams_are_merged_by_their_owner(self):
+        broker = FakeBroker()
+        edges = start_edges(broker, 2, shards=SHARDS)
+        shard = shard_of(7, SHARDS)
+        broker.publish(f"shard/{shard}/agent/7/env", json.dumps(ENV))
+        broker.publish(f"shard/{shard}/agent/7/accel", json.dumps(ACCEL))
+        owner = edges[shard_owner(shard, 2)]
+        self.assertEqual(saved_user_ids(owner), [7])
+        self.assertEqual(sum(map(len, map(saved_user_ids, edges))), 1)
+
+    def test_share_group_spreads_messages(self):
+        broker = FakeBroker()
+        edges = start_edges(broker, 2, share_group="edges")
+        for user_id in range(10):
+            broker.publish("agent_data_topic", reading(user_id))
+        self.assertEqual([len(saved_user_ids(edge)) for edge in edges], [5, 5])
+
+
+if __name__ == "__main__":
+    unittest.main()
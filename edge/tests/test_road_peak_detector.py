@@ -0,0 +1,123 @@
+import random
+import unittest
+from unittest.mock import patch
+
+from app.entities.agent_data import AgentData
+from app.usecases.data_processing import process_agent_data
+from app.usecases.road_peak_detector import PeakDetector, RoadPeakDetector
+from tests.test_binary_codec import AGGREGATED_JSON
+
+try:
+    # The hub labels with find_peaks, the edge is only a test dependency of scipy
+    from scipy.signal import find_peaks
+except ImportError:
+    find_peaks = None
+
+BASE = 16000.0
+BUMP = [0.2, 0.5, 0.8, 1.0, 0.8, 0.5, 0.2]
+
+
+def signal(length, events):
+    """A flat z signal with a 7-sample bump of the given size centred at every event"""
+    z = [BASE + (i % 3) * 50 for i in range(length)]
+    for center, size in events.items():
+        for offset, share in enumerate(BUMP, start=-3):
+            z[center + offset] += size * share
+    return z
+
+
+def detect(detector, z):
+    verdicts = [verdict for verdict in map(detector.push, z) if verdict is not None]
+    return verdicts + detector.flush()
+
+
+class TestPeakDetector(unittest.TestCase):
+    def test_prominent_wide_peaks_are_found(self):
+        z = signal(200, {40: 9000, 100: 12000, 160: 3000})
+        verdicts = detect(PeakDetector(half_window=10), z)
+        self.assertEqual(len(verdicts), len(z))
+        self.assertEqual([i for i, peak in enumerate(verdicts) if peak], [40, 100])
+
+    def test_narrow_spikes_are_not_peaks(self):
+        z = signal(100, {})
+        z[50] += 20000
+        self.assertFalse(any(detect(PeakDetector(half_window=10), z)))
+
+    def test_peaks_at_the_end_are_found_on_flush(self):
+        z = signal(50, {45: 10000})
+        detector = PeakDetector(half_window=10)
+        streamed = [verdict for verdict in map(detector.push, z) if verdict is not None]
+        self.assertFalse(any(streamed))
+        self.assertEqual(len(streamed), 40)
+        self.assertEqual(detector.flush().index(True), 5)
+
+    @unittest.skipUnless(find_peaks, "needs scipy")
+    def test_verdicts_match_find_peaks(self):
+        rng = random.Random(3)
+        for _ in range(200):
+            # Noise with bumps and potholes, some close together, on a coarse
+            # grid so some tops are flat
+            z = [BASE + rng.randrange(-6, 7) * 100 for _ in range(rng.randrange(1, 120))]
+            for _ in range(rng.randrange(0, 6)):
+                center = rng.randrange(len(z))
+                size = rng.choice((1, -1)) * rng.randrange(40, 160) * 100
+                for offset, share in enumerate(BUMP[rng.randrange(3):], start=-3):
+                    if 0 <= center + offset < len(z):
+                        z[center + offset] += size * share
+            verdicts = detect(PeakDetector(prominence=7000, width=3, half_window=10), z)
+            expected = find_peaks(z, prominence=7000, width=3, wlen=21)[0].tolist()
+            self.assertEqual([i for i, peak in enumerate(verdicts) if peak], expected, z)
+
+
+class TestRoadPeakDetector(unittest.TestCase):
+    def readings(self, user_id, z):
+        template = AgentData.model_validate_json(AGGREGATED_JSON)
+        readings = []
+        for value in z:
+            agent_data = template.model_copy(deep=True)
+            agent_data.user_id = user_id
+            agent_data.accelerometer.z = value
+            readings.append(process_agent_data(agent_data))
+        return readings
+
+    def test_labels_are_delayed_and_per_vehicle(self):
+        detector = RoadPeakDetector(half_window=10)
+        first = self.readings(1, signal(60, {20: 10000, 40: -10000}))
+        second = self.readings(2, signal(60, {30: 10000}))
+        released = []
+        for a, b in zip(first, second):
+            released += detector.feed([a, b])
+        self.assertEqual(len(released), 2 * 50)
+        released += detector.flush()
+        self.assertEqual(len(released), 120)
+        labels = {
+            user_id: [
+                p.road_state for p in released if p.agent_data.user_id == user_id
+            ]
+            for user_id in (1, 2)
+        }
+        self.assertEqual(labels[1][20], "bump")
+        self.assertEqual(labels[1][40], "pothole")
+        self.assertEqual(labels[1].count("normal"), 58)
+        self.assertEqual(labels[2][30], "bump")
+        self.assertEqual(labels[2].count("normal"), 59)
+
+    def test_idle_vehicles_are_released(self):
+        detector = RoadPeakDetector(half_window=10, idle_flush=0)
+        released = detector.feed(self.readings(1, signal(5, {})))
+        self.assertEqual(len(released), 5)
+        self.assertEqual(detector.vehicles, {})
+
+    def test_idle_vehicles_are_released_without_more_input(self):
+        with patch("time.monotonic", return_value=1000.0):
+            detector = RoadPeakDetector(half_window=10, idle_flush=5)
+            self.assertEqual(detector.feed(self.readings(1, signal(5, {}))), [])
+            self.assertEqual(detector.release_idle(), [])
+        with patch("time.monotonic", return_value=1005.0):
+            released = detector.release_idle()
+        self.assertEqual(len(released), 5)
+        self.assertEqual(detector.vehicles, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import json
+import unittest
+from unittest.mock import Mock
+
+from app.adapters.agent_mqtt_adapter import AgentMQTTAdapter
+from app.interfaces.hub_gateway import HubGateway
+from app.usecases.stream_merger import StreamMerger
+
+ACCEL = {
+    "user_id": 7,
+    "timestamp": "2024-02-21T12:34:56.020000",
+    "accelerometer": {"x": -112, "y": -318, "z": 16533},
+    "gps": {"longitude": 30.52389376262598, "latitude": 50.450729742682526},
+    "vibration": {"x": -4.532, "y": 4.785, "z": 0.454, "magnitude": 6.606161139421291},
+}
+ENV = {
+    "user_id": 7,
+    "timestamp": "2024-02-21T12:34:56",
+    "parking": {"empty_count": 28.0, "gps": {"longitude": 30.55, "latitude": 48.22}},
+    "temperature": {"value": 30.37, "unit": "C"},
+    "humidity": {"value": 30.22, "unit": "%"},
+    "light": {"illumination": 992.7},
+    "air_quality": {"pm2_5": 353.4, "pm10": 329.5, "aqi": 261},
+}
+
+
+class TestStreamMerger(unittest.TestCase):
+    def test_accel_is_merged_with_last_env(self):
+        merger = StreamMerger()
+        self.assertIsNone(merger.merge("accel", ACCEL))
+        self.assertIsNone(merger.merge("env", ENV))
+        merged = merger.merge("accel", ACCEL)
+        self.assertEqual(merged["timestamp"], ACCEL["timestamp"])
+        self.assertEqual(merged["temperature"], ENV["temperature"])
+        self.assertEqual(merged["accelerometer"], ACCEL["accelerometer"])
+
+    def test_users_are_merged_separately(self):
+        merger = StreamMerger()
+        merger.merge("env", ENV)
+        self.assertIsNone(merger.merge("accel", dict(ACCEL, user_id=8)))
+
+    def test_partial_reading_is_completed(self):
+        merger = StreamMerger()
+        full = {**ACCEL, **ENV, "timestamp": ACCEL["timestamp"]}
+        self.assertEqual(merger.merge("reading", full), full)
+        partial = {key: full[key] for key in ("user_id", "timestamp", "accelerometer", "gps", "vibration")}
+        partial["temperature"] = {"value": 12.0, "unit": "C"}
+        merged = merger.merge("reading", partial)
+        self.assertEqual(merged["temperature"]["value"], 12.0)
+        self.assertEqual(merged["humidity"], ENV["humidity"])
+
+    def test_adapter_forwards_merged_readings(self):
+        hub_gateway = Mock(spec=HubGateway)
+        adapter = AgentMQTTAdapter("localhost", 1883, "agent_data_topic", hub_gateway, streams_topic="agent/+/+")
+        adapter.on_message(None, None, Mock(topic="agent/7/env", payload=json.dumps(ENV).encode()))
+        hub_gateway.save_batch.assert_not_called()
+        adapter.on_message(None, None, Mock(topic="agent/7/accel", payload=json.dumps([ACCEL, ACCEL]).encode()))
+        processed = hub_gateway.save_batch.call_args[0][0]
+        self.assertEqual(len(processed), 2)
+        self.assertEqual(processed[0].agent_data.user_id, 7)
+        self.assertEqual(processed[0].temp_status, "hot")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+import threading
+import time
+import unittest
+from unittest.mock import Mock
+
+from app.adapters.agent_mqtt_adapter import AgentMQTTAdapter
+from app.adapters.worker_pool import WorkerPool
+from app.interfaces.hub_gateway import HubGateway
+from tests.test_binary_codec import AGGREGATED_JSON
+
+
+class TestWorkerPool(unittest.TestCase):
+    def test_drop_oldest_keeps_newest_items(self):
+        handled = []
+        pool = WorkerPool(handled.append, workers=1, queue_size=2, drop_policy="drop_oldest")
+        for item in range(5):
+            pool.submit(item)
+        pool.start()
+        pool.stop()
+        self.assertEqual(handled, [3, 4])
+        self.assertEqual(pool.metrics()["dropped"], 3)
+
+    def test_drop_newest_rejects_new_items(self):
+        handled = []
+        pool = WorkerPool(handled.append, workers=1, queue_size=2, drop_policy="drop_newest")
+        self.assertEqual([pool.submit(item) for item in range(4)], [True, True, False, False])
+        pool.start()
+        pool.stop()
+        self.assertEqual(handled, [0, 1])
+
+    def test_slow_hub_does_not_block_on_message(self):
+        release = threading.Event()
+        hub_gateway = Mock(spec=HubGateway)
+        hub_gateway.save_batch.side_effect = lambda batch: release.wait(5)
+        adapter = AgentMQTTAdapter(
+            "localhost", 1883, "agent_data_topic", hub_gateway, workers=2, queue_size=100
+        )
+        adapter.pool.start()
+        started = time.perf_counter()
+        for _ in range(10):
+            adapter.on_message(None, None, Mock(topic="agent_data_topic", payload=AGGREGATED_JSON.encode()))
+        self.assertLess(time.perf_counter() - started, 1)
+        # Both workers are stuck in the hub, the rest waits in the queue
+        self.assertGreaterEqual(adapter.metrics()["queue_depth"], 8)
+        release.set()
+        adapter.pool.stop()
+        self.assertEqual(hub_gateway.save_batch.call_count, 10)
+        self.assertEqual(adapter.metrics()["messages"], 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import asyncio
+import gzip
+import logging
+from typing import List, Optional, Union
+
+import httpx
+from pydantic import TypeAdapter
+
+from app.entities.processed_agent_data import ProcessedAgentData
+from app.interfaces.async_store_gateway import AsyncStoreGateway
+
+processed_agent_data_batch_adapter = TypeAdapter(List[ProcessedAgentData])
+
+
+class AsyncStoreApiAdapter(AsyncStoreGateway):
+    """
+    StoreApiAdapter for the asyncio runtime. Batches are posted over a pooled
+    keep-alive httpx.AsyncClient, at most `max_concurrency` at a time, so
+    saving never blocks the event loop. A batch is serialized to JSON bytes
+    in one pass by pydantic-core, and gzipped with `compress`. The client is
+    made on the first save, on the event loop that uses it.
+    """
+
+    def __init__(self, api_base_url, max_concurrency=4, compress=False, timeout=10):
+        self.url = f"{api_base_url}/processed_agent_data/"
+        self.max_concurrency = max_concurrency
+        self.compress = compress
+        self.timeout = timeout
+        self.client: Optional[httpx.AsyncClient] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    async def save_data(self, processed_agent_data_batch: List[ProcessedAgentData]) -> bool:
+        """
+        Save the processed road data to the Store API.
+        Parameters:
+            processed_agent_data_batch (List[ProcessedAgentData]): Processed road data to be saved.
+        Returns:
+            bool: True if the data is successfully saved, False otherwise.
+        """
+        return await self.save_json(processed_agent_data_batch_adapter.dump_json(processed_agent_data_batch))
+
+    async def save_documents(self, documents: List[Union[bytes, str]]) -> bool:
+        """Save records that are already JSON documents, as they are"""
+        documents = [document.encode("utf-8") if isinstance(document, str) else document for document in documents]
+        return await self.save_json(b"[" + b",".join(documents) + b"]")
+
+    async def save_json(self, body: bytes) -> bool:
+        """Post a JSON array of processed records"""
+        headers = {"Content-Type": "application/json"}
+        if self.compress:
+            body = gzip.compress(body, compresslevel=1)
+            headers["Content-Encoding"] = "gzip"
+        if self.client is None:
+            self.client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.max_concurrency),
+            )
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+        try:
+            async with self._slots:
+                response = await self.client.post(self.url, content=body, headers=headers)
+            if response.status_code != 200:
+                logging.error(f"Invalid Store response\nResponse: {response.status_code} {response.text}")
+                return False
+        except Exception as e:
+            logging.error(f"Error occurred during request: {e}")
+            return False
+        return True
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
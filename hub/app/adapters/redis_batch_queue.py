@@ -0,0 +1,247 @@
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Callable, List, NamedTuple, Optional, Union
+
+import numpy as np
+from redis import Redis
+
+# Claims kept for the batch size and queue wait statistics
+STATS_SAMPLES = 1000
+
+# Shared by the scripts: RPUSH values[first..] in chunks, Lua's unpack is
+# limited to a few thousand values
+_RPUSH_ALL = """
+local function rpush_all(key, values, first)
+    for i = first, #values, 1000 do
+        redis.call('RPUSH', key, unpack(values, i, math.min(i + 999, #values)))
+    end
+end
+"""
+
+# KEYS: queue, arrival times, [claims, claim, claim arrival times]
+# ARGV: batch size, linger, now, claim timeout, documents...
+# Returns {documents left in the queue, claimed batch (empty if none is due),
+#          arrival times of the batch, arrival time of the oldest document left ('' if none)}
+_PUSH_AND_CLAIM = _RPUSH_ALL + """
+local queue, times, claims, claim, claim_times = KEYS[1], KEYS[2], KEYS[3], KEYS[4], KEYS[5]
+local size, linger, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+if claims then
+    -- Put the batches of claims not acked in time back at the head, oldest first
+    local stale = redis.call('ZRANGEBYSCORE', claims, '-inf', now - tonumber(ARGV[4]))
+    for i = #stale, 1, -1 do
+        for _, key in ipairs({stale[i], stale[i] .. ':times'}) do
+            local values = redis.call('LRANGE', key, 0, -1)
+            local list = key == stale[i] and queue or times
+            for j = #values, 1, -1 do
+                redis.call('LPUSH', list, values[j])
+            end
+            redis.call('DEL', key)
+        end
+        redis.call('ZREM', claims, stale[i])
+    end
+end
+if #ARGV > 4 then
+    rpush_all(queue, ARGV, 5)
+    local arrivals = {}
+    for i = 5, #ARGV do
+        arrivals[i - 4] = ARGV[3]
+    end
+    rpush_all(times, arrivals, 1)
+end
+local length = redis.call('LLEN', queue)
+local oldest = redis.call('LINDEX', times, 0)
+local due = length >= size or (length > 0 and linger > 0 and oldest and now - tonumber(oldest) >= linger)
+if not due then
+    return {length, {}, {}, oldest or ''}
+end
+local count = math.min(size, length)
+local batch = redis.call('LRANGE', queue, 0, count - 1)
+local arrivals = redis.call('LRANGE', times, 0, count - 1)
+redis.call('LTRIM', queue, count, -1)
+redis.call('LTRIM', times, count, -1)
+if claims then
+    rpush_all(claim, batch, 1)
+    rpush_all(claim_times, arrivals, 1)
+    redis.call('ZADD', claims, now, claim)
+end
+return {length - count, batch, arrivals, redis.call('LINDEX', times, 0) or ''}
+"""
+
+
+class Claim(NamedTuple):
+    # Key holding the batch until it is acked, None for a plain queue
+    key: Optional[str]
+    documents: List[bytes]
+    # time.time() each document was queued at
+    arrivals: List[float]
+
+
+class RedisBatchQueue:
+    """
+    FIFO queue of JSON documents in a Redis list, handed out in batches of
+    `batch_size`. Pushing documents and claiming a due batch is one Lua
+    script, so it is a single round trip and atomic: the MQTT thread and the
+    HTTP handlers never claim the same documents, and a batch is only ever
+    claimed whole.
+
+    A parallel `<key>:times` list holds the arrival time of every document.
+    With `linger` (seconds), a batch is also due once its oldest document has
+    waited that long, whatever its size; LingerFlusher claims those when no
+    push comes along.
+
+    With `max_batch_size` above `min_batch_size` the batch size adapts to the
+    traffic: it doubles, up to `max_batch_size`, while a claim leaves another
+    full batch behind, and drops to the size of a batch claimed on its
+    linger deadline, down to `min_batch_size`. Busy hubs then write fewer,
+    bigger batches to the store, quiet ones do not hold records back. Every
+    `report_every` seconds (0 disables the reports) the effective batch size
+    and queue wait percentiles are logged.
+
+    With `reliable`, a claimed batch is also copied to its own key, listed in
+    the `<key>:claims` sorted set by claim time, until it is acked. Batches
+    not acked within `claim_timeout` seconds (the hub died or the Store API
+    failed) are put back at the head of the queue by the next push or claim,
+    so they are delivered at least once. A batch acked after its timeout may
+    be delivered twice.
+    """
+
+    def __init__(
+        self,
+        redis: Redis,
+        key="agent_data",
+        batch_size=20,
+        reliable=False,
+        claim_timeout=60,
+        linger=0,
+        min_batch_size=None,
+        max_batch_size=None,
+        report_every=0,
+    ):
+        self.redis = redis
+        self.key = key
+        self.batch_size = batch_size
+        self.min_batch_size = min_batch_size or batch_size
+        self.max_batch_size = max_batch_size or batch_size
+        self.reliable = reliable
+        self.claim_timeout = claim_timeout
+        self.linger = linger
+        self.report_every = report_every
+        self._next_report = time.monotonic() + report_every
+        self.times_key = f"{key}:times"
+        self.claims_key = f"{key}:claims"
+        self._push_and_claim = redis.register_script(_PUSH_AND_CLAIM)
+        # Documents left in the queue and arrival time of the oldest of them, after the last call
+        self.pending = 0
+        self.oldest = None
+        self._lock = threading.Lock()
+        self._sizes = deque(maxlen=STATS_SAMPLES)
+        self._waits = deque(maxlen=STATS_SAMPLES)
+        self.claimed_batches = 0
+
+    def push_and_claim(self, documents: List[Union[bytes, str]]) -> Optional[Claim]:
+        """Append documents to the queue and claim the oldest batch if one is due"""
+        keys = [self.key, self.times_key]
+        claim_key = None
+        if self.reliable:
+            claim_key = f"{self.key}:claim:{uuid.uuid4().hex}"
+            keys += [self.claims_key, claim_key, f"{claim_key}:times"]
+        now = time.time()
+        self.pending, batch, arrivals, oldest = self._push_and_claim(
+            keys=keys,
+            args=[self.batch_size, self.linger, now, self.claim_timeout, *documents],
+        )
+        self.oldest = float(oldest) if oldest else None
+        if not batch:
+            return None
+        claim = Claim(claim_key, batch, [float(arrival) for arrival in arrivals])
+        self._claimed(claim, now)
+        return claim
+
+    def claim(self) -> Optional[Claim]:
+        """Claim the oldest batch if one is due"""
+        return self.push_and_claim([])
+
+    def ack(self, claim: Claim):
+        """Drop a claimed batch once it is stored"""
+        if claim.key is None:
+            return
+        pipeline = self.redis.pipeline()
+        pipeline.delete(claim.key, f"{claim.key}:times")
+        pipeline.zrem(self.claims_key, claim.key)
+        pipeline.execute()
+
+    def next_deadline(self) -> float:
+        """Seconds until the oldest queued document reaches its linger deadline"""
+        if self.oldest is None:
+            return self.linger
+        return max(0.0, self.oldest + self.linger - time.time())
+
+    def stats(self) -> dict:
+        """Effective batch size, claimed batch sizes and queue wait percentiles in milliseconds"""
+        with self._lock:
+            sizes = np.array(self._sizes)
+            waits = np.array(self._waits)
+            stats = dict(
+                batch_size=self.batch_size,
+                claimed_batches=self.claimed_batches,
+                pending=self.pending,
+                mean_batch=float(sizes.mean()) if len(sizes) else None,
+            )
+        for percentile in (50, 95, 99):
+            stats[f"wait_p{percentile}_ms"] = (
+                float(np.percentile(waits, percentile)) * 1000 if len(waits) else None
+            )
+        return stats
+
+    def _claimed(self, claim: Claim, now: float):
+        with self._lock:
+            self.claimed_batches += 1
+            self._sizes.append(len(claim.documents))
+            self._waits.extend(now - arrival for arrival in claim.arrivals)
+            if len(claim.documents) < self.batch_size:
+                # Claimed on its deadline: the traffic fills smaller batches within the linger
+                self.batch_size = max(self.min_batch_size, len(claim.documents))
+            elif self.pending >= self.batch_size:
+                # Backlog: fewer, bigger batches keep up with it
+                self.batch_size = min(self.max_batch_size, self.batch_size * 2)
+        if self.report_every and time.monotonic() >= self._next_report:
+            self._next_report = time.monotonic() + self.report_every
+            logging.info(f"Hub batches: {self.stats()}")
+
+
+class LingerFlusher:
+    """
+    Background thread claiming the batches of a RedisBatchQueue whose linger
+    deadline passed, so records reach the store at low traffic too. It sleeps
+    until the oldest queued document is due, or for a whole linger when the
+    queue is empty. `handle(claim)` stores a claimed batch.
+    """
+
+    def __init__(self, queue: RedisBatchQueue, handle: Callable[[Claim], None]):
+        self.queue = queue
+        self.handle = handle
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="linger-flusher", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stopped.set()
+        self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                claim = self.queue.claim()
+                if claim is not None:
+                    self.handle(claim)
+                    continue
+                wait = self.queue.next_deadline()
+            except Exception as e:
+                logging.error(f"Error flushing a lingering batch: {e}")
+                wait = self.queue.linger
+            self._stopped.wait(max(wait, 0.01))
@@ -0,0 +1,67 @@
+import json
+import time
+from typing import Dict, Iterable, List
+
+from redis import Redis
+
+from app.entities.processed_agent_data_columns import ProcessedAgentDataColumns
+from app.usecases.vehicle_peaks import RoadTail
+
+
+class RedisRoadTails:
+    """
+    The RoadTail of every vehicle, kept in Redis so held records survive a
+    hub restart: one JSON field per user_id in the `key` hash, and the last
+    update time of each in the `<key>:seen` sorted set to find idle vehicles.
+    Loading and saving the tails of a batch are one round trip each. Only
+    one hub may label a vehicle's records at a time.
+    """
+
+    def __init__(self, redis: Redis, key="road_tails"):
+        self.redis = redis
+        self.key = key
+        self.seen_key = f"{key}:seen"
+
+    def load(self, user_ids: Iterable[int]) -> Dict[int, RoadTail]:
+        user_ids = list(user_ids)
+        if not user_ids:
+            return {}
+        tails = {}
+        for user_id, value in zip(user_ids, self.redis.hmget(self.key, user_ids)):
+            if value is not None:
+                tail = json.loads(value)
+                tails[user_id] = RoadTail(
+                    tail["context"], ProcessedAgentDataColumns.from_records(tail["pending"])
+                )
+        return tails
+
+    def save(self, tails: Dict[int, RoadTail]):
+        if not tails:
+            return
+        mapping = {
+            user_id: json.dumps(
+                {
+                    "context": tail.context,
+                    "pending": tail.pending.to_records(),
+                }
+            )
+            for user_id, tail in tails.items()
+        }
+        now = time.time()
+        pipeline = self.redis.pipeline()
+        pipeline.hset(self.key, mapping=mapping)
+        pipeline.zadd(self.seen_key, {user_id: now for user_id in tails})
+        pipeline.execute()
+
+    def idle(self, seconds: float) -> List[int]:
+        """Vehicles whose tail was not updated for `seconds`"""
+        return [int(user_id) for user_id in self.redis.zrangebyscore(self.seen_key, "-inf", time.time() - seconds)]
+
+    def drop(self, user_ids: Iterable[int]):
+        user_ids = list(user_ids)
+        if not user_ids:
+            return
+        pipeline = self.redis.pipeline()
+        pipeline.hdel(self.key, *user_ids)
+        pipeline.zrem(self.seen_key, *user_ids)
+        pipeline.execute()
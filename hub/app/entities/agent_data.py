@@ -1,5 +1,5 @@
 from datetime import datetime
-from pydantic import BaseModel, field_validator, ValidationInfo
+from pydantic import BaseModel
 
 class AccelerometerData(BaseModel):
     x: float
@@ -23,15 +23,11 @@ class HumidityData(BaseModel):
 
 
 class VibrationData(AccelerometerData):
+    # Agents send the magnitude of (x, y, z). It is taken as sent, a validator
+    # written in Python would run for every record; the edge fills it in
+    # for readings without one.
     magnitude: float = None
 
-    @field_validator('magnitude', mode='after')
-    def compute_magnitude(cls, v, info: ValidationInfo):
-        x = info.data.get('x', 0)
-        y = info.data.get('y', 0)
-        z = info.data.get('z', 0)
-        return (x**2 + y**2 + z**2) ** 0.5
-
 class LightData(BaseModel):
     illumination: float
 
@@ -51,16 +47,5 @@ class AgentData(BaseModel):
     vibration: VibrationData
     light: LightData
     air_quality: AirQualityData
+    # ISO 8601, parsed by pydantic itself
     timestamp: datetime
-
-    @classmethod
-    @field_validator("timestamp", mode="before")
-    def parse_timestamp(cls, value):
-        if isinstance(value, datetime):
-            return value
-        try:
-            return datetime.fromisoformat(value)
-        except (TypeError, ValueError):
-            raise ValueError(
-                "Invalid timestamp format. Expected ISO 8601 format (YYYY-MM-DDTHH:MM:SSZ)."
-            )
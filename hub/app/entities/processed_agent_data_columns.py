@@ -0,0 +1,135 @@
+"""
+Struct-of-arrays form of a batch of processed records: one NumPy array per
+leaf field of ProcessedAgentData, so the hub's batch step works on whole
+columns instead of one object per record. Queued documents were validated
+when they were received (processed_agent_data_record.py), so they are only
+decoded here. Keep it in step with processed_agent_data.py and agent_data.py.
+"""
+import json
+from typing import Dict, Iterable, List, Union
+
+import numpy as np
+import pydantic_core
+
+# Column name, how to read it from a record, and its dtype. Missing optional
+# numbers are NaN, missing optional objects None. Timestamps stay the ISO 8601
+# strings they were queued as, the store parses them.
+COLUMNS = [
+    ("user_id", lambda r: r["agent_data"]["user_id"], np.int64),
+    ("accelerometer_x", lambda r: r["agent_data"]["accelerometer"]["x"], np.float64),
+    ("accelerometer_y", lambda r: r["agent_data"]["accelerometer"]["y"], np.float64),
+    ("accelerometer_z", lambda r: r["agent_data"]["accelerometer"]["z"], np.float64),
+    ("latitude", lambda r: r["agent_data"]["gps"]["latitude"], np.float64),
+    ("longitude", lambda r: r["agent_data"]["gps"]["longitude"], np.float64),
+    ("temperature", lambda r: r["agent_data"]["temperature"]["value"], np.float64),
+    ("temperature_unit", lambda r: r["agent_data"]["temperature"]["unit"], object),
+    ("humidity", lambda r: r["agent_data"]["humidity"]["value"], np.float64),
+    ("humidity_unit", lambda r: r["agent_data"]["humidity"]["unit"], object),
+    ("vibration_x", lambda r: r["agent_data"]["vibration"]["x"], np.float64),
+    ("vibration_y", lambda r: r["agent_data"]["vibration"]["y"], np.float64),
+    ("vibration_z", lambda r: r["agent_data"]["vibration"]["z"], np.float64),
+    ("vibration_magnitude", lambda r: r["agent_data"]["vibration"].get("magnitude"), np.float64),
+    ("illumination", lambda r: r["agent_data"]["light"]["illumination"], np.float64),
+    ("pm2_5", lambda r: r["agent_data"]["air_quality"]["pm2_5"], np.float64),
+    ("pm10", lambda r: r["agent_data"]["air_quality"]["pm10"], np.float64),
+    ("aqi", lambda r: r["agent_data"]["air_quality"].get("aqi"), np.float64),
+    ("timestamp", lambda r: r["agent_data"]["timestamp"], object),
+    ("road_state", lambda r: r["road_state"], object),
+    ("temp_status", lambda r: r.get("temp_status"), object),
+    ("humidity_status", lambda r: r.get("humidity_status"), object),
+    ("vibration_status", lambda r: r.get("vibration_status"), object),
+    ("light_status", lambda r: r.get("light_status"), object),
+    ("air_quality_status", lambda r: r.get("air_quality_status"), object),
+    ("environment", lambda r: r.get("environment"), object),
+]
+
+
+class ProcessedAgentDataColumns:
+    """A batch of processed records as one array per field, see COLUMNS"""
+
+    def __init__(self, columns: Dict[str, np.ndarray]):
+        self.columns = columns
+
+    @classmethod
+    def from_documents(cls, documents: List[Union[bytes, str]]) -> "ProcessedAgentDataColumns":
+        """Decode queued JSON records, in one json.loads call for the batch"""
+        documents = [document.encode("utf-8") if isinstance(document, str) else document for document in documents]
+        return cls.from_records(json.loads(b"[" + b",".join(documents) + b"]"))
+
+    @classmethod
+    def from_records(cls, records: List[dict]) -> "ProcessedAgentDataColumns":
+        columns = {}
+        for name, read, dtype in COLUMNS:
+            if dtype is object:
+                column = np.empty(len(records), dtype=object)
+                column[:] = [read(record) for record in records]
+            else:
+                column = np.array([read(record) for record in records], dtype=dtype)
+            columns[name] = column
+        return cls(columns)
+
+    @classmethod
+    def empty(cls) -> "ProcessedAgentDataColumns":
+        return cls.from_records([])
+
+    @classmethod
+    def concatenate(cls, batches: Iterable["ProcessedAgentDataColumns"]) -> "ProcessedAgentDataColumns":
+        batches = list(batches)
+        if not batches:
+            return cls.empty()
+        return cls({name: np.concatenate([batch.columns[name] for batch in batches]) for name, _, _ in COLUMNS})
+
+    def __len__(self) -> int:
+        return len(self.columns["user_id"])
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+    def take(self, rows) -> "ProcessedAgentDataColumns":
+        """The given rows (indices, a slice or a mask) of every column"""
+        return ProcessedAgentDataColumns({name: column[rows] for name, column in self.columns.items()})
+
+    def to_records(self) -> List[dict]:
+        """The records as the nested dicts the Store API takes"""
+        c = {name: column.tolist() for name, column in self.columns.items()}
+        magnitudes = [None if value != value else value for value in c["vibration_magnitude"]]
+        aqis = [None if value != value else int(value) for value in c["aqi"]]
+        return [
+            {
+                "agent_data": {
+                    "user_id": user_id,
+                    "accelerometer": {"x": ax, "y": ay, "z": az},
+                    "gps": {"latitude": latitude, "longitude": longitude},
+                    "temperature": {"value": temperature, "unit": temperature_unit},
+                    "humidity": {"value": humidity, "unit": humidity_unit},
+                    "vibration": {"x": vx, "y": vy, "z": vz, "magnitude": magnitude},
+                    "light": {"illumination": illumination},
+                    "air_quality": {"pm2_5": pm2_5, "pm10": pm10, "aqi": aqi},
+                    "timestamp": timestamp,
+                },
+                "road_state": road_state,
+                "temp_status": temp_status,
+                "humidity_status": humidity_status,
+                "vibration_status": vibration_status,
+                "light_status": light_status,
+                "air_quality_status": air_quality_status,
+                "environment": environment,
+            }
+            for (
+                user_id, ax, ay, az, latitude, longitude, temperature, temperature_unit,
+                humidity, humidity_unit, vx, vy, vz, magnitude, illumination, pm2_5, pm10, aqi,
+                timestamp, road_state, temp_status, humidity_status, vibration_status,
+                light_status, air_quality_status, environment,
+            ) in zip(
+                c["user_id"], c["accelerometer_x"], c["accelerometer_y"], c["accelerometer_z"],
+                c["latitude"], c["longitude"], c["temperature"], c["temperature_unit"],
+                c["humidity"], c["humidity_unit"], c["vibration_x"], c["vibration_y"],
+                c["vibration_z"], magnitudes, c["illumination"], c["pm2_5"], c["pm10"], aqis,
+                c["timestamp"], c["road_state"], c["temp_status"], c["humidity_status"],
+                c["vibration_status"], c["light_status"], c["air_quality_status"], c["environment"],
+            )
+        ]
+
+    def to_json(self) -> bytes:
+        """The records as the JSON array the Store API takes, serialized by pydantic-core"""
+        return pydantic_core.to_json(self.to_records())
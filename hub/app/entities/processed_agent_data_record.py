@@ -0,0 +1,91 @@
+"""
+Plain-dict mirror of ProcessedAgentData for the ingest fast path. Validating
+against TypedDicts checks the same fields and types in one pass inside
+pydantic-core without building the nested model objects, which the hub
+does not need for records it only queues in Redis. Keep it in step with
+processed_agent_data.py and agent_data.py.
+"""
+from datetime import datetime
+from typing import List, Optional
+
+from pydantic import TypeAdapter
+from typing_extensions import NotRequired, TypedDict
+
+
+class AccelerometerRecord(TypedDict):
+    x: float
+    y: float
+    z: float
+
+
+class GpsRecord(TypedDict):
+    latitude: float
+    longitude: float
+
+
+class MeasurementRecord(TypedDict):
+    value: float
+    unit: str
+
+
+class VibrationRecord(TypedDict):
+    x: float
+    y: float
+    z: float
+    magnitude: NotRequired[float]
+
+
+class LightRecord(TypedDict):
+    illumination: float
+
+
+class AirQualityRecord(TypedDict):
+    pm2_5: float
+    pm10: float
+    aqi: NotRequired[int]
+
+
+class AgentDataRecord(TypedDict):
+    user_id: int
+    accelerometer: AccelerometerRecord
+    gps: GpsRecord
+    temperature: MeasurementRecord
+    humidity: MeasurementRecord
+    vibration: VibrationRecord
+    light: LightRecord
+    air_quality: AirQualityRecord
+    timestamp: datetime
+
+
+class ChannelSummaryRecord(TypedDict):
+    mean: float
+    min: float
+    max: float
+    count: int
+
+
+class EnvironmentSummaryRecord(TypedDict):
+    window_start: datetime
+    window_seconds: float
+    temperature: ChannelSummaryRecord
+    humidity: ChannelSummaryRecord
+    illumination: ChannelSummaryRecord
+    pm2_5: ChannelSummaryRecord
+    pm10: ChannelSummaryRecord
+    aqi: NotRequired[Optional[ChannelSummaryRecord]]
+
+
+class ProcessedAgentDataRecord(TypedDict):
+    agent_data: AgentDataRecord
+    road_state: str
+    temp_status: NotRequired[str]
+    humidity_status: NotRequired[str]
+    vibration_status: NotRequired[str]
+    light_status: NotRequired[str]
+    air_quality_status: NotRequired[str]
+    environment: NotRequired[Optional[EnvironmentSummaryRecord]]
+
+
+processed_agent_data_record = TypeAdapter(ProcessedAgentDataRecord)
+# Batching edges send JSON arrays
+processed_agent_data_records = TypeAdapter(List[ProcessedAgentDataRecord])
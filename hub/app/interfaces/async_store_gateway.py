@@ -0,0 +1,27 @@
+from abc import ABC, abstractmethod
+from typing import List
+from app.entities.processed_agent_data import ProcessedAgentData
+
+
+class AsyncStoreGateway(ABC):
+    """
+    Abstract class representing the Store Gateway interface of the asyncio runtime.
+    All async store gateway adapters must implement these methods.
+    """
+
+    @abstractmethod
+    async def save_data(self, processed_agent_data_batch: List[ProcessedAgentData]) -> bool:
+        """
+        Method to save the processed agent data in the database.
+        Parameters:
+            processed_agent_data_batch (List[ProcessedAgentData]): The processed agent data to be saved.
+        Returns:
+            bool: True if the data is successfully saved, False otherwise.
+        """
+        pass
+
+    async def close(self):
+        """
+        Method to release the connections to the store.
+        """
+        pass
@@ -0,0 +1,117 @@
+from typing import Dict, List, NamedTuple, Tuple
+
+import numpy as np
+from scipy.signal import find_peaks
+
+from app.entities.processed_agent_data_columns import ProcessedAgentDataColumns
+
+# Defaults of the former whole-batch rescan, find_peaks(prominence=7000, width=3)
+PEAK_PROMINENCE = 7000
+PEAK_WIDTH = 3
+# Samples on each side of a peak find_peaks looks at, and so the delay of a label
+PEAK_HALF_WINDOW = 25
+
+
+class RoadTail(NamedTuple):
+    """What a vehicle's next batch needs from the previous ones"""
+    # Accelerometer z of the last labelled samples, up to half_window of them
+    context: List[float]
+    # Records waiting for half_window later samples before they are labelled
+    pending: ProcessedAgentDataColumns
+
+
+EMPTY_TAIL = RoadTail([], ProcessedAgentDataColumns.empty())
+
+
+def label_vehicle(
+    tail: RoadTail,
+    records: ProcessedAgentDataColumns,
+    prominence=PEAK_PROMINENCE,
+    width=PEAK_WIDTH,
+    half_window=PEAK_HALF_WINDOW,
+    final=False,
+) -> Tuple[ProcessedAgentDataColumns, RoadTail]:
+    """
+    Label road_state of one vehicle's records from bumps (peaks of
+    accelerometer z) and potholes (peaks of -z). find_peaks runs over the
+    tail and the records with a window of 2 * half_window + 1 samples, so a
+    sample's label only depends on the half_window samples on each side of
+    it. The last half_window records are held in the returned tail until
+    enough later samples came, and the labels do not depend on where the
+    batches were cut. `final` labels the held records too, as the end of the
+    vehicle's stream.
+    Returns:
+        The labelled records and the vehicle's new tail.
+    """
+    held = ProcessedAgentDataColumns.concatenate([tail.pending, records])
+    z = np.concatenate([np.asarray(tail.context, dtype=float), held["accelerometer_z"]])
+    labelled = len(held) if final else max(len(held) - half_window, 0)
+    if labelled:
+        held["road_state"][:labelled] = road_states(z, len(tail.context), labelled, prominence, width, half_window)
+    return held.take(slice(None, labelled)), RoadTail(
+        context_of(z, len(tail.context) + labelled, half_window), held.take(slice(labelled, None))
+    )
+
+
+def road_states(z: np.ndarray, first: int, count: int, prominence, width, half_window) -> np.ndarray:
+    """road_state of z[first:first + count], with the samples around them as context"""
+    wlen = 2 * half_window + 1
+    bumps, _ = find_peaks(z, prominence=prominence, width=width, wlen=wlen)
+    potholes, _ = find_peaks(-z, prominence=prominence, width=width, wlen=wlen)
+    states = np.full(len(z), "normal", dtype=object)
+    states[bumps] = "bump"
+    # A pothole wins over a bump, like in the former rescan
+    states[potholes] = "pothole"
+    return states[first:first + count]
+
+
+def context_of(z: np.ndarray, end: int, half_window) -> List[float]:
+    """The labelled samples the next batch of the vehicle needs before z[end]"""
+    return z[max(end - half_window, 0):end].tolist()
+
+
+def label_batch(
+    tails: Dict[int, RoadTail],
+    batch: ProcessedAgentDataColumns,
+    prominence=PEAK_PROMINENCE,
+    width=PEAK_WIDTH,
+    half_window=PEAK_HALF_WINDOW,
+) -> Tuple[ProcessedAgentDataColumns, Dict[int, RoadTail]]:
+    """
+    Split a batch by user_id and label every vehicle on its own with its tail
+    (EMPTY_TAIL for a vehicle without one). Records keep their order within a
+    vehicle, which must be the order they were measured in.
+    Returns:
+        The records whose label is final and the new tails of the batch's vehicles.
+    """
+    if not len(batch):
+        return batch, {}
+    # A stable sort groups the vehicles and keeps the order of each one's records
+    order = np.argsort(batch["user_id"], kind="stable")
+    user_ids, starts = np.unique(batch["user_id"][order], return_index=True)
+    vehicle_tails = [tails.get(user_id, EMPTY_TAIL) for user_id in user_ids.tolist()]
+    # The held records of the vehicles then the batch, columns are copied once
+    # and every vehicle works on row indices into them
+    combined = ProcessedAgentDataColumns.concatenate([tail.pending for tail in vehicle_tails] + [batch])
+    states = combined["road_state"]
+    batch_start = len(combined) - len(batch)
+    pending_start = 0
+    labelled_rows, held_rows, contexts = [], [], []
+    for tail, rows in zip(vehicle_tails, np.split(order, starts[1:])):
+        pending_end = pending_start + len(tail.pending)
+        held = np.concatenate([np.arange(pending_start, pending_end), rows + batch_start])
+        pending_start = pending_end
+        z = np.concatenate([np.asarray(tail.context, dtype=float), combined["accelerometer_z"][held]])
+        labelled = max(len(held) - half_window, 0)
+        if labelled:
+            states[held[:labelled]] = road_states(z, len(tail.context), labelled, prominence, width, half_window)
+        contexts.append(context_of(z, len(tail.context) + labelled, half_window))
+        labelled_rows.append(held[:labelled])
+        held_rows.append(held[labelled:])
+    held = combined.take(np.concatenate(held_rows))
+    new_tails = {}
+    end = 0
+    for user_id, context, rows in zip(user_ids.tolist(), contexts, held_rows):
+        new_tails[user_id] = RoadTail(context, held.take(slice(end, end + len(rows))))
+        end += len(rows)
+    return combined.take(np.concatenate(labelled_rows)), new_tails
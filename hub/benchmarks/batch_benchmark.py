@@ -0,0 +1,95 @@
+"""
+Per-record cost of the hub's batch step, from the documents claimed from
+Redis to the JSON posted to the store: the former path (one ProcessedAgentData
+per record, z gathered with map/lambda, rows labelled with `i in indices`)
+against ProcessedAgentDataColumns labelled per vehicle by vehicle_peaks.py.
+
+Run from the hub directory:
+    python benchmarks/batch_benchmark.py
+"""
+import json
+import os
+import random
+import sys
+import timeit
+
+import numpy as np
+from scipy.signal import find_peaks
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.entities.processed_agent_data import ProcessedAgentData  # noqa: E402
+from app.entities.processed_agent_data_columns import ProcessedAgentDataColumns  # noqa: E402
+from app.usecases.vehicle_peaks import label_batch  # noqa: E402
+
+VEHICLES = 10
+
+
+def document(rng, user_id):
+    return json.dumps(
+        {
+            "agent_data": {
+                "user_id": user_id,
+                "accelerometer": {"x": -112.0, "y": -318.0, "z": 16500 + rng.uniform(-9000, 9000)},
+                "gps": {"longitude": 30.52389376262598, "latitude": 50.450729742682526},
+                "temperature": {"value": 30.37, "unit": "C"},
+                "humidity": {"value": 30.22, "unit": "%"},
+                "vibration": {"x": -4.532, "y": 4.785, "z": 0.454, "magnitude": 6.606161139421291},
+                "light": {"illumination": 992.7},
+                "air_quality": {"pm2_5": 353.4, "pm10": 329.5, "aqi": 261},
+                "timestamp": "2024-02-21T12:34:56.123456Z",
+            },
+            "road_state": "normal",
+            "temp_status": "hot",
+            "humidity_status": "normal",
+            "vibration_status": "rough",
+            "light_status": "well-lit",
+            "air_quality_status": "poor",
+            "environment": None,
+        }
+    ).encode("utf-8")
+
+
+def model_path(documents):
+    batch = [ProcessedAgentData.model_validate_json(document) for document in documents]
+    z_values = list(map(lambda item: item.agent_data.accelerometer.z, batch))
+    bumps, _ = find_peaks(z_values, prominence=7000, width=3)
+    potholes, _ = find_peaks(list(map(lambda z: -z, z_values)), prominence=7000, width=3)
+    for i, processed in enumerate(batch):
+        processed.road_state = "normal"
+        if i in bumps:
+            processed.road_state = "bump"
+        if i in potholes:
+            processed.road_state = "pothole"
+    return json.dumps([processed.model_dump(mode="json") for processed in batch])
+
+
+def columns_path(documents):
+    labelled, _ = label_batch({}, ProcessedAgentDataColumns.from_documents(documents))
+    return labelled.to_json()
+
+
+def per_record_us(statement, records):
+    number = max(1, 20000 // records)
+    return min(timeit.repeat(statement, number=number, repeat=5)) / number / records * 1e6
+
+
+def main():
+    rng = random.Random(1)
+    print(f"{'batch':>6} {'models µs':>11} {'columns µs':>11}")
+    for size in (20, 200, 2000):
+        documents = [document(rng, rng.randrange(VEHICLES)) for _ in range(size)]
+        print(
+            f"{size:>6} {per_record_us(lambda: model_path(documents), size):>11.2f} "
+            f"{per_record_us(lambda: columns_path(documents), size):>11.2f}"
+        )
+    # The columns hold the same records
+    batch = ProcessedAgentDataColumns.from_documents(documents)
+    assert np.array_equal(
+        batch["accelerometer_z"],
+        [ProcessedAgentData.model_validate_json(d).agent_data.accelerometer.z for d in documents],
+    )
+
+
+if __name__ == "__main__":
+    main()
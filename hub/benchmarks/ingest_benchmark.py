@@ -0,0 +1,91 @@
+"""
+Per-record cost of validating processed records from the edge:
+ProcessedAgentData.model_validate_json(strict=True) against the plain-dict fast
+path of processed_agent_data_record.py, for single records and JSON arrays,
+including the serialization of what is queued in Redis.
+
+Run from the hub directory:
+    python benchmarks/ingest_benchmark.py
+"""
+import json
+import os
+import sys
+import timeit
+from typing import List
+
+from pydantic import TypeAdapter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.entities.processed_agent_data import ProcessedAgentData  # noqa: E402
+from app.entities.processed_agent_data_record import (  # noqa: E402
+    processed_agent_data_record,
+    processed_agent_data_records,
+)
+
+RECORD = {
+    "agent_data": {
+        "user_id": 7,
+        "accelerometer": {"x": -112.0, "y": -318.0, "z": 16533.0},
+        "gps": {"longitude": 30.52389376262598, "latitude": 50.450729742682526},
+        "temperature": {"value": 30.37, "unit": "C"},
+        "humidity": {"value": 30.22, "unit": "%"},
+        "vibration": {"x": -4.532, "y": 4.785, "z": 0.454, "magnitude": 6.606161139421291},
+        "light": {"illumination": 992.7},
+        "air_quality": {"pm2_5": 353.4, "pm10": 329.5, "aqi": 261},
+        "timestamp": "2024-02-21T12:34:56.123456",
+    },
+    "road_state": "normal",
+    "temp_status": "hot",
+    "humidity_status": "normal",
+    "vibration_status": "rough",
+    "light_status": "well-lit",
+    "air_quality_status": "poor",
+    "environment": None,
+}
+
+
+def per_record_us(statement, records):
+    number = max(1, 20000 // records)
+    return min(timeit.repeat(statement, number=number, repeat=5)) / number / records * 1e6
+
+
+def main():
+    single = json.dumps(RECORD).encode("utf-8")
+    array = json.dumps([RECORD] * 100).encode("utf-8")
+    models = TypeAdapter(List[ProcessedAgentData])
+
+    # Both paths must queue records the batch step reads back identically
+    fast = processed_agent_data_record.dump_json(
+        processed_agent_data_record.validate_json(single, strict=True)
+    )
+    assert ProcessedAgentData.model_validate_json(fast) == ProcessedAgentData.model_validate_json(single)
+
+    rows = [
+        (
+            "single",
+            1,
+            lambda: ProcessedAgentData.model_validate_json(single, strict=True).model_dump_json(),
+            # A single record is queued as received
+            lambda: processed_agent_data_record.validate_json(single, strict=True),
+        ),
+        (
+            "array of 100",
+            100,
+            lambda: [m.model_dump_json() for m in models.validate_json(array, strict=True)],
+            lambda: [
+                processed_agent_data_record.dump_json(r)
+                for r in processed_agent_data_records.validate_json(array, strict=True)
+            ],
+        ),
+    ]
+    print(f"{'payload':>14} {'models µs':>11} {'dicts µs':>10}")
+    for name, records, model_path, fast_path in rows:
+        print(
+            f"{name:>14} {per_record_us(model_path, records):>11.2f} "
+            f"{per_record_us(fast_path, records):>10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -12,6 +12,10 @@ def try_parse_int(value: str):
 STORE_API_HOST = os.environ.get("STORE_API_HOST") or "localhost"
 STORE_API_PORT = try_parse_int(os.environ.get("STORE_API_PORT")) or 8000
 STORE_API_BASE_URL = f"http://{STORE_API_HOST}:{STORE_API_PORT}"
+# Store requests in flight at most
+STORE_API_MAX_CONCURRENCY = try_parse_int(os.environ.get("STORE_API_MAX_CONCURRENCY")) or 4
+# Gzip the batches posted to the Store API
+STORE_API_COMPRESS = os.environ.get("STORE_API_COMPRESS") == "1"
 
 # Configure for Redis
 REDIS_HOST = os.environ.get("REDIS_HOST") or "localhost"
@@ -19,6 +23,26 @@ REDIS_PORT = try_parse_int(os.environ.get("REDIS_PORT")) or 6379
 
 # Configure for hub logic
 BATCH_SIZE = try_parse_int(os.environ.get("BATCH_SIZE")) or 20
+# Milliseconds a record waits in Redis at most before a smaller batch is stored
+BATCH_LINGER_MS = try_parse_int(os.environ.get("BATCH_LINGER_MS")) or 1000
+# Bounds of the adaptive batch size, both default to BATCH_SIZE (a fixed size)
+BATCH_MIN_SIZE = try_parse_int(os.environ.get("BATCH_MIN_SIZE")) or BATCH_SIZE
+BATCH_MAX_SIZE = try_parse_int(os.environ.get("BATCH_MAX_SIZE")) or BATCH_SIZE
+# Seconds between batch size and queue wait reports in the log (0 disables them)
+BATCH_REPORT_INTERVAL = try_parse_int(os.environ.get("BATCH_REPORT_INTERVAL")) or 0
+# Keep claimed batches in Redis until they are stored, and requeue them if they are not
+REDIS_RELIABLE_QUEUE = os.environ.get("REDIS_RELIABLE_QUEUE") == "1"
+# Seconds before a claimed but unstored batch is requeued
+REDIS_CLAIM_TIMEOUT = try_parse_int(os.environ.get("REDIS_CLAIM_TIMEOUT")) or 60
+# Peaks of accelerometer z labelled bumps (and of -z potholes), see app/usecases/vehicle_peaks.py
+PEAK_PROMINENCE = try_parse_int(os.environ.get("PEAK_PROMINENCE")) or 7000
+PEAK_WIDTH = try_parse_int(os.environ.get("PEAK_WIDTH")) or 3
+# Samples of the same vehicle on each side of a peak, records wait for as many before they are stored
+PEAK_WINDOW = try_parse_int(os.environ.get("PEAK_WINDOW")) or 25
+# Seconds after which the records held for an idle vehicle are labelled and stored
+PEAK_IDLE_FLUSH = try_parse_int(os.environ.get("PEAK_IDLE_FLUSH")) or 5
+# Keep the road_state of edges running EDGE_ROAD_DETECTOR=peaks instead of rescanning batches
+TRUST_EDGE_ROAD_STATE = os.environ.get("TRUST_EDGE_ROAD_STATE") == "1"
 
 # MQTT
 MQTT_BROKER_HOST = os.environ.get("MQTT_BROKER_HOST") or "localhost"
@@ -1,18 +1,46 @@
+import asyncio
+import gzip
 import logging
-from typing import List
+import threading
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional, Tuple, Union
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response
+from fastapi.exceptions import RequestValidationError
+from fastapi.routing import APIRoute
+from starlette.concurrency import run_in_threadpool
+from pydantic import ValidationError
 from redis import Redis
 import paho.mqtt.client as mqtt
-import scipy
 
-from app.adapters.store_api_adapter import StoreApiAdapter
-from app.entities.processed_agent_data import ProcessedAgentData
+from app.adapters import binary_codec
+from app.adapters.redis_batch_queue import Claim, LingerFlusher, RedisBatchQueue
+from app.adapters.redis_road_tails import RedisRoadTails
+from app.adapters.async_store_api_adapter import AsyncStoreApiAdapter
+from app.entities.processed_agent_data_columns import ProcessedAgentDataColumns
+from app.entities.processed_agent_data_record import (
+    processed_agent_data_record,
+    processed_agent_data_records,
+)
+from app.usecases.vehicle_peaks import RoadTail, label_batch, label_vehicle
 from config import (
     STORE_API_BASE_URL,
+    STORE_API_MAX_CONCURRENCY,
+    STORE_API_COMPRESS,
     REDIS_HOST,
     REDIS_PORT,
     BATCH_SIZE,
+    BATCH_LINGER_MS,
+    BATCH_MIN_SIZE,
+    BATCH_MAX_SIZE,
+    BATCH_REPORT_INTERVAL,
+    REDIS_RELIABLE_QUEUE,
+    REDIS_CLAIM_TIMEOUT,
+    PEAK_PROMINENCE,
+    PEAK_WIDTH,
+    PEAK_WINDOW,
+    PEAK_IDLE_FLUSH,
+    TRUST_EDGE_ROAD_STATE,
     MQTT_TOPIC,
     MQTT_BROKER_HOST,
     MQTT_BROKER_PORT,
@@ -29,55 +57,184 @@ logging.basicConfig(
 )
 # Create an instance of the Redis using the configuration
 redis_client = Redis(host=REDIS_HOST, port=REDIS_PORT)
-# Create an instance of the StoreApiAdapter using the configuration
-store_adapter = StoreApiAdapter(api_base_url=STORE_API_BASE_URL)
+# Received records wait in a Redis list until a batch of them is due
+agent_data_queue = RedisBatchQueue(
+    redis_client,
+    key="agent_data",
+    batch_size=BATCH_SIZE,
+    reliable=REDIS_RELIABLE_QUEUE,
+    claim_timeout=REDIS_CLAIM_TIMEOUT,
+    linger=BATCH_LINGER_MS / 1000,
+    min_batch_size=BATCH_MIN_SIZE,
+    max_batch_size=BATCH_MAX_SIZE,
+    report_every=BATCH_REPORT_INTERVAL,
+)
+# Each vehicle's last samples and the records waiting for later ones
+road_tails = RedisRoadTails(redis_client)
+# Held while a batch is labelled and stored, see road_tails_lock()
+_road_tails_lock = None
+# Store requests run on an event loop of their own, shared by the MQTT thread,
+# the linger flusher and the HTTP handlers, so none of them blocks the FastAPI loop
+store_loop = asyncio.new_event_loop()
+threading.Thread(target=store_loop.run_forever, name="store-loop", daemon=True).start()
+# Create an instance of the AsyncStoreApiAdapter using the configuration
+store_adapter = AsyncStoreApiAdapter(
+    api_base_url=STORE_API_BASE_URL,
+    max_concurrency=STORE_API_MAX_CONCURRENCY,
+    compress=STORE_API_COMPRESS,
+)
 # Create an instance of the AgentMQTTAdapter using the configuration
 
+class GzipRequest(Request):
+    """Request whose body is transparently decompressed when it is gzipped"""
+
+    async def body(self) -> bytes:
+        if not hasattr(self, "_body"):
+            body = await super().body()
+            if "gzip" in self.headers.getlist("Content-Encoding"):
+                body = gzip.decompress(body)
+            self._body = body
+        return self._body
+
+
+class GzipRoute(APIRoute):
+    def get_route_handler(self) -> Callable:
+        original_route_handler = super().get_route_handler()
+
+        async def custom_route_handler(request: Request) -> Response:
+            request = GzipRequest(request.scope, request.receive)
+            return await original_route_handler(request)
+
+        return custom_route_handler
+
+
 # FastAPI
 app = FastAPI()
+app.router.route_class = GzipRoute
 
 
 @app.post("/agent_data/")
-async def process_and_save_agent_data(agent_data: ProcessedAgentData):
-    redis_client.lpush("agent_data", agent_data.model_dump_json())
-    if redis_client.llen("agent_data") >= BATCH_SIZE:
-        agent_data_batch: List[ProcessedAgentData] = []
-        for _ in range(BATCH_SIZE):
-            agent_data = ProcessedAgentData.model_validate_json(
-                redis_client.lpop("agent_data")
-            )
-            agent_data_batch.append(agent_data)
-        
-        processed_data_batch = process_agent_data(agent_data_batch)
-        store_adapter.save_data(processed_data_batch=processed_data_batch)
+async def process_and_save_agent_data(request: Request):
+    """One processed record, or a batch of them as a JSON array (optionally gzipped)"""
+    try:
+        received = parse_records(await request.body())
+    except ValidationError as e:
+        raise RequestValidationError(e.errors())
+    # Redis round trips block, they run in a thread like the store requests do
+    for saved in await run_in_threadpool(save_received, received):
+        await asyncio.wrap_future(saved)
     return {"status": "ok"}
 
-def process_agent_data(agent_data_batch: List[ProcessedAgentData]):
-    processed_data_batch = []
-    
-    z_values = list(map(lambda item: item.agent_data.accelerometer.z, agent_data_batch))
-    bumps_indices, _ = scipy.signal.find_peaks(z_values, prominence=7000, width=3)
-    bumps = list(map(
-        lambda i: agent_data_batch[i].agent_data.gps,
-        bumps_indices
-    ))
-        
-    inverted_z_values = list(map(lambda z: -z, z_values))
-    potholes_indices, _ = scipy.signal.find_peaks(inverted_z_values, prominence=7000, width=3)
-    
-    for i, val in enumerate(agent_data_batch):
-        road_state = "normal"
-        if i in bumps_indices:
-            road_state = "bump"
-        if i in potholes_indices:
-            road_state = "pothole"
-
-        processed_data = agent_data_batch[i]
-        processed_data.road_state = road_state
-
-        processed_data_batch.append(processed_data)
-    
-    return processed_data_batch
+
+def parse_records(payload: Union[bytes, str], strict=False) -> List[Union[bytes, str]]:
+    """
+    Validate a JSON record or array of records and return the JSON documents
+    to queue. This is the fast path of processed_agent_data_record.py, no
+    model objects are built, and a single record is queued as it was received.
+    """
+    if payload.lstrip()[:1] in (b"[", "["):
+        records = processed_agent_data_records.validate_json(payload, strict=strict)
+        return [processed_agent_data_record.dump_json(record) for record in records]
+    processed_agent_data_record.validate_json(payload, strict=strict)
+    return [payload]
+
+
+def save_received(documents: List[Union[bytes, str]]) -> List[Future]:
+    """Queue received records in Redis and start storing the batches that are due"""
+    saving = []
+    claim = agent_data_queue.push_and_claim(documents)
+    while claim is not None:
+        saving.append(store_claim(claim))
+        # A frame may have completed several batches
+        claim = agent_data_queue.claim() if agent_data_queue.pending >= agent_data_queue.batch_size else None
+    return saving
+
+
+def store_claim(claim: Claim) -> Future:
+    """Store a claimed batch on the store loop"""
+    return asyncio.run_coroutine_threadsafe(save_batch(claim), store_loop)
+
+
+async def save_batch(claim: Claim):
+    if TRUST_EDGE_ROAD_STATE:
+        # Nothing to relabel, the queued documents are posted as they are
+        saved = await store_adapter.save_documents(claim.documents)
+    else:
+        saved = await save_labelled(claim.documents)
+    if saved:
+        await run_in_threadpool(agent_data_queue.ack, claim)
+    elif claim.key is not None:
+        logging.info(f"Batch {claim.key} not stored, it is requeued in {REDIS_CLAIM_TIMEOUT}s")
+
+
+async def save_labelled(documents: List[Union[bytes, str]]) -> bool:
+    """
+    Label a batch and store it. The vehicles' new tails are only saved once
+    the store has the records: a batch that was not stored is relabelled from
+    the same tails when its claim comes back (REDIS_RELIABLE_QUEUE), and the
+    held records it released stay held. The next batch of a vehicle needs those tails, so
+    labelled batches are stored one at a time.
+    """
+    async with road_tails_lock():
+        body, tails = await run_in_threadpool(label_road_state, documents)
+        # Every record may be waiting for later samples of its vehicle
+        saved = await store_adapter.save_json(body) if body is not None else True
+        if saved:
+            await run_in_threadpool(road_tails.save, tails)
+        return saved
+
+
+def road_tails_lock() -> asyncio.Lock:
+    """
+    The lock of the road tails, created on the store loop on first use:
+    asyncio locks of Python 3.9 bind to the loop they are created on.
+    """
+    global _road_tails_lock
+    if _road_tails_lock is None:
+        _road_tails_lock = asyncio.Lock()
+    return _road_tails_lock
+
+
+def label_road_state(documents: List[Union[bytes, str]]) -> Tuple[Optional[bytes], Dict[int, RoadTail]]:
+    """
+    Label the batch per vehicle, carrying every vehicle's tail over from its
+    previous batches.
+    Returns:
+        The Store API body of the records whose label is final, None if there
+        are none, and the new tails of the batch's vehicles.
+    """
+    batch = ProcessedAgentDataColumns.from_documents(documents)
+    tails = road_tails.load(set(batch["user_id"].tolist()))
+    labelled, tails = label_batch(tails, batch, PEAK_PROMINENCE, PEAK_WIDTH, PEAK_WINDOW)
+    return labelled.to_json() if len(labelled) else None, tails
+
+
+def release_idle_road_tails() -> Tuple[List[int], Optional[bytes]]:
+    """The vehicles that stopped sending and the Store API body of their held records"""
+    user_ids = road_tails.idle(PEAK_IDLE_FLUSH)
+    released = ProcessedAgentDataColumns.concatenate(
+        label_vehicle(
+            tail, ProcessedAgentDataColumns.empty(), PEAK_PROMINENCE, PEAK_WIDTH, PEAK_WINDOW, final=True
+        )[0]
+        for tail in road_tails.load(user_ids).values()
+    )
+    return user_ids, released.to_json() if len(released) else None
+
+
+async def flush_idle_road_tails():
+    """Label and store the records held for vehicles that stopped sending"""
+    while True:
+        await asyncio.sleep(PEAK_IDLE_FLUSH)
+        try:
+            async with road_tails_lock():
+                user_ids, body = await run_in_threadpool(release_idle_road_tails)
+                # The tails are dropped once the store has their records, like in save_labelled
+                if body is not None and not await store_adapter.save_json(body):
+                    logging.error(f"Records of idle vehicles {user_ids} not stored, retrying")
+                    continue
+                await run_in_threadpool(road_tails.drop, user_ids)
+        except Exception as e:
+            logging.error(f"Error flushing idle vehicles: {e}")
 
 
 # MQTT
@@ -87,32 +244,27 @@ client = mqtt.Client()
 def on_connect(client, userdata, flags, rc):
     if rc == 0:
         logging.info("Connected to MQTT broker")
-        client.subscribe(MQTT_TOPIC)
+        # QoS 1 so batches the edge published at QoS 1 are not downgraded on the way here
+        client.subscribe(MQTT_TOPIC, qos=1)
     else:
         logging.info(f"Failed to connect to MQTT broker with code: {rc}")
 
 
 def on_message(client, userdata, msg):
     try:
-        payload: str = msg.payload.decode("utf-8")
-        # Create ProcessedAgentData instance with the received data
-        agent_data = ProcessedAgentData.model_validate_json(
-            payload, strict=True
-        )
-
-        redis_client.lpush(
-            "agent_data", agent_data.model_dump_json()
-        )
-        agent_data_batch: List[ProcessedAgentData] = []
-        if redis_client.llen("agent_data") >= BATCH_SIZE:
-            for _ in range(BATCH_SIZE):
-                agent_data = ProcessedAgentData.model_validate_json(
-                    redis_client.lpop("agent_data")
-                )
-                agent_data_batch.append(agent_data)
-
-            processed_data_batch = process_agent_data(agent_data_batch)
-            store_adapter.save_data(processed_data_batch=processed_data_batch)
+        # Validate the received records, they are only queued until a batch is due
+        if binary_codec.is_binary(msg.payload):
+            _, records = binary_codec.decode_frame(msg.payload)
+            received = [
+                processed_agent_data_record.dump_json(record)
+                for record in processed_agent_data_records.validate_python(records, strict=True)
+            ]
+        else:
+            received = parse_records(msg.payload, strict=True)
+
+        # Waiting for the store holds back further messages while it is behind
+        for saved in save_received(received):
+            saved.result()
         return {"status": "ok"}
     except Exception as e:
         logging.info(f"Error processing MQTT message: {e}")
@@ -125,3 +277,7 @@ client.connect(MQTT_BROKER_HOST, MQTT_BROKER_PORT)
 
 # Start
 client.loop_start()
+# Stores the records of quiet periods, which never fill a batch
+LingerFlusher(agent_data_queue, lambda claim: store_claim(claim).result()).start()
+if not TRUST_EDGE_ROAD_STATE:
+    asyncio.run_coroutine_threadsafe(flush_idle_road_tails(), store_loop)
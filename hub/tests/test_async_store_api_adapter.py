@@ -0,0 +1,92 @@
+import asyncio
+import gzip
+import json
+import unittest
+from unittest.mock import patch
+
+import httpx
+
+from app.adapters.async_store_api_adapter import AsyncStoreApiAdapter
+from app.entities.processed_agent_data import ProcessedAgentData
+
+
+class TestAsyncStoreApiAdapter(unittest.TestCase):
+    def setUp(self):
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.status_code = 200
+
+    async def handle(self, request: httpx.Request):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        self.requests.append(request)
+        return httpx.Response(self.status_code, json={"status": "ok"})
+
+    def run_adapter(self, adapter, *saves):
+        client = httpx.AsyncClient
+
+        async def run():
+            with patch.object(
+                httpx, "AsyncClient", lambda **options: client(transport=httpx.MockTransport(self.handle), **options)
+            ):
+                results = await asyncio.gather(*(save(adapter) for save in saves))
+            await adapter.close()
+            return results
+
+        return asyncio.run(run())
+
+    def processed_data(self, user_id):
+        return ProcessedAgentData.model_validate(
+            {
+                "road_state": "normal",
+                "agent_data": {
+                    "user_id": user_id,
+                    "accelerometer": {"x": 0.1, "y": 0.2, "z": 0.3},
+                    "gps": {"latitude": 10.123, "longitude": 20.456},
+                    "temperature": {"value": 21.5, "unit": "C"},
+                    "humidity": {"value": 40.0, "unit": "%"},
+                    "vibration": {"x": 0.0, "y": 0.0, "z": 0.1, "magnitude": 0.1},
+                    "light": {"illumination": 300.0},
+                    "air_quality": {"pm2_5": 8.0, "pm10": 15.0, "aqi": 30},
+                    "timestamp": "2023-07-21T12:34:56Z",
+                },
+            }
+        )
+
+    def test_save_data_posts_one_json_array(self):
+        adapter = AsyncStoreApiAdapter("http://test-api.com")
+        batch = [self.processed_data(1), self.processed_data(2)]
+        self.assertEqual(self.run_adapter(adapter, lambda a: a.save_data(batch)), [True])
+        request = self.requests[0]
+        self.assertEqual(str(request.url), "http://test-api.com/processed_agent_data/")
+        records = json.loads(request.content)
+        self.assertEqual([record["agent_data"]["user_id"] for record in records], [1, 2])
+        self.assertEqual(records[0]["agent_data"]["timestamp"], "2023-07-21T12:34:56Z")
+        # The models are not touched by serializing them
+        self.assertNotIsInstance(batch[0].agent_data.timestamp, str)
+
+    def test_documents_are_posted_as_they_are_and_gzipped(self):
+        adapter = AsyncStoreApiAdapter("http://test-api.com", compress=True)
+        documents = [b'{"road_state": "bump"}', '{"road_state": "normal"}']
+        self.assertEqual(self.run_adapter(adapter, lambda a: a.save_documents(documents)), [True])
+        request = self.requests[0]
+        self.assertEqual(request.headers["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(request.content), b'[{"road_state": "bump"},{"road_state": "normal"}]')
+
+    def test_requests_in_flight_are_limited(self):
+        adapter = AsyncStoreApiAdapter("http://test-api.com", max_concurrency=2)
+        saves = [lambda a: a.save_documents([b"{}"])] * 6
+        self.assertEqual(self.run_adapter(adapter, *saves), [True] * 6)
+        self.assertEqual(self.max_in_flight, 2)
+
+    def test_save_data_failure(self):
+        self.status_code = 500
+        adapter = AsyncStoreApiAdapter("http://test-api.com")
+        self.assertEqual(self.run_adapter(adapter, lambda a: a.save_data([self.processed_data(1)])), [False])
+
+
+if __name__ == "__main__":
+    unittest.main()
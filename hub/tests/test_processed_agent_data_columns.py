@@ -0,0 +1,71 @@
+import json
+import unittest
+
+from app.entities.processed_agent_data import ProcessedAgentData
+from app.entities.processed_agent_data_columns import ProcessedAgentDataColumns
+from app.entities.processed_agent_data_record import processed_agent_data_record
+
+RECORD = {
+    "agent_data": {
+        "user_id": 7,
+        "accelerometer": {"x": -112.0, "y": -318.0, "z": 16533.0},
+        "gps": {"longitude": 30.52389376262598, "latitude": 50.450729742682526},
+        "temperature": {"value": 30.37, "unit": "C"},
+        "humidity": {"value": 30.22, "unit": "%"},
+        "vibration": {"x": -4.532, "y": 4.785, "z": 0.454, "magnitude": 6.606161139421291},
+        "light": {"illumination": 992.7},
+        "air_quality": {"pm2_5": 353.4, "pm10": 329.5, "aqi": 261},
+        "timestamp": "2024-02-21T12:34:56.123456Z",
+    },
+    "road_state": "normal",
+    "temp_status": "hot",
+    "humidity_status": "normal",
+    "vibration_status": "rough",
+    "light_status": "well-lit",
+    "air_quality_status": "poor",
+}
+
+
+class TestProcessedAgentDataColumns(unittest.TestCase):
+    def setUp(self):
+        summary = {"mean": 30.0, "min": 29.0, "max": 31.0, "count": 12}
+        windowed = json.loads(json.dumps(RECORD))
+        windowed["agent_data"]["user_id"] = 8
+        windowed["environment"] = {
+            "window_start": "2024-02-21T12:34:00Z",
+            "window_seconds": 60.0,
+            **{channel: summary for channel in ("temperature", "humidity", "illumination", "pm2_5", "pm10")},
+            "aqi": None,
+        }
+        sparse = json.loads(json.dumps(RECORD))
+        del sparse["agent_data"]["vibration"]["magnitude"]
+        del sparse["agent_data"]["air_quality"]["aqi"]
+        del sparse["temp_status"]
+        # Queued the way the hub queues records
+        self.documents = [
+            processed_agent_data_record.dump_json(processed_agent_data_record.validate_python(record))
+            for record in (RECORD, windowed, sparse)
+        ]
+
+    def test_store_json_matches_the_models(self):
+        batch = ProcessedAgentDataColumns.from_documents(self.documents)
+        self.assertEqual(batch["user_id"].tolist(), [7, 8, 7])
+        self.assertEqual(batch["accelerometer_z"].dtype.kind, "f")
+        expected = [
+            ProcessedAgentData.model_validate_json(document).model_dump(mode="json")
+            for document in self.documents
+        ]
+        self.assertEqual(json.loads(batch.to_json()), expected)
+
+    def test_take_and_concatenate(self):
+        batch = ProcessedAgentDataColumns.from_documents(self.documents)
+        rows = batch.take(batch["user_id"] == 7)
+        rows["road_state"][:] = "bump"
+        self.assertEqual(batch["road_state"].tolist(), ["normal"] * 3)
+        joined = ProcessedAgentDataColumns.concatenate([rows, ProcessedAgentDataColumns.empty(), batch.take([1])])
+        self.assertEqual(joined["road_state"].tolist(), ["bump", "bump", "normal"])
+        self.assertEqual([record["agent_data"]["user_id"] for record in joined.to_records()], [7, 7, 8])
+
+
+if __name__ == "__main__":
+    unittest.main()
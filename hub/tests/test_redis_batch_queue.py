@@ -0,0 +1,115 @@
+import threading
+import unittest
+from unittest.mock import patch
+
+from app.adapters.redis_batch_queue import LingerFlusher, RedisBatchQueue
+
+try:
+    # The queue runs Lua scripts, fakeredis needs the lua extra for them
+    import fakeredis
+    import lupa  # noqa: F401
+except ImportError:
+    fakeredis = None
+
+
+@unittest.skipUnless(fakeredis, "needs fakeredis[lua]")
+class TestRedisBatchQueue(unittest.TestCase):
+    def setUp(self):
+        self.redis = fakeredis.FakeRedis()
+
+    def test_batches_come_out_in_fifo_order(self):
+        queue = RedisBatchQueue(self.redis, batch_size=3)
+        self.assertIsNone(queue.push_and_claim([b"1", b"2"]))
+        claim = queue.push_and_claim([b"3", b"4"])
+        self.assertEqual(claim.documents, [b"1", b"2", b"3"])
+        self.assertEqual(queue.pending, 1)
+        self.assertIsNone(queue.claim())
+        self.assertEqual(self.redis.lrange("agent_data", 0, -1), [b"4"])
+
+    def test_a_frame_can_complete_several_batches(self):
+        queue = RedisBatchQueue(self.redis, batch_size=2)
+        claim = queue.push_and_claim([b"1", b"2", b"3", b"4", b"5"])
+        self.assertEqual(claim.documents, [b"1", b"2"])
+        self.assertEqual(queue.pending, 3)
+        self.assertEqual(queue.claim().documents, [b"3", b"4"])
+        self.assertIsNone(queue.claim())
+
+    def test_plain_claims_leave_nothing_behind(self):
+        queue = RedisBatchQueue(self.redis, batch_size=2)
+        claim = queue.push_and_claim([b"1", b"2"])
+        self.assertIsNone(claim.key)
+        queue.ack(claim)
+        self.assertEqual(self.redis.keys("*"), [])
+
+    def test_reliable_claim_is_kept_until_acked(self):
+        queue = RedisBatchQueue(self.redis, batch_size=2, reliable=True)
+        claim = queue.push_and_claim([b"1", b"2"])
+        self.assertEqual(self.redis.lrange(claim.key, 0, -1), [b"1", b"2"])
+        self.assertEqual(self.redis.zrange(queue.claims_key, 0, -1), [claim.key.encode()])
+        queue.ack(claim)
+        self.assertEqual(self.redis.keys("*"), [])
+
+    def test_stale_claims_are_requeued_at_the_head(self):
+        queue = RedisBatchQueue(self.redis, batch_size=2, reliable=True, claim_timeout=60)
+        with patch("time.time", return_value=1000.0):
+            first = queue.push_and_claim([b"1", b"2"])
+            second = queue.push_and_claim([b"3", b"4"])
+            queue.ack(second)
+            queue.push_and_claim([b"5"])
+        with patch("time.time", return_value=1059.0):
+            self.assertIsNone(queue.claim())
+        with patch("time.time", return_value=1060.0):
+            # The hub died with the first batch, it comes back before 5
+            claim = queue.push_and_claim([b"6"])
+        self.assertEqual(claim.documents, [b"1", b"2"])
+        self.assertNotEqual(claim.key, first.key)
+        self.assertEqual(self.redis.lrange("agent_data", 0, -1), [b"5", b"6"])
+        self.assertFalse(self.redis.exists(first.key))
+        self.assertEqual(claim.arrivals, [1000.0, 1000.0])
+
+    def test_lingering_documents_are_claimed_in_a_smaller_batch(self):
+        queue = RedisBatchQueue(self.redis, batch_size=10, linger=0.5)
+        with patch("time.time", return_value=1000.0):
+            queue.push_and_claim([b"1", b"2"])
+        with patch("time.time", return_value=1000.25):
+            queue.push_and_claim([b"3"])
+            self.assertEqual(queue.next_deadline(), 0.25)
+        with patch("time.time", return_value=1000.5):
+            claim = queue.claim()
+        self.assertEqual(claim.documents, [b"1", b"2", b"3"])
+        self.assertEqual(queue.stats()["wait_p99_ms"], 500.0)
+
+    def test_batch_size_adapts_to_the_traffic(self):
+        queue = RedisBatchQueue(self.redis, batch_size=4, linger=1, min_batch_size=2, max_batch_size=16)
+        with patch("time.time", return_value=1000.0):
+            # Backlog: the batches double up to the maximum
+            queue.push_and_claim([b"x"] * 40)
+            self.assertEqual(queue.batch_size, 8)
+            self.assertEqual(len(queue.claim().documents), 8)
+            self.assertEqual(queue.batch_size, 16)
+            self.assertEqual(len(queue.claim().documents), 16)
+            self.assertEqual(queue.batch_size, 16)
+            self.assertIsNone(queue.claim())
+        with patch("time.time", return_value=1001.0):
+            # Quiet: the size drops to what came within the linger
+            self.assertEqual(len(queue.claim().documents), 12)
+            self.assertEqual(queue.batch_size, 12)
+            queue.push_and_claim([b"x"])
+        with patch("time.time", return_value=1002.0):
+            queue.claim()
+        self.assertEqual(queue.batch_size, 2)
+        self.assertEqual(queue.stats()["batch_size"], 2)
+
+    def test_flusher_claims_lingering_batches(self):
+        queue = RedisBatchQueue(self.redis, batch_size=10, linger=0.05)
+        flushed = threading.Event()
+        flusher = LingerFlusher(queue, lambda claim: flushed.set())
+        flusher.start()
+        queue.push_and_claim([b"1"])
+        self.assertTrue(flushed.wait(2))
+        flusher.stop(2)
+        self.assertEqual(self.redis.llen("agent_data"), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+import random
+import unittest
+
+import numpy as np
+from scipy.signal import find_peaks
+
+from app.entities.processed_agent_data_columns import ProcessedAgentDataColumns
+from app.usecases.vehicle_peaks import EMPTY_TAIL, label_batch, label_vehicle
+
+
+def record(user_id, z):
+    return {
+        "road_state": "unknown",
+        "agent_data": {
+            "user_id": user_id,
+            "accelerometer": {"x": 0.0, "y": 0.0, "z": z},
+            "gps": {"latitude": 50.45, "longitude": 30.52},
+            "temperature": {"value": 21.5, "unit": "C"},
+            "humidity": {"value": 40.0, "unit": "%"},
+            "vibration": {"x": 0.0, "y": 0.0, "z": 0.1, "magnitude": 0.1},
+            "light": {"illumination": 300.0},
+            "air_quality": {"pm2_5": 8.0, "pm10": 15.0, "aqi": 30},
+            "timestamp": "2023-07-21T12:34:56Z",
+        },
+    }
+
+
+def road(rng, length):
+    """Gravity with noise, a few bumps and potholes a few samples wide"""
+    z = [16500 + rng.uniform(-300, 300) for _ in range(length)]
+    for _ in range(length // 40):
+        center = rng.randrange(3, length - 3)
+        sign = rng.choice((1, -1))
+        for offset, factor in ((-2, 0.4), (-1, 0.8), (0, 1), (1, 0.8), (2, 0.4)):
+            z[center + offset] += sign * factor * rng.uniform(8000, 15000)
+    return z
+
+
+def expected_states(z, half_window):
+    """find_peaks over the whole stream of a vehicle at once"""
+    z = np.array(z)
+    wlen = 2 * half_window + 1
+    states = ["normal"] * len(z)
+    for i in find_peaks(z, prominence=7000, width=3, wlen=wlen)[0]:
+        states[i] = "bump"
+    for i in find_peaks(-z, prominence=7000, width=3, wlen=wlen)[0]:
+        states[i] = "pothole"
+    return states
+
+
+class TestVehiclePeaks(unittest.TestCase):
+    def test_labels_do_not_depend_on_batches(self):
+        rng = random.Random(7)
+        streams = {user_id: road(rng, 400) for user_id in (1, 2, 3)}
+        # Interleave the vehicles' records like a shared queue does
+        positions = {user_id: 0 for user_id in streams}
+        interleaved = []
+        while any(positions[user_id] < len(z) for user_id, z in streams.items()):
+            user_id = rng.choice([u for u in streams if positions[u] < len(streams[u])])
+            interleaved.append(record(user_id, streams[user_id][positions[user_id]]))
+            positions[user_id] += 1
+
+        tails = {}
+        labelled = []
+        start = 0
+        while start < len(interleaved):
+            size = rng.randint(1, 60)
+            batch = ProcessedAgentDataColumns.from_records(interleaved[start:start + size])
+            done, new_tails = label_batch(tails, batch, half_window=10)
+            tails.update(new_tails)
+            labelled.append(done)
+            start += size
+        for tail in tails.values():
+            done, _ = label_vehicle(tail, ProcessedAgentDataColumns.empty(), half_window=10, final=True)
+            labelled.append(done)
+        labelled = ProcessedAgentDataColumns.concatenate(labelled)
+
+        self.assertEqual(len(labelled), len(interleaved))
+        for user_id, z in streams.items():
+            states = labelled["road_state"][labelled["user_id"] == user_id].tolist()
+            expected = expected_states(z, 10)
+            self.assertEqual(states, expected)
+            self.assertIn("bump", expected)
+            self.assertIn("pothole", expected)
+
+    def test_records_wait_for_later_samples(self):
+        z = [16500.0] * 5 + [25000.0, 35000.0, 40000.0, 35000.0, 25000.0] + [16500.0] * 5
+        records = ProcessedAgentDataColumns.from_records([record(1, value) for value in z])
+        labelled, tail = label_vehicle(EMPTY_TAIL, records.take(slice(None, 10)), half_window=3)
+        # The bump at 7 needs 3 samples after it
+        self.assertEqual(len(labelled), 7)
+        self.assertEqual(len(tail.pending), 3)
+        self.assertEqual(tail.context, z[4:7])
+        labelled, tail = label_vehicle(tail, records.take(slice(10, None)), half_window=3)
+        self.assertEqual(labelled["road_state"].tolist(), ["bump", "normal", "normal", "normal", "normal"])
+        self.assertEqual(len(tail.pending), 3)
+
+    def test_vehicles_are_labelled_apart(self):
+        # Two cars alternating: in the interleaved signal the bump of car 2 is
+        # a spike one sample wide, on its own it is five samples wide
+        bump = {8: 25000.0, 9: 35000.0, 10: 40000.0, 11: 35000.0, 12: 25000.0}
+        records = []
+        for i in range(20):
+            records.append(record(1, 16500.0))
+            records.append(record(2, bump.get(i, 16500.0)))
+        labelled, tails = label_batch({}, ProcessedAgentDataColumns.from_records(records), half_window=3)
+        self.assertEqual(set(tails), {1, 2})
+        self.assertEqual(labelled["user_id"][labelled["road_state"] == "bump"].tolist(), [2])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,8 +1,10 @@
 import asyncio
+import gzip
 import json
-from typing import Set, List
-from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
+from typing import Callable, Set, List
+from fastapi import FastAPI, HTTPException, Request, Response, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.routing import APIRoute
 from sqlalchemy import (
     create_engine, MetaData, Table, Column,
     Integer, String, Float, DateTime
@@ -20,8 +22,33 @@ from config import (
     POSTGRES_PASSWORD,
 )
 
+class GzipRequest(Request):
+    """Request whose body is transparently decompressed when it is gzipped"""
+
+    async def body(self) -> bytes:
+        if not hasattr(self, "_body"):
+            body = await super().body()
+            if "gzip" in self.headers.getlist("Content-Encoding"):
+                body = gzip.decompress(body)
+            self._body = body
+        return self._body
+
+
+class GzipRoute(APIRoute):
+    def get_route_handler(self) -> Callable:
+        original_route_handler = super().get_route_handler()
+
+        async def custom_route_handler(request: Request) -> Response:
+            request = GzipRequest(request.scope, request.receive)
+            return await original_route_handler(request)
+
+        return custom_route_handler
+
+
 # FastAPI app setup
 app = FastAPI()
+# The hub may gzip the batches it posts (STORE_API_COMPRESS)
+app.router.route_class = GzipRoute
 
 # SQLAlchemy setup
 DATABASE_URL = (